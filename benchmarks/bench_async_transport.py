@@ -0,0 +1,196 @@
+# Import required packages.
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fake_ios_server import DEFAULT_PASSWORD, DEFAULT_PORT, DEFAULT_SECRET, DEFAULT_USERNAME, get_switch_address, raise_open_file_limit
+from utils.async_transport import AsyncSshTransport
+from utils.net_crawl import DiscoverySession
+
+# Create constants.
+DEFAULT_SWITCHES = 500
+DEFAULT_SESSIONS = 1000
+# Handshakes are CPU bound, so thousands at once take a while on small machines. Don't count that as a failure.
+DEFAULT_CONNECT_TIMEOUT = 120.0
+DEFAULT_READ_TIMEOUT = 60.0
+SAMPLE_INTERVAL = 0.05
+
+
+class ResourceSampler():
+    """
+    Samples the process's thread count and resident memory in the background and keeps the peaks.
+    """
+    def __init__(self) -> None:
+        # Create class variables and objects.
+        self.peak_threads = 0
+        self.peak_rss = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def get_rss(self) -> int:
+        """
+        Returns the process's resident memory in bytes, or 0 where /proc isn't available.
+        """
+        try:
+            with open("/proc/self/status", "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+        return 0
+
+    def run(self) -> None:
+        """
+        Thread target. Samples until stopped.
+        """
+        while not self.stop_event.is_set():
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss = max(self.peak_rss, self.get_rss())
+            self.stop_event.wait(SAMPLE_INTERVAL)
+
+    def __enter__(self):
+        """
+        Starts sampling.
+        """
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        """
+        Stops sampling.
+        """
+        self.stop_event.set()
+        self.thread.join()
+
+def start_server(args) -> subprocess.Popen:
+    """
+    Starts the fake switches in their own process, so the server doesn't share a GIL with the client being measured.
+    Storm sessions past the last switch still get a shell, they just have no children.
+
+    Parameters:
+    -----------
+        args - The parsed options.
+
+    Returns:
+    --------
+        subprocess.Popen - The server process. It's ready once this returns.
+    """
+    server = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_ios_server.py"), "--switches", str(args.switches), "--port", str(args.port), "--login-delay", str(args.login_delay), "--command-delay", str(args.command_delay)], stdout=subprocess.PIPE, text=True)
+    print(server.stdout.readline().strip())
+
+    return server
+
+def remote_device(index, port) -> dict:
+    """
+    Returns the connection dictionary for a fake switch.
+    """
+    return {"device_type": "cisco_ios", "host": get_switch_address(index), "port": port, "username": DEFAULT_USERNAME, "password": DEFAULT_PASSWORD, "secret": DEFAULT_SECRET}
+
+def bench_crawl(args) -> None:
+    """
+    Crawls the whole fake network on the async transport and prints how it went.
+    """
+    transport = AsyncSshTransport(port=args.port, connect_timeout=args.connect_timeout, read_timeout=args.read_timeout, max_sessions=args.max_sessions)
+    session = DiscoverySession([DEFAULT_USERNAME], [DEFAULT_PASSWORD], [DEFAULT_SECRET], export_info=True, incremental=False, collect_licenses=False, ssh_transport=transport)
+    with ResourceSampler() as sampler:
+        start_time = time.perf_counter()
+        discovered_ips, export_info = session.discover([get_switch_address(0)])
+        elapsed = time.perf_counter() - start_time
+    transport.stop()
+
+    print(f"crawl: {len(discovered_ips)} switches, {len(export_info)} records in {elapsed:.2f}s ({len(discovered_ips) / elapsed:.0f} switches/s)")
+    print(f"  peak sessions {transport.get_metrics()['peak_sessions']}, peak threads {sampler.peak_threads}, peak RSS {sampler.peak_rss / 1e6:.0f}MB")
+
+def bench_async_storm(args) -> None:
+    """
+    Opens every session at once on the async transport, runs a command on each while they're all open, then closes them.
+    """
+    transport = AsyncSshTransport(port=args.port, connect_timeout=args.connect_timeout, read_timeout=args.read_timeout, max_sessions=args.max_sessions)
+
+    async def storm() -> tuple:
+        connections = await asyncio.gather(*[transport.connect(remote_device(i, args.port)) for i in range(args.sessions)], return_exceptions=True)
+        opened = [connection for connection in connections if not isinstance(connection, BaseException)]
+        await asyncio.gather(*[connection.enable() for connection in opened])
+        outputs = await asyncio.gather(*[connection.send_command("show cdp neighbors detail") for connection in opened])
+        await asyncio.gather(*[connection.disconnect() for connection in opened])
+        return outputs, Counter(type(connection).__name__ for connection in connections if isinstance(connection, BaseException))
+
+    with ResourceSampler() as sampler:
+        start_time = time.perf_counter()
+        outputs, failures = transport.submit(storm()).result()
+        elapsed = time.perf_counter() - start_time
+    transport.stop()
+
+    print(f"asyncssh storm: {len(outputs)} of {args.sessions} sessions in {elapsed:.2f}s ({len(outputs) / elapsed:.0f} sessions/s)")
+    if len(failures) > 0:
+        print(f"  failed logins: {dict(failures)}")
+    print(f"  peak sessions {transport.get_metrics()['peak_sessions']}, peak threads {sampler.peak_threads}, peak RSS {sampler.peak_rss / 1e6:.0f}MB")
+
+def bench_netmiko_storm(args) -> None:
+    """
+    The same storm with one blocking netmiko connection per thread, like the executor does.
+    """
+    from netmiko import ConnectHandler
+
+    barrier = threading.Barrier(args.sessions)
+
+    def login(index) -> str:
+        connection = ConnectHandler(**remote_device(index, args.port))
+        try:
+            connection.enable()
+            # Hold every session open at the same time, like the async storm.
+            barrier.wait()
+            return connection.send_command("show cdp neighbors detail")
+        finally:
+            connection.disconnect()
+
+    with ResourceSampler() as sampler:
+        start_time = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.sessions) as pool:
+            results = list(pool.map(login, range(args.sessions)))
+        elapsed = time.perf_counter() - start_time
+
+    print(f"netmiko storm: {len(results)} sessions in {elapsed:.2f}s ({len(results) / elapsed:.0f} sessions/s)")
+    print(f"  peak threads {sampler.peak_threads}, peak RSS {sampler.peak_rss / 1e6:.0f}MB")
+
+def main() -> None:
+    """
+    Starts the fake switches and runs the benchmarks against them.
+    """
+    # Get options.
+    parser = argparse.ArgumentParser(description="Benchmark the async SSH transport against a local fake IOS network.")
+    parser.add_argument("--switches", type=int, default=DEFAULT_SWITCHES, help="Switches in the fake network for the crawl.")
+    parser.add_argument("--sessions", type=int, default=DEFAULT_SESSIONS, help="Sessions held open at once for the storm.")
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_SESSIONS * 2)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--connect-timeout", type=float, default=DEFAULT_CONNECT_TIMEOUT)
+    parser.add_argument("--read-timeout", type=float, default=DEFAULT_READ_TIMEOUT)
+    parser.add_argument("--login-delay", type=float, default=0.0)
+    parser.add_argument("--command-delay", type=float, default=0.0)
+    parser.add_argument("--netmiko", action="store_true", help="Also run the storm with netmiko threads.")
+    args = parser.parse_args()
+
+    # Every session is a socket. Discovery writes its caches to the working directory, so keep them out of the real one.
+    raise_open_file_limit()
+    os.chdir(tempfile.mkdtemp())
+    server = start_server(args)
+    try:
+        bench_crawl(args)
+        bench_async_storm(args)
+        if args.netmiko:
+            bench_netmiko_storm(args)
+    finally:
+        server.kill()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+# Import required packages.
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.cdp_corpus import DEFAULT_NEIGHBORS, DEFAULT_SWITCHES, load_corpus, make_corpus
+from utils.cdp_parser import parse_cdp_neighbors_detail
+
+# Create constants.
+DEFAULT_ROUNDS = 20
+PARENT_ADDR = "10.0.0.1"
+PARENT_HOST = "dist-1"
+
+
+def legacy_parse(output, export_info) -> list:
+    """
+    The re.split("Device") parser get_cdp_neighbors_info used before utils.cdp_parser, without the ssh parts.
+
+    Parameters:
+    -----------
+        output - The command output.
+        export_info - Whether the export fields should be filled in.
+
+    Returns:
+    --------
+        list - The neighbor records, including the empty record the old parser built from the text before the first neighbor.
+    """
+    device_infos = []
+    for device in re.split("Device", output):
+        info = device.splitlines()
+        device_info = {}
+        hostname = "NULL"
+        addr = "NULL"
+        local_trunk_interface = "NULL"
+        software_name = "NULL"
+        version = "NULL"
+        platform = "NULL"
+        is_wireless_ap = False
+        is_switch = False
+        is_router = False
+        is_phone = False
+        is_camera = False
+        parent_addr = "NULL"
+        parent_host = "NULL"
+        parent_trunk_interface = "NULL"
+        for line in info:
+            if "IP address:" in line:
+                addr = line.replace("IP address: ", "").strip()
+            if "Platform" in line and "Switch" in line:
+                is_switch = True
+                if "Router" in line:
+                    is_router = True
+            if "AIR" in line or "Trans-Bridge" in line:
+                is_wireless_ap = True
+                is_switch = False
+            if export_info and len(addr) > 0:
+                if "ID:" in line:
+                    line = line.replace("ID:", "")
+                    hostname = line.strip()
+                if "Version :" not in line and "Version" in line:
+                    line = re.split(",", line)
+                    for i, section in enumerate(line):
+                        if i == 0:
+                            software_name = section
+                        if "Version" in section:
+                            section = section.replace("Version", "")
+                            version = section.strip()
+                if "Platform" in line:
+                    line = line.replace("Platform:", "")
+                    line = line.split(",", 1)[0]
+                    platform = line.strip()
+                if "Interface:" in line:
+                    line = re.split(",", line)
+                    remote_interface = line[0]
+                    local_interface = line[1]
+                    remote_interface = remote_interface.replace("Interface:", "")
+                    local_interface = local_interface.replace("Port ID (outgoing port):", "")
+                    local_trunk_interface = local_interface.strip()
+                    parent_trunk_interface = remote_interface.strip()
+        if export_info:
+            if software_name == "NULL" and version == "NULL":
+                is_switch = False
+                if platform != "NULL" and platform != "Linux":
+                    is_phone = True
+            if not any([is_router, is_switch, is_wireless_ap, is_phone]):
+                is_camera = True
+            parent_addr = PARENT_ADDR
+            parent_host = PARENT_HOST
+        device_info["hostname"] = hostname
+        device_info["ip_addr"] = addr
+        device_info["local_trunk_interface"] = local_trunk_interface
+        device_info["software_name"] = software_name
+        device_info["version"] = version
+        device_info["platform"] = platform
+        device_info["is_wireless_ap"] = is_wireless_ap
+        device_info["is_switch"] = is_switch
+        device_info["is_router"] = is_router
+        device_info["is_phone"] = is_phone
+        device_info["is_camera"] = is_camera
+        device_info["parent_addr"] = parent_addr
+        device_info["parent_host"] = parent_host
+        device_info["parent_trunk_interface"] = parent_trunk_interface
+        device_infos.append(device_info)
+
+    return device_infos
+
+def cdp_parser_parse(output, export_info) -> list:
+    """
+    Runs the output through utils.cdp_parser.
+
+    Parameters:
+    -----------
+        output - The command output.
+        export_info - Whether the export fields should be filled in.
+
+    Returns:
+    --------
+        list - The neighbor records.
+    """
+    return list(parse_cdp_neighbors_detail(output, PARENT_ADDR, PARENT_HOST, export_info))
+
+def time_parser(parse, corpus, export_info, rounds) -> float:
+    """
+    Returns the best time of several rounds of parsing the whole corpus.
+
+    Parameters:
+    -----------
+        parse - The parser function.
+        corpus - The output strings.
+        export_info - Whether the export fields should be filled in.
+        rounds - How many rounds to run.
+
+    Returns:
+    --------
+        float - The fastest round in seconds.
+    """
+    best_time = None
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        for output in corpus:
+            parse(output, export_info)
+        elapsed = time.perf_counter() - start_time
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    return best_time
+
+def main() -> None:
+    """
+    Times both parsers on the same corpus, checks they agree, and shows what the old parser does with Device in a hostname.
+    """
+    # Get options.
+    parser = argparse.ArgumentParser(description="Benchmark show cdp neighbors detail parsing.")
+    parser.add_argument("--switches", type=int, default=DEFAULT_SWITCHES)
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_NEIGHBORS)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument("--corpus", help="Folder of recorded outputs to use instead of the generated ones.")
+    args = parser.parse_args()
+
+    # Get corpus.
+    corpus = load_corpus(args.corpus) if args.corpus else make_corpus(args.switches, args.neighbors)
+    total_lines = sum(output.count("\n") for output in corpus)
+    total_bytes = sum(len(output) for output in corpus)
+    print(f"{len(corpus)} outputs, {total_lines} lines, {total_bytes / 1e6:.1f}MB")
+
+    # Check both agree, ignoring the empty record the old parser made out of the header.
+    mismatches = 0
+    for export_info in (False, True):
+        for output in corpus:
+            legacy_records = [record for record in legacy_parse(output, export_info) if not export_info or record["hostname"] != "NULL"]
+            if not export_info:
+                legacy_records = legacy_records[1:]
+            if legacy_records != cdp_parser_parse(output, export_info):
+                mismatches += 1
+    print(f"{mismatches} outputs parsed differently")
+
+    # Time both.
+    for export_info in (False, True):
+        legacy_time = time_parser(legacy_parse, corpus, export_info, args.rounds)
+        cdp_parser_time = time_parser(cdp_parser_parse, corpus, export_info, args.rounds)
+        print(f"export_info={export_info}")
+        print(f"  legacy:     {legacy_time:8.3f}s {total_lines / legacy_time / 1e6:6.2f}M lines/s")
+        print(f"  cdp_parser: {cdp_parser_time:8.3f}s {total_lines / cdp_parser_time / 1e6:6.2f}M lines/s ({legacy_time / cdp_parser_time:.1f}x speedup)")
+
+    # Show the hostname problem.
+    if not args.corpus:
+        tricky = make_corpus(1, args.neighbors, device_hostnames=True)[0]
+        cdp_parser_records = cdp_parser_parse(tricky, True)
+        expected = set((record["hostname"], record["ip_addr"]) for record in cdp_parser_records)
+        legacy_correct = len([record for record in legacy_parse(tricky, True) if (record["hostname"], record["ip_addr"]) in expected])
+        mangled = len([record for record in cdp_parser_records if record["hostname"].startswith("Device")])
+        print(f"Device in {mangled} hostnames: legacy parsed {legacy_correct} of {len(cdp_parser_records)} neighbors correctly, cdp_parser parsed all of them")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# Import required packages.
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.open_connection import parse_config_info
+from utils.running_config import RunningConfig, get_interface_short_name
+
+# Create constants.
+DEFAULT_MEMBERS = 9
+DEFAULT_PORTS = 48
+DEFAULT_UPLINKS = 4
+DEFAULT_VLANS = 60
+DEFAULT_ROUNDS = 5
+
+
+def make_stack(member_count, port_count, uplink_count, vlan_count) -> tuple:
+    """
+    Builds the outputs get_config_info reads from a stack of access switches. Every member has its access ports and
+    uplinks, and every vlan has an interface Vlan block.
+
+    Parameters:
+    -----------
+        member_count - The number of switches in the stack.
+        port_count - Access ports per member.
+        uplink_count - Uplinks per member.
+        vlan_count - The number of vlans.
+
+    Returns:
+    --------
+        tuple - The running config, show interface status output, and show vlan brief output.
+    """
+    rng = random.Random(0)
+    config_blocks = ["version 17.9", "hostname stack-1", "spanning-tree mode rapid-pvst"]
+    status_lines = ["", "Port         Name               Status       Vlan       Duplex  Speed Type"]
+    vlans = list(range(10, 10 + vlan_count))
+
+    for member in range(1, member_count + 1):
+        # Access ports.
+        for port in range(1, port_count + 1):
+            vlan = rng.choice(vlans)
+            config_blocks.append(f"interface GigabitEthernet{member}/0/{port}\n description desk-{member}-{port}\n switchport access vlan {vlan}\n switchport voice vlan 900\n switchport mode access\n spanning-tree portfast\n spanning-tree bpduguard enable")
+            status_lines.append(f"Gi{member}/0/{port:<6} desk-{member}-{port:<10} connected    {vlan:<10} a-full a-1000 10/100/1000BaseTX")
+        # Uplinks.
+        for port in range(1, uplink_count + 1):
+            config_blocks.append(f"interface TenGigabitEthernet{member}/1/{port}\n description uplink-{member}-{port}\n switchport trunk native vlan 999\n switchport mode trunk")
+            status_lines.append(f"Te{member}/1/{port:<6} uplink-{member}-{port:<8} connected    trunk      full    10G SFP-10GBase-SR")
+
+    # Vlans.
+    vlan_lines = ["", "VLAN Name                             Status    Ports", "---- -------------------------------- --------- -------------------------------"]
+    for vlan in vlans:
+        config_blocks.append(f"interface Vlan{vlan}\n description users-{vlan}\n ip address 10.{vlan}.0.1 255.255.255.0")
+        vlan_lines.append(f"{vlan:<4} users-{vlan:<26} active    Gi1/0/1")
+    config_blocks.append("line vty 0 15\n transport input ssh")
+
+    return "\n!\n".join(config_blocks) + "\n!\nend\n", "\n".join(status_lines), "\n".join(vlan_lines)
+
+def legacy_parse(config, interface_output, vlan_output) -> tuple:
+    """
+    The nested interface and vlan matching get_config_info used before the block index, without the ssh parts.
+
+    Parameters:
+    -----------
+        config - The running config text.
+        interface_output - The show interface status output.
+        vlan_output - The show vlan brief output.
+
+    Returns:
+    --------
+        tuple - The interfaces and vlans lists.
+    """
+    interfaces = []
+    vlans = []
+    for line in interface_output.splitlines()[2:]:
+        if len(line) > 2:
+            line = re.split(" +", line)
+            interfaces.append({"name" : line[0].strip()})
+
+    interface_blocks = []
+    for block in re.split("!+", config):
+        if "interface" in block:
+            interface_blocks.append(block[1:].splitlines())
+    for interface in interfaces:
+        for interface_data in interface_blocks:
+            name_data = re.split(" +", interface_data[0])[1]
+            block_name = name_data[:2] + name_data.translate(str.maketrans('', '', string.ascii_letters + "-"))
+            if interface["name"] == block_name:
+                description = ""
+                shutdown = False
+                switch_mode_access = False
+                switch_mode_trunk = False
+                spanning_tree_portfast = False
+                spanning_tree_bpduguard = False
+                switch_access_vlan = 0
+                switch_voice_vlan = 0
+                switch_trunk_vlan = 0
+                for data in interface_data:
+                    if "description" in data and description == "" and "macro" not in data:
+                        description = data.replace("description", "").strip()
+                    if "shutdown" in data and not "no shutdown" in data:
+                        shutdown = True
+                    if "switchport mode access" in data:
+                        switch_mode_access = True
+                    if "spanning-tree portfast" in data:
+                        spanning_tree_portfast = True
+                    if "spanning-tree bpduguard enable" in data:
+                        spanning_tree_bpduguard = True
+                    if "switchport mode trunk" in data:
+                        switch_mode_trunk = True
+                    if "switchport access vlan" in data:
+                        switch_access_vlan = data.translate(str.maketrans('', '', string.ascii_letters)).strip()
+                    if "switchport voice vlan" in data:
+                        switch_voice_vlan = data.translate(str.maketrans('', '', string.ascii_letters)).strip()
+                    if "switchport trunk native vlan" in data:
+                        switch_trunk_vlan = data.translate(str.maketrans('', '', string.ascii_letters)).strip()
+                interface.update({"description": description, "shutdown": shutdown, "switchport mode access": switch_mode_access, "switchport mode trunk": switch_mode_trunk, "spanning-tree portfast": spanning_tree_portfast, "spanning-tree bpduguard enable": spanning_tree_bpduguard, "switchport access vlan": switch_access_vlan, "switchport voice vlan": switch_voice_vlan, "switchport trunk native vlan": switch_trunk_vlan, "config_has_changed": False})
+
+    for line in vlan_output.splitlines()[3:]:
+        if len(line) > 2:
+            line = re.split(" +", line)
+            if "active" in line[2]:
+                vlans.append({"vlan" : line[0], "name" : line[1]})
+
+    vlan_blocks = []
+    for block in re.split("!+", config):
+        if "interface Vlan" in block:
+            vlan_blocks.append(block.splitlines()[1:])
+    for vlan in vlans:
+        for vlan_data in vlan_blocks:
+            name_data = re.split(" +", vlan_data[0])[1]
+            block_name = name_data.translate(str.maketrans('', '', string.ascii_letters + "-"))
+            if vlan["vlan"] == block_name:
+                description = ""
+                ip_addr = ""
+                shutdown = False
+                for data in vlan_data:
+                    if "description" in data and description == "" and "macro" not in data:
+                        description = data.replace("description", "").strip()
+                    if not "no ip address" in data and "ip address" in data:
+                        ip_addr = data.replace("ip address", "").strip()
+                    if "shutdown" in data and not "no shutdown" in data:
+                        shutdown = True
+                vlan.update({"description": description, "ip address": ip_addr, "shutdown": shutdown, "config_has_changed": False})
+
+    return interfaces, vlans
+
+def indexed_parse(config, interface_output, vlan_output) -> tuple:
+    """
+    Parses the config once and matches the interfaces and vlans against it, like get_config_info does now.
+
+    Parameters:
+    -----------
+        config - The running config text.
+        interface_output - The show interface status output.
+        vlan_output - The show vlan brief output.
+
+    Returns:
+    --------
+        tuple - The interfaces and vlans lists.
+    """
+    return parse_config_info(RunningConfig(config), interface_output, vlan_output)
+
+def legacy_upload_diff(config, old_config) -> list:
+    """
+    The substring diff upload_text_switch_commands used before RunningConfig.
+
+    Parameters:
+    -----------
+        config - The edited config text.
+        old_config - The config text the device has now.
+
+    Returns:
+    --------
+        list - The commands to send.
+    """
+    diff = [section for section in re.split("!+", config)[3:] if not section in old_config]
+    return re.split("\n+", "".join(diff))
+
+def edit_config(config, edit_count) -> str:
+    """
+    Changes the description on some interfaces, like a user editing the config window's text box.
+
+    Parameters:
+    -----------
+        config - The running config text.
+        edit_count - How many descriptions to change.
+
+    Returns:
+    --------
+        str - The edited config text.
+    """
+    return config.replace(" description desk-", " description moved-", edit_count)
+
+def time_parser(parse, outputs, rounds) -> float:
+    """
+    Returns the best time of several rounds of parsing the stack.
+
+    Parameters:
+    -----------
+        parse - The parser function.
+        outputs - The config, interface, and vlan outputs.
+        rounds - How many rounds to run.
+
+    Returns:
+    --------
+        float - The fastest round in seconds.
+    """
+    best_time = None
+    for _ in range(rounds):
+        start_time = time.perf_counter()
+        parse(*outputs)
+        elapsed = time.perf_counter() - start_time
+        best_time = elapsed if best_time is None else min(best_time, elapsed)
+
+    return best_time
+
+def main() -> None:
+    """
+    Times both versions on the same stack, checks they agree, and prints the results.
+    """
+    # Get options.
+    parser = argparse.ArgumentParser(description="Benchmark matching interfaces and vlans to their config blocks.")
+    parser.add_argument("--members", type=int, default=DEFAULT_MEMBERS)
+    parser.add_argument("--ports", type=int, default=DEFAULT_PORTS)
+    parser.add_argument("--uplinks", type=int, default=DEFAULT_UPLINKS)
+    parser.add_argument("--vlans", type=int, default=DEFAULT_VLANS)
+    parser.add_argument("--rounds", type=int, default=DEFAULT_ROUNDS)
+    args = parser.parse_args()
+
+    # Build stack.
+    outputs = make_stack(args.members, args.ports, args.uplinks, args.vlans)
+    legacy_interfaces, legacy_vlans = legacy_parse(*outputs)
+    print(f"{args.members} member stack, {len(legacy_interfaces)} interfaces, {len(legacy_vlans)} vlans, {outputs[0].count(chr(10))} line config")
+
+    # Make sure both agree.
+    interfaces, vlans = indexed_parse(*outputs)
+    assert interfaces == legacy_interfaces
+    assert vlans == legacy_vlans
+
+    # Time both. The first indexed round fills the name cache, later rounds show a refresh of the same stack.
+    get_interface_short_name.cache_clear()
+    legacy_time = time_parser(legacy_parse, outputs, args.rounds)
+    indexed_time = time_parser(indexed_parse, outputs, args.rounds)
+    parse_time = time_parser(RunningConfig, outputs[:1], args.rounds)
+    print(f"legacy:  {legacy_time * 1e3:8.1f}ms per refresh")
+    print(f"indexed: {indexed_time * 1e3:8.1f}ms per refresh ({legacy_time / indexed_time:.0f}x faster), {parse_time * 1e3:.1f}ms of it parsing the config")
+
+    # Time the upload diff with a few descriptions changed. The old parsed config is reused, only the edit is parsed.
+    edited = edit_config(outputs[0], args.members)
+    old_config = RunningConfig(outputs[0])
+    legacy_diff_time = time_parser(legacy_upload_diff, (edited, outputs[0]), args.rounds)
+    indexed_diff_time = time_parser(lambda config, old_config: RunningConfig(config).get_changes(old_config), (edited, old_config), args.rounds)
+    changes = RunningConfig(edited).get_changes(old_config)
+    print(f"upload diff of {args.members} edited interfaces: {len(changes)} commands")
+    print(f"  legacy:  {legacy_diff_time * 1e3:8.1f}ms")
+    print(f"  indexed: {indexed_diff_time * 1e3:8.1f}ms ({legacy_diff_time / indexed_diff_time:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
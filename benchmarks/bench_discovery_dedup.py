@@ -0,0 +1,119 @@
+# Import required packages.
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import net_crawl
+
+# Create constants.
+DEFAULT_SWITCHES = 400
+DEFAULT_ENDPOINTS = 20000
+
+
+def make_crawl_results(switch_count, endpoint_count) -> list:
+    """
+    Builds fake per switch crawl results. Every switch sees its two chain neighbors plus its share of
+    phones and cameras, and every endpoint is reported by two switches like it would be on a stacked access layer.
+
+    Parameters:
+    -----------
+        switch_count - The number of switches in the fake network.
+        endpoint_count - The number of phones and cameras in the fake network.
+
+    Returns:
+    --------
+        list - (discovered_ip_addrs, device_infos) tuples, one per switch.
+    """
+    results = []
+    per_switch = max(1, endpoint_count // switch_count)
+    for i in range(switch_count):
+        # Switch neighbors.
+        neighbors = [f"10.0.{j // 250}.{j % 250 + 1}" for j in (i - 1, i + 1) if 0 <= j < switch_count]
+        # Endpoint records, overlapping with the next switch.
+        infos = []
+        for j in range(i * per_switch, (i + 2) * per_switch):
+            infos.append({"hostname": f"SEP{j:012X}", "ip_addr": f"10.{100 + j // 65000}.{j // 250 % 256}.{j % 250 + 1}", "is_phone": True})
+        for ip_addr in neighbors:
+            infos.append({"hostname": f"switch-{ip_addr}", "ip_addr": ip_addr, "is_switch": True})
+        results.append((neighbors, infos))
+
+    return results
+
+def legacy_record(results) -> tuple:
+    """
+    The list scanning duplicate checks cdp_auto_discover used before the indexes were added.
+
+    Parameters:
+    -----------
+        results - The fake crawl results.
+
+    Returns:
+    --------
+        tuple - The discovered IP list and the export info list.
+    """
+    ip_discovery_list = []
+    export_info_list = []
+    for discovered_ip_addrs, device_infos in results:
+        for ip_addr in discovered_ip_addrs:
+            if not ip_addr in ip_discovery_list:
+                ip_discovery_list.append(ip_addr)
+        for info in device_infos:
+            if len(info) > 0 and info["hostname"] != "NULL" and not info in export_info_list:
+                hostnames = [key_val["hostname"] for key_val in export_info_list]
+                if info["hostname"] not in hostnames:
+                    export_info_list.append(dict(info))
+
+    return ip_discovery_list, export_info_list
+
+def indexed_record(results) -> tuple:
+    """
+    Runs the fake crawl results through DiscoverySession.record_discoveries.
+
+    Parameters:
+    -----------
+        results - The fake crawl results.
+
+    Returns:
+    --------
+        tuple - The discovered IP list and the export info list.
+    """
+    session = net_crawl.DiscoverySession([], [], [], export_info=True)
+    for discovered_ip_addrs, device_infos in results:
+        session.record_discoveries(discovered_ip_addrs, [dict(info) for info in device_infos], 0)
+
+    return session.ip_discovery_list, session.export_info_list
+
+def main() -> None:
+    """
+    Times both versions on the same fake network and prints the results.
+    """
+    # Get options.
+    parser = argparse.ArgumentParser(description="Benchmark discovery duplicate checks.")
+    parser.add_argument("--switches", type=int, default=DEFAULT_SWITCHES)
+    parser.add_argument("--endpoints", type=int, default=DEFAULT_ENDPOINTS)
+    args = parser.parse_args()
+
+    # Build network.
+    results = make_crawl_results(args.switches, args.endpoints)
+    print(f"{args.switches} switches, {sum(len(infos) for _, infos in results)} neighbor records")
+
+    # Time both.
+    start_time = time.perf_counter()
+    legacy_ips, legacy_infos = legacy_record(results)
+    legacy_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    indexed_ips, indexed_infos = indexed_record(results)
+    indexed_time = time.perf_counter() - start_time
+
+    # Make sure both agree.
+    assert legacy_ips == indexed_ips
+    assert [info["hostname"] for info in legacy_infos] == [info["hostname"] for info in indexed_infos]
+
+    print(f"legacy:  {legacy_time:8.3f}s")
+    print(f"indexed: {indexed_time:8.3f}s ({legacy_time / indexed_time:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
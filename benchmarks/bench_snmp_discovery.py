@@ -0,0 +1,104 @@
+# Import required packages.
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fake_ios_server import DEFAULT_FANOUT, DEFAULT_PHONES, DEFAULT_SWITCHES, get_switch_address, raise_open_file_limit
+from benchmarks.fake_snmp_agent import DEFAULT_COMMUNITY, DEFAULT_PORT
+from utils.snmp_discovery import SnmpDiscoveryEngine
+
+
+def start_agent(args) -> subprocess.Popen:
+    """
+    Starts the fake agents in their own process, so they don't share a GIL with the engine being measured.
+
+    Parameters:
+    -----------
+        args - The parsed options.
+
+    Returns:
+    --------
+        subprocess.Popen - The agent process. It's ready once this returns.
+    """
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_snmp_agent.py"), "--switches", str(args.switches), "--fanout", str(args.fanout), "--phones", str(args.phones), "--port", str(args.port), "--community", DEFAULT_COMMUNITY]
+    if args.empty_leaves:
+        command.append("--empty-leaves")
+    agent = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    print(agent.stdout.readline().strip())
+
+    return agent
+
+def crawl(engine, root_addr) -> tuple:
+    """
+    Crawls the fake network over SNMP only, the way DiscoverySession walks its frontier.
+
+    Parameters:
+    -----------
+        engine - The SNMP discovery engine.
+        root_addr - The address to start from.
+
+    Returns:
+    --------
+        tuple - The switches found, the neighbor record count, and the switches that answered with no neighbors or failed.
+    """
+    seen = {root_addr}
+    in_flight = {engine.submit(root_addr, export_info=True): root_addr}
+    record_count = 0
+    empty = []
+    failed = []
+    while len(in_flight) > 0:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            ip_addr = in_flight.pop(future)
+            result = future.result()
+            if result is None:
+                failed.append(ip_addr)
+                continue
+            discovered_ip_addrs, device_infos, _ = result
+            record_count += len(device_infos)
+            if len(device_infos) <= 0:
+                empty.append(ip_addr)
+            for neighbor_addr in discovered_ip_addrs:
+                if neighbor_addr not in seen:
+                    seen.add(neighbor_addr)
+                    in_flight[engine.submit(neighbor_addr, export_info=True)] = neighbor_addr
+
+    return seen, record_count, empty, failed
+
+def main() -> None:
+    """
+    Starts the fake agents and crawls them with the SNMP discovery engine.
+    """
+    # Get options.
+    parser = argparse.ArgumentParser(description="Benchmark SNMP CDP discovery against local fake agents.")
+    parser.add_argument("--switches", type=int, default=DEFAULT_SWITCHES)
+    parser.add_argument("--fanout", type=int, default=DEFAULT_FANOUT)
+    parser.add_argument("--phones", type=int, default=DEFAULT_PHONES)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--empty-leaves", action="store_true", help="Leaf switches answer with an empty CDP table.")
+    args = parser.parse_args()
+
+    # Every agent is a socket.
+    raise_open_file_limit()
+    agent = start_agent(args)
+    try:
+        engine = SnmpDiscoveryEngine(DEFAULT_COMMUNITY, port=args.port)
+        start_time = time.perf_counter()
+        seen, record_count, empty, failed = crawl(engine, get_switch_address(0))
+        elapsed = time.perf_counter() - start_time
+        engine.stop()
+    finally:
+        agent.kill()
+
+    print(f"SNMP crawl: {len(seen)} switches, {record_count} records in {elapsed:.2f}s ({len(seen) / elapsed:.0f} switches/s)")
+    print(f"  {len(empty)} switches with no neighbors, {len(failed)} that would fall back to SSH")
+    # An empty table is an answer, only agents that didn't answer fall back to SSH.
+    assert len(failed) == 0, failed
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# Import required packages.
+import argparse
+import os
+import random
+
+# Create constants.
+DEFAULT_SWITCHES = 8
+DEFAULT_NEIGHBORS = 400
+DEFAULT_SEED = 1
+CORPUS_EXTENSION = ".txt"
+# Neighbor block templates, modeled on IOS-XE 16.x output.
+SWITCH_BLOCK = """-------------------------
+Device ID: {hostname}
+Entry address(es):
+  IP address: {ip_addr}
+Platform: cisco {model},  Capabilities: Router Switch IGMP
+Interface: {interface},  Port ID (outgoing port): {port}
+Holdtime : {holdtime} sec
+
+Version :
+Cisco IOS Software [Fuji], Catalyst L3 Switch Software (CAT9K_IOSXE), Version 16.9.5, RELEASE SOFTWARE (fc1)
+Technical Support: http://www.cisco.com/techsupport
+Copyright (c) 1986-2020 by Cisco Systems, Inc.
+Compiled Thu 30-Jan-20 18:48 by mcpre
+
+advertisement version: 2
+VTP Management Domain: ''
+Native VLAN: 1
+Duplex: full
+Management address(es):
+  IP address: {ip_addr}
+
+"""
+AP_BLOCK = """-------------------------
+Device ID: {hostname}
+Entry address(es):
+  IP address: {ip_addr}
+Platform: cisco AIR-AP2802I-B-K9,  Capabilities: Router Trans-Bridge Source-Route-Bridge IGMP
+Interface: {interface},  Port ID (outgoing port): GigabitEthernet0
+Holdtime : {holdtime} sec
+
+Version :
+Cisco AP Software, ap1g5-k9w8 Version: 8.10.130.0
+Technical Support: http://www.cisco.com/techsupport
+Copyright (c) 2014-2015 by Cisco Systems, Inc.
+
+advertisement version: 2
+Duplex: full
+Power drawn: 25.500 Watts
+Management address(es):
+  IP address: {ip_addr}
+
+"""
+PHONE_BLOCK = """-------------------------
+Device ID: {hostname}
+Entry address(es):
+  IP address: {ip_addr}
+Platform: Cisco IP Phone 8845,  Capabilities: Host Phone Two-port Mac Relay
+Interface: {interface},  Port ID (outgoing port): Port 1
+Holdtime : {holdtime} sec
+Second Port Status: Up
+
+Version :
+sip8845_65.12-7-1-0001-393
+
+advertisement version: 2
+Duplex: full
+Power drawn: 6.300 Watts
+Management address(es):
+
+"""
+CAMERA_BLOCK = """-------------------------
+Device ID: {hostname}
+Entry address(es):
+  IP address: {ip_addr}
+Platform: Linux,  Capabilities: Host
+Interface: {interface},  Port ID (outgoing port): eth0
+Holdtime : {holdtime} sec
+
+Version :
+3.10.0
+
+advertisement version: 2
+Management address(es):
+
+"""
+NEIGHBOR_MIX = [(SWITCH_BLOCK, 0.15), (AP_BLOCK, 0.25), (PHONE_BLOCK, 0.45), (CAMERA_BLOCK, 0.15)]
+SWITCH_MODELS = ["C9300-48P", "C9300-48U", "C9500-24Y4C", "WS-C3850-48P"]
+
+
+def make_distribution_output(switch_index, neighbor_count, rng, device_hostnames=False) -> str:
+    """
+    Builds the show cdp neighbors detail output of one distribution switch.
+
+    Parameters:
+    -----------
+        switch_index - Which switch this is, used to keep addresses unique.
+        neighbor_count - How many neighbors the switch has.
+        rng - The random.Random to draw the neighbor mix from.
+        device_hostnames - Whether to put the word Device in some hostnames, which the old parser splits on.
+
+    Returns:
+    --------
+        str - The command output.
+    """
+    blocks = []
+    templates = [template for template, _ in NEIGHBOR_MIX]
+    weights = [weight for _, weight in NEIGHBOR_MIX]
+    for i in range(neighbor_count):
+        # Pick neighbor type and fill in the template.
+        template = rng.choices(templates, weights)[0]
+        if template is SWITCH_BLOCK:
+            hostname = f"{'Device' if device_hostnames and i % 10 == 0 else 'idf'}-{switch_index}-{i}.example.net"
+        elif template is AP_BLOCK:
+            hostname = f"AP{switch_index:02d}{i:04d}"
+        elif template is PHONE_BLOCK:
+            hostname = f"SEP{rng.getrandbits(48):012X}"
+        else:
+            hostname = f"axis-{rng.getrandbits(24):06x}"
+        blocks.append(template.format(
+            hostname=hostname,
+            ip_addr=f"10.{switch_index + 1}.{i // 250}.{i % 250 + 1}",
+            model=rng.choice(SWITCH_MODELS),
+            interface=f"GigabitEthernet{i // 48 + 1}/0/{i % 48 + 1}",
+            port=f"TenGigabitEthernet1/1/{rng.randint(1, 4)}",
+            holdtime=rng.randint(120, 179)))
+
+    return "".join(blocks) + f"\nTotal cdp entries displayed : {neighbor_count}\n"
+
+def make_corpus(switch_count=DEFAULT_SWITCHES, neighbor_count=DEFAULT_NEIGHBORS, seed=DEFAULT_SEED, device_hostnames=False) -> list:
+    """
+    Builds a corpus of distribution switch outputs.
+
+    Parameters:
+    -----------
+        switch_count - How many switch outputs to build.
+        neighbor_count - How many neighbors each switch has.
+        seed - The random seed, so runs are repeatable.
+        device_hostnames - Whether to put the word Device in some hostnames.
+
+    Returns:
+    --------
+        list - One output string per switch.
+    """
+    rng = random.Random(seed)
+
+    return [make_distribution_output(i, neighbor_count, rng, device_hostnames) for i in range(switch_count)]
+
+def load_corpus(directory) -> list:
+    """
+    Loads recorded show cdp neighbors detail outputs, one per file.
+
+    Parameters:
+    -----------
+        directory - The folder the outputs were saved in.
+
+    Returns:
+    --------
+        list - One output string per file, sorted by filename.
+    """
+    corpus = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(CORPUS_EXTENSION):
+            with open(os.path.join(directory, filename), "r", encoding="utf-8") as file:
+                corpus.append(file.read())
+
+    return corpus
+
+def save_corpus(corpus, directory) -> None:
+    """
+    Writes a corpus to a folder, one file per switch.
+
+    Parameters:
+    -----------
+        corpus - The output strings.
+        directory - The folder to write to.
+
+    Returns:
+    --------
+        Nothing
+    """
+    os.makedirs(directory, exist_ok=True)
+    for i, output in enumerate(corpus):
+        with open(os.path.join(directory, f"switch_{i:03d}{CORPUS_EXTENSION}"), "w", encoding="utf-8") as file:
+            file.write(output)
+
+def main() -> None:
+    """
+    Writes a generated corpus to disk so it can be inspected or replaced with real recordings.
+    """
+    # Get options.
+    parser = argparse.ArgumentParser(description="Generate a show cdp neighbors detail corpus.")
+    parser.add_argument("directory")
+    parser.add_argument("--switches", type=int, default=DEFAULT_SWITCHES)
+    parser.add_argument("--neighbors", type=int, default=DEFAULT_NEIGHBORS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    save_corpus(make_corpus(args.switches, args.neighbors, args.seed), args.directory)
+    print(f"Wrote {args.switches} outputs with {args.neighbors} neighbors each to {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
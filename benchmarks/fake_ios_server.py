@@ -0,0 +1,285 @@
+# Import required packages.
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+
+import asyncssh
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.cdp_corpus import PHONE_BLOCK, SWITCH_BLOCK, SWITCH_MODELS
+
+# Create constants.
+DEFAULT_PORT = 8022
+DEFAULT_SWITCHES = 500
+DEFAULT_FANOUT = 4
+DEFAULT_PHONES = 20
+DEFAULT_USERNAME = "admin"
+DEFAULT_PASSWORD = "admin"
+DEFAULT_SECRET = "enable"
+# Every fake switch gets its own loopback address, so one server can stand in for the whole network.
+ADDRESS_PREFIX = "127.1"
+
+
+def get_switch_address(index) -> str:
+    """
+    Returns the loopback address of a fake switch.
+
+    Parameters:
+    -----------
+        index - The switch number, 0 is the root.
+
+    Returns:
+    --------
+        str - The address.
+    """
+    return f"{ADDRESS_PREFIX}.{index // 250}.{index % 250 + 1}"
+
+def get_switch_index(address) -> int:
+    """
+    Returns which fake switch an address belongs to.
+
+    Parameters:
+    -----------
+        address - The address the client connected to.
+
+    Returns:
+    --------
+        int - The switch number, or None if the address isn't a fake switch.
+    """
+    parts = address.split(".")
+    if len(parts) != 4 or ".".join(parts[:2]) != ADDRESS_PREFIX:
+        return None
+
+    return int(parts[2]) * 250 + int(parts[3]) - 1
+
+
+class FakeIosServer():
+    """
+    An asyncssh server that pretends to be a tree of IOS switches, one per 127.1.x.y address. Each switch has a user and
+    priviledged prompt, an enable secret, and answers show cdp neighbors detail with its parent, its children, and some
+    phones. Logins and commands can be slowed down to look more like real switches and their TACACS server.
+    """
+    def __init__(self, switch_count=DEFAULT_SWITCHES, fanout=DEFAULT_FANOUT, phone_count=DEFAULT_PHONES, port=DEFAULT_PORT, username=DEFAULT_USERNAME, password=DEFAULT_PASSWORD, secret=DEFAULT_SECRET, login_delay=0.0, command_delay=0.0) -> None:
+        # Create class variables and objects.
+        self.switch_count = switch_count
+        self.fanout = fanout
+        self.phone_count = phone_count
+        self.port = port
+        self.username = username
+        self.password = password
+        self.secret = secret
+        self.login_delay = login_delay
+        self.command_delay = command_delay
+        self.server = None
+        self.outputs = {}
+        # Metrics.
+        self.open_sessions = 0
+        self.peak_sessions = 0
+        self.logins = 0
+
+    def get_neighbors(self, index) -> list:
+        """
+        Returns the switches next to a switch in the tree.
+
+        Parameters:
+        -----------
+            index - The switch number.
+
+        Returns:
+        --------
+            list - The neighbor switch numbers, parent first.
+        """
+        neighbors = [(index - 1) // self.fanout] if index > 0 else []
+        neighbors += [child for child in range(index * self.fanout + 1, index * self.fanout + self.fanout + 1) if child < self.switch_count]
+
+        return neighbors
+
+    def get_cdp_output(self, index) -> str:
+        """
+        Builds a switch's show cdp neighbors detail output. Built once per switch and kept.
+
+        Parameters:
+        -----------
+            index - The switch number.
+
+        Returns:
+        --------
+            str - The command output.
+        """
+        if index in self.outputs:
+            return self.outputs[index]
+
+        rng = random.Random(index)
+        blocks = []
+        for port, neighbor in enumerate(self.get_neighbors(index)):
+            blocks.append(SWITCH_BLOCK.format(hostname=f"sw-{neighbor}.example.net", ip_addr=get_switch_address(neighbor), model=rng.choice(SWITCH_MODELS), interface=f"TenGigabitEthernet1/1/{port + 1}", port=f"TenGigabitEthernet1/1/{rng.randint(1, 4)}", holdtime=rng.randint(120, 179)))
+        for port in range(self.phone_count):
+            blocks.append(PHONE_BLOCK.format(hostname=f"SEP{rng.getrandbits(48):012X}", ip_addr=f"10.{100 + index // 250}.{index % 250}.{port + 1}", interface=f"GigabitEthernet1/0/{port + 1}", holdtime=rng.randint(120, 179)))
+        output = "".join(blocks) + f"\nTotal cdp entries displayed : {len(blocks)}\n"
+        self.outputs[index] = output
+
+        return output
+
+    def run_command(self, index, command) -> str:
+        """
+        Returns a switch's output for a command.
+
+        Parameters:
+        -----------
+            index - The switch number.
+            command - The command line.
+
+        Returns:
+        --------
+            str - The command output.
+        """
+        if command.startswith("terminal") or len(command) <= 0:
+            return ""
+        if command.startswith("show cdp neighbors detail | include"):
+            keywords = command.split("include", 1)[1].strip().split("|")
+            return "\n".join(line for line in self.get_cdp_output(index).splitlines() if any(keyword in line for keyword in keywords))
+        if command.startswith("show cdp neighbors detail"):
+            return self.get_cdp_output(index)
+
+        return "                ^\n% Invalid input detected at '^' marker.\n"
+
+    async def handle_process(self, process) -> None:
+        """
+        Runs one switch shell.
+
+        Parameters:
+        -----------
+            process - The asyncssh server process.
+
+        Returns:
+        --------
+            Nothing
+        """
+        index = get_switch_index(process.get_extra_info("sockname")[0])
+        hostname = f"sw-{index}"
+        privileged = False
+        self.open_sessions += 1
+        self.peak_sessions = max(self.peak_sessions, self.open_sessions)
+        try:
+            process.stdout.write(f"\n{hostname}>")
+            while True:
+                line = await process.stdin.readline()
+                if len(line) <= 0:
+                    break
+                command = line.strip()
+                if command in ("exit", "logout"):
+                    break
+                if command == "enable" and not privileged:
+                    # Ask for the secret without echoing it.
+                    process.channel.set_echo(False)
+                    process.stdout.write("Password: ")
+                    secret = (await process.stdin.readline()).strip()
+                    process.channel.set_echo(True)
+                    if secret == self.secret:
+                        privileged = True
+                    else:
+                        process.stdout.write("\n% Bad secrets\n")
+                else:
+                    if self.command_delay > 0:
+                        await asyncio.sleep(self.command_delay)
+                    output = self.run_command(index, command)
+                    if len(output) > 0:
+                        process.stdout.write(output + "\n")
+                process.stdout.write(f"{hostname}{'#' if privileged else '>'}")
+        except (asyncssh.BreakReceived, asyncssh.TerminalSizeChanged, asyncssh.DisconnectError, ConnectionError):
+            pass
+        finally:
+            self.open_sessions -= 1
+            process.exit(0)
+
+    async def start(self) -> None:
+        """
+        Starts listening on every address.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        server = self
+
+        class FakeSwitchAuth(asyncssh.SSHServer):
+            """
+            Checks the login against the fake switches credentials.
+            """
+            def begin_auth(self, username) -> bool:
+                return True
+
+            def password_auth_supported(self) -> bool:
+                return True
+
+            async def validate_password(self, username, password) -> bool:
+                if server.login_delay > 0:
+                    await asyncio.sleep(server.login_delay)
+                server.logins += 1
+                return username == server.username and password == server.password
+
+        host_key = asyncssh.generate_private_key("ssh-ed25519")
+        self.server = await asyncssh.create_server(FakeSwitchAuth, "", self.port, server_host_keys=[host_key], process_factory=self.handle_process, backlog=4096)
+
+    async def stop(self) -> None:
+        """
+        Stops listening and closes every session.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def raise_open_file_limit() -> None:
+    """
+    Raises the open file limit as far as it goes. Every session is a socket, and the default 1024 isn't enough.
+    """
+    soft_limit, hard_limit = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard_limit, hard_limit))
+
+async def serve(args) -> None:
+    """
+    Runs the server until it's killed.
+    """
+    server = FakeIosServer(args.switches, args.fanout, args.phones, args.port, login_delay=args.login_delay, command_delay=args.command_delay)
+    await server.start()
+    print(f"Serving {args.switches} fake switches on {get_switch_address(0)}-{get_switch_address(args.switches - 1)} port {args.port}", flush=True)
+    await asyncio.Event().wait()
+
+def main() -> None:
+    """
+    Runs the fake switches from the command line, so benchmarks can use them from another process.
+    """
+    # Get options.
+    parser = argparse.ArgumentParser(description="Serve a tree of fake IOS switches over SSH.")
+    parser.add_argument("--switches", type=int, default=DEFAULT_SWITCHES)
+    parser.add_argument("--fanout", type=int, default=DEFAULT_FANOUT)
+    parser.add_argument("--phones", type=int, default=DEFAULT_PHONES)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--login-delay", type=float, default=0.0)
+    parser.add_argument("--command-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
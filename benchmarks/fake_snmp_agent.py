@@ -0,0 +1,284 @@
+# Import required packages.
+import argparse
+import asyncio
+import bisect
+import os
+import random
+import sys
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto.api import v2c
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.fake_ios_server import ADDRESS_PREFIX, DEFAULT_FANOUT, DEFAULT_PHONES, DEFAULT_SWITCHES, get_switch_address, raise_open_file_limit
+from benchmarks.cdp_corpus import SWITCH_MODELS
+from utils.snmp_discovery import CDP_CACHE_ADDRESS, CDP_CACHE_ADDRESS_TYPE, CDP_CACHE_CAPABILITIES, CDP_CACHE_DEVICE_ID, CDP_CACHE_DEVICE_PORT, CDP_CACHE_ENTRY_OID, CDP_CACHE_PLATFORM, CDP_CACHE_VERSION, ENT_SERIAL_OID, IF_NAME_OID, SYS_DESCR_OID, SYS_NAME_OID
+
+# Create constants.
+DEFAULT_PORT = 8161
+DEFAULT_COMMUNITY = "public"
+MAX_DATAGRAM_SIZE = 65507
+SWITCH_VERSION = "Cisco IOS Software [Fuji], Catalyst L3 Switch Software (CAT9K_IOSXE), Version 16.9.5, RELEASE SOFTWARE (fc1)"
+PHONE_VERSION = "SIP88xx.14-1-1-0001-136"
+# Router Switch IGMP, and Host Phone, as cdpCacheCapabilities bitmasks.
+SWITCH_CAPABILITIES = 0x29
+PHONE_CAPABILITIES = 0x90
+
+
+def parse_oid(oid) -> tuple:
+    """
+    Turns a dotted OID into a tuple of ints.
+
+    Parameters:
+    -----------
+        oid - The dotted OID.
+
+    Returns:
+    --------
+        tuple - The OID parts.
+    """
+    return tuple(int(part) for part in oid.split("."))
+
+
+class FakeSnmpAgent():
+    """
+    An SNMPv2c responder that pretends to be the same tree of IOS switches as fake_ios_server.py, one per 127.1.x.y
+    address. Each switch answers GET, GETNEXT and GETBULK for its system name and description, chassis serial, ifName,
+    and a CISCO-CDP-MIB cdpCacheTable with its parent, its children, and some phones. Leaf switches can be made to answer
+    with an empty CDP table, to check they're treated as having no neighbors instead of as SNMP failures.
+    """
+    def __init__(self, switch_count=DEFAULT_SWITCHES, fanout=DEFAULT_FANOUT, phone_count=DEFAULT_PHONES, port=DEFAULT_PORT, community=DEFAULT_COMMUNITY, empty_leaves=False) -> None:
+        # Create class variables and objects.
+        self.switch_count = switch_count
+        self.fanout = fanout
+        self.phone_count = phone_count
+        self.port = port
+        self.community = community
+        self.empty_leaves = empty_leaves
+        self.transports = []
+        self.mibs = {}
+        # Metrics.
+        self.requests = 0
+
+    def get_neighbors(self, index) -> list:
+        """
+        Returns the switches next to a switch in the tree.
+
+        Parameters:
+        -----------
+            index - The switch number.
+
+        Returns:
+        --------
+            list - The neighbor switch numbers, parent first.
+        """
+        neighbors = [(index - 1) // self.fanout] if index > 0 else []
+        neighbors += [child for child in range(index * self.fanout + 1, index * self.fanout + self.fanout + 1) if child < self.switch_count]
+
+        return neighbors
+
+    def get_mib(self, index) -> tuple:
+        """
+        Builds a switch's MIB. Built once per switch and kept.
+
+        Parameters:
+        -----------
+            index - The switch number.
+
+        Returns:
+        --------
+            tuple - The sorted oid tuples and an oid -> value dictionary.
+        """
+        if index in self.mibs:
+            return self.mibs[index]
+
+        rng = random.Random(index)
+        values = {
+            parse_oid(SYS_NAME_OID): v2c.OctetString(f"sw-{index}.example.net"),
+            parse_oid(SYS_DESCR_OID): v2c.OctetString(SWITCH_VERSION),
+            parse_oid(ENT_SERIAL_OID): v2c.OctetString(f"FOC{index:08d}")
+        }
+
+        # Leaves answer with an empty table if asked to.
+        neighbors = self.get_neighbors(index)
+        is_leaf = index * self.fanout + 1 >= self.switch_count
+        if not (self.empty_leaves and is_leaf):
+            # One row per neighbor, indexed by ifIndex.deviceIndex like a real switch.
+            rows = []
+            for port, neighbor in enumerate(neighbors):
+                rows.append((1001 + port, f"TenGigabitEthernet1/1/{port + 1}", f"sw-{neighbor}.example.net", get_switch_address(neighbor), f"cisco {rng.choice(SWITCH_MODELS)}", SWITCH_VERSION, f"TenGigabitEthernet1/1/{rng.randint(1, 4)}", SWITCH_CAPABILITIES))
+            for port in range(self.phone_count):
+                rows.append((port + 1, f"GigabitEthernet1/0/{port + 1}", f"SEP{rng.getrandbits(48):012X}", f"10.{100 + index // 250}.{index % 250}.{port + 1}", "Cisco IP Phone 8845", PHONE_VERSION, "Port 1", PHONE_CAPABILITIES))
+            for if_index, if_name, device_id, ip_addr, platform, version, device_port, capabilities in rows:
+                values[IF_NAME_OID + (if_index,)] = v2c.OctetString(if_name)
+                row_index = (if_index, 1)
+                values[CDP_CACHE_ENTRY_OID + (CDP_CACHE_ADDRESS_TYPE,) + row_index] = v2c.Integer(1)
+                values[CDP_CACHE_ENTRY_OID + (CDP_CACHE_ADDRESS,) + row_index] = v2c.OctetString(bytes(int(octet) for octet in ip_addr.split(".")))
+                values[CDP_CACHE_ENTRY_OID + (CDP_CACHE_VERSION,) + row_index] = v2c.OctetString(version)
+                values[CDP_CACHE_ENTRY_OID + (CDP_CACHE_DEVICE_ID,) + row_index] = v2c.OctetString(device_id)
+                values[CDP_CACHE_ENTRY_OID + (CDP_CACHE_DEVICE_PORT,) + row_index] = v2c.OctetString(device_port)
+                values[CDP_CACHE_ENTRY_OID + (CDP_CACHE_PLATFORM,) + row_index] = v2c.OctetString(platform)
+                values[CDP_CACHE_ENTRY_OID + (CDP_CACHE_CAPABILITIES,) + row_index] = v2c.OctetString(capabilities.to_bytes(4, "big"))
+
+        mib = (sorted(values), values)
+        self.mibs[index] = mib
+
+        return mib
+
+    def get_next(self, mib, oid) -> tuple:
+        """
+        Returns the first oid after the given one and its value.
+
+        Parameters:
+        -----------
+            mib - The switch's sorted oids and values.
+            oid - The oid tuple to start after.
+
+        Returns:
+        --------
+            tuple - The next oid and its value, or the same oid and endOfMibView at the end.
+        """
+        oids, values = mib
+        position = bisect.bisect_right(oids, oid)
+        if position >= len(oids):
+            return oid, v2c.EndOfMibView()
+
+        return oids[position], values[oids[position]]
+
+    def respond(self, index, data) -> bytes:
+        """
+        Answers one request datagram.
+
+        Parameters:
+        -----------
+            index - The switch number the request was sent to.
+            data - The request datagram.
+
+        Returns:
+        --------
+            bytes - The response datagram, or None to drop the request.
+        """
+        # Drop anything that isn't v2c with our community, like a real agent.
+        try:
+            message, _ = decoder.decode(data, asn1Spec=v2c.Message())
+        except Exception:
+            return None
+        if str(v2c.apiMessage.get_community(message)) != self.community:
+            return None
+        self.requests += 1
+
+        # Look up the requested oids.
+        mib = self.get_mib(index)
+        request = v2c.apiMessage.get_pdu(message)
+        oids = [tuple(oid) for oid, _ in v2c.apiPDU.get_varbinds(request)]
+        var_binds = []
+        if request.isSameTypeWith(v2c.GetRequestPDU()):
+            var_binds = [(oid, mib[1].get(oid, v2c.NoSuchInstance())) for oid in oids]
+        elif request.isSameTypeWith(v2c.GetNextRequestPDU()):
+            var_binds = [self.get_next(mib, oid) for oid in oids]
+        elif request.isSameTypeWith(v2c.GetBulkRequestPDU()):
+            non_repeaters = int(v2c.apiBulkPDU.get_non_repeaters(request))
+            max_repetitions = int(v2c.apiBulkPDU.get_max_repetitions(request))
+            var_binds = [self.get_next(mib, oid) for oid in oids[:non_repeaters]]
+            repeaters = oids[non_repeaters:]
+            for _ in range(max_repetitions if len(repeaters) > 0 else 0):
+                row = [self.get_next(mib, oid) for oid in repeaters]
+                var_binds += row
+                # Stop early once every column ran off the end.
+                if all(isinstance(value, v2c.EndOfMibView) for _, value in row):
+                    break
+                repeaters = [oid for oid, _ in row]
+        else:
+            return None
+
+        # Build response.
+        response_message = v2c.apiMessage.get_response(message)
+        v2c.apiPDU.set_varbinds(v2c.apiMessage.get_pdu(response_message), var_binds)
+
+        return encoder.encode(response_message)
+
+    async def start(self) -> None:
+        """
+        Starts listening on every switch address. UDP can't tell which address a datagram was sent to on a wildcard
+        socket, so each switch gets its own.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        agent = self
+
+        class FakeSwitchProtocol(asyncio.DatagramProtocol):
+            """
+            Answers the datagrams sent to one switch.
+            """
+            def __init__(self, index) -> None:
+                self.index = index
+                self.transport = None
+
+            def connection_made(self, transport) -> None:
+                self.transport = transport
+
+            def datagram_received(self, data, addr) -> None:
+                response = agent.respond(self.index, data)
+                if response is not None and len(response) <= MAX_DATAGRAM_SIZE:
+                    self.transport.sendto(response, addr)
+
+        loop = asyncio.get_running_loop()
+        for index in range(self.switch_count):
+            transport, _ = await loop.create_datagram_endpoint(lambda index=index: FakeSwitchProtocol(index), local_addr=(get_switch_address(index), self.port))
+            self.transports.append(transport)
+
+    def stop(self) -> None:
+        """
+        Closes every switch's socket.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        for transport in self.transports:
+            transport.close()
+        self.transports.clear()
+
+
+async def serve(args) -> None:
+    """
+    Runs the agent until it's killed.
+    """
+    agent = FakeSnmpAgent(args.switches, args.fanout, args.phones, args.port, args.community, args.empty_leaves)
+    await agent.start()
+    print(f"Serving {args.switches} fake SNMP agents on {get_switch_address(0)}-{get_switch_address(args.switches - 1)} port {args.port}", flush=True)
+    await asyncio.Event().wait()
+
+def main() -> None:
+    """
+    Runs the fake agents from the command line, so benchmarks can use them from another process.
+    """
+    # Get options.
+    parser = argparse.ArgumentParser(description=f"Serve a tree of fake IOS SNMP agents on {ADDRESS_PREFIX}.x.y.")
+    parser.add_argument("--switches", type=int, default=DEFAULT_SWITCHES)
+    parser.add_argument("--fanout", type=int, default=DEFAULT_FANOUT)
+    parser.add_argument("--phones", type=int, default=DEFAULT_PHONES)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--community", default=DEFAULT_COMMUNITY)
+    parser.add_argument("--empty-leaves", action="store_true", help="Leaf switches answer with an empty CDP table.")
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -12,7 +12,11 @@ from typing import Tuple
 import netmiko
 
 from interface.popup_window import ListPopup, MultipleListPopup, text_popup
-from utils.open_connection import get_config_info, ssh_autodetect_switchlist_info, ssh_telnet
+from utils.open_connection import get_config_info, ssh_autodetect_switchlist_info
+from utils.running_config import RunningConfig
+from utils.session_manager import session_manager
+from utils.session_registry import session_registry
+from utils.ping import reachability_cache
 
 
 # Create Configure UI window class.
@@ -30,6 +34,8 @@ class ConfigureUI:
         self.retrieving_devices = False
         self.enable_telnet = False
         self.force_telnet = False
+        self.ping_finished = None
+        self.device_hints = {}
         self.grid_size = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]
         self.font = "antiqueolive"
 
@@ -76,12 +82,18 @@ class ConfigureUI:
         # This serves as a temp var used by many things, anytime a popup window that is destroyable is made, it's stored here.
         self.popup = None
 
-    def run(self, ips, usernames, passwords, enable_secrets, enable_telnet, force_telnet) -> None:
+    def run(self, ips, usernames, passwords, enable_secrets, enable_telnet, force_telnet, ping_finished=None) -> None:
         """
         Call this function to start UI window in a new thread.
+
+        Parameters:
+        -----------
+            ips - The list that ping results are streamed into.
+            ping_finished - An optional threading.Event that is set once every ping result is in the ips list.
         """
         # Set ip list var.
         self.ip_list = ips
+        self.ping_finished = ping_finished
         # Set username and password var.
         self.usernames = usernames
         self.passwords = passwords
@@ -308,10 +320,12 @@ class ConfigureUI:
 
         # Check if a valid choice has been made.
         if device_index != -1 and (self.ssh_connections[device_index] is None or not self.ssh_connections[device_index].is_alive()):
-            # Open ssh connection with switch.
-            connection = ssh_telnet(device, self.enable_telnet, self.force_telnet, store_config_info=True)
+            # Open ssh connection with switch. The session manager owns it and keeps it alive from here on.
+            connection = session_manager.open(device, self.enable_telnet, self.force_telnet, store_config_info=True)
             # Store the new connection in the ssh connections list.
             self.ssh_connections[device_index] = connection
+        # Don't let the selected device's session be closed for being idle.
+        session_manager.set_active(device["ip_address"])
 
         #######################################################################
         # Update config window component data with the new device.
@@ -1562,24 +1576,9 @@ class ConfigureUI:
         if connection.is_alive():
             # The send_config_set method is very jank and breaks often between netmiko updates.
             try:
-                # Split the config up by !.
-                config = re.split("!+", config)
-                # Cutoff the last configured by text.
-                config = config[3:]
-                # Compare the new and old config and only run whats changed.
-                diff = []
-                for section in config:
-                    # If the current line in the textbox config doesn't exist in the running config, then append to new list.
-                    if not section in device["config"]:
-                        # Append to list.
-                        diff.append(section)
-
-                # Turn the list back into a string
-                commands = ""
-                for command in diff:
-                    commands += command
-                # Split the difference list up by newlines.
-                commands = re.split("\n+", commands)
+                # Compare the textbox config with the parsed running config and only run whats changed. Comments like the
+                # last configured by text are skipped by the parser.
+                commands = RunningConfig(config).get_changes(device["running_config"])
                 # Add config command to command list and end to end of command list. Must do this stuff manually for now because netmiko is brokey.
                 commands.insert(0, "config t")
 
@@ -1610,11 +1609,12 @@ class ConfigureUI:
             Nothing
         """
         # Update device dictionary after uploading config.
-        interfaces, vlans, config = get_config_info(connection)
+        interfaces, vlans, running_config = get_config_info(connection)
         # Store info in device dictionary.
         device["interfaces"] = interfaces
         device["vlans"] = vlans
-        device["config"] = config
+        device["config"] = running_config.text
+        device["running_config"] = running_config
 
         # Check if name and decription keys exist for every device in the list.
         # if all(True if "name" in interface and "decription" in interface else False for interface in device["interfaces"]):
@@ -1626,7 +1626,7 @@ class ConfigureUI:
         self.vlan_drop_down["values"] = [vlan["vlan"] + " " + vlan["name"] for vlan in self.vlans_list]
         # Update config textbox component.
         self.text_box.delete("1.0", tk.END)
-        self.text_box.insert(tk.END, config)
+        self.text_box.insert(tk.END, running_config.text)
 
     def update_window(self) -> None:
         """
@@ -1640,8 +1640,8 @@ class ConfigureUI:
         --------
             Nothing
         """
-        # Wait until we get ip info, then initialize window.
-        if not self.window_is_initialized and len(self.ip_list) > 0 and not all(ip is None for ip in self.ip_list) and not all(ip[0] is False for ip in self.ip_list):
+        # Wait until we get all ip info, then initialize window. Ping results are streamed in, so don't start on the first one.
+        if not self.window_is_initialized and (self.ping_finished is None or self.ping_finished.is_set()) and len(self.ip_list) > 0 and not all(ip is None for ip in self.ip_list) and not all(ip[0] is False for ip in self.ip_list):
             # If the list does not contain tuples that store if the ping was successful then move on.
             if isinstance(self.ip_list[0], Tuple):
                 # Remove all ips that are unreachable.
@@ -1649,6 +1649,13 @@ class ConfigureUI:
                 for addr in self.ip_list:
                     if addr is not None and addr[0] is True:
                         ips.append(f"{addr[1]} {addr[2]}")
+                        # TCP probes also tell us what kind of device it is. Fall back to a hint from an earlier sweep.
+                        if len(addr) > 3 and addr[3] is not None:
+                            self.device_hints[addr[1]] = addr[3]
+                        else:
+                            cached = reachability_cache.get(addr[1], require_hint=True)
+                            if cached is not None and cached["device_hint"] is not None:
+                                self.device_hints[addr[1]] = cached["device_hint"]
 
                 # Remove duplicate entries.
                 ips = list(dict.fromkeys(ips))
@@ -1675,7 +1682,7 @@ class ConfigureUI:
                         addresses.append(temp)
                     
                     # Now that we have a good list of IPs, get device info about each one.
-                    Thread(target=ssh_autodetect_switchlist_info, args=(self.usernames, self.passwords, self.enable_secrets, self.enable_telnet, self.force_telnet, addresses, self.devices)).start()
+                    Thread(target=ssh_autodetect_switchlist_info, args=(self.usernames, self.passwords, self.enable_secrets, self.enable_telnet, self.force_telnet, addresses, self.devices, self.device_hints)).start()
 
                     # Set toggle.
                     self.retrieving_devices = True
@@ -1692,6 +1699,8 @@ class ConfigureUI:
                             hostname = device["host"]
                             device = f"{addr[0]} {hostname}"
                             self.ip_list[i] = device
+                            # Remember the real hostname for the next time the window is opened.
+                            reachability_cache.store(addr[0], True, hostname=hostname)
 
                     # Set length of ssh_connection list to the same as devices.
                     self.ssh_connections = [None] * len(self.devices)
@@ -1778,6 +1787,9 @@ class ConfigureUI:
         # Clear arrays.
         self.ip_list.clear()
         self.devices.clear()
+        self.device_hints = {}
+        # Close the autodetect sessions nobody picked.
+        session_registry.close_all()
         # Close any popup windows.
         if self.popup is not None and self.popup.get_is_window_open():
             # Close window.
@@ -1789,10 +1801,9 @@ class ConfigureUI:
             # Set toggle.
             self.window_is_initialized = False
 
-            # Attempt to nicely close all ssh connections.
-            for connection in self.ssh_connections:
-                if connection is not None and connection.is_alive():
-                    connection.disconnect()
+            # Attempt to nicely close all ssh connections. The session manager hangs up on every switch at once.
+            session_manager.close_all()
+            self.ssh_connections.clear()
 
             # Destroy window.
             self.window.destroy()
@@ -3,7 +3,7 @@ import os
 import sys
 import webbrowser
 import tkinter as tk
-from threading import Thread
+from threading import Event, Thread
 from tkinter import messagebox
 from tkinter import font
 
@@ -14,8 +14,17 @@ from interface.popup_window import MultipleCheckboxPopup
 from utils.open_connection import ssh_autodetect_info
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils.net_crawl import cdp_auto_discover, clear_discoveries
-from utils.ping import ping_of_death
+from utils.async_transport import AsyncSshTransport
+from utils.crawl_scope import parse_crawl_scope
+from utils.crawl_snapshot import crawl_snapshot
+from utils.credential_cache import credential_affinity
+from utils.device_type_cache import device_type_cache
+from utils.host_failure_cache import host_failure_cache
+from utils.license_strategy import license_strategy_cache
+from utils.monitor import ReachabilityMonitor
+from utils.net_crawl import DiscoverySession
+from utils.snmp_discovery import SnmpDiscoveryEngine
+from utils.ping import PROBE_ICMP, PROBE_TCP, ping_of_death
 
 
 # Create MainUI class.
@@ -43,6 +52,12 @@ class MainUI():
         self.export_permission_error = False
         self.enable_telnet_check = None
         self.force_telnet_check = None
+        self.tcp_probe_check = None
+        self.async_ssh_check = None
+        self.monitor = None
+        self.monitor_button = None
+        self.snmp_community_entry = None
+        self.crawl_scope_entry = None
 
         # Open log file for displaying in console window.
         self.log_file = open("logs/latest.log", "r", encoding="utf-8")
@@ -83,6 +98,8 @@ class MainUI():
         # Create checkbox variables.
         self.enable_telnet_check = tk.BooleanVar(self.window)
         self.force_telnet_check = tk.BooleanVar(self.window)
+        self.tcp_probe_check = tk.BooleanVar(self.window)
+        self.async_ssh_check = tk.BooleanVar(self.window)
 
         # Setup window grid layout.
         self.window.rowconfigure(self.grid_size, weight=1, minsize=50)
@@ -140,6 +157,24 @@ class MainUI():
         button_ping = tk.Button(master=load_switch_config_frame, text="Ping Check", foreground="black", background="white", command=self.mass_ping_button_callback)
         button_ping.grid(row=6, rowspan=5, column=9, sticky=tk.NSEW)
 
+        # Populate quick push frame.
+        self.monitor_button = tk.Button(master=quick_push_frame, text="Start Monitor", foreground="black", background="white", command=self.monitor_button_callback)
+        self.monitor_button.grid(row=0, rowspan=4, column=0, columnspan=2, sticky=tk.NSEW)
+        monitor_label = tk.Label(master=quick_push_frame, text="(Re-pings every IP in the textbox on a timer and logs only the ones that go up or down.)")
+        monitor_label.grid(row=0, rowspan=4, column=2, columnspan=8, sticky=tk.W)
+        snmp_community_label = tk.Label(master=quick_push_frame, text="SNMP Community:")
+        snmp_community_label.grid(row=4, rowspan=3, column=0, columnspan=2, sticky=tk.W)
+        self.snmp_community_entry = tk.Entry(master=quick_push_frame, show="*", width=10)
+        self.snmp_community_entry.grid(row=4, rowspan=3, column=2, columnspan=2, sticky=tk.EW)
+        snmp_community_hint = tk.Label(master=quick_push_frame, text="(Optional. Auto Discover reads CDP over SNMP and only logs in where SNMP fails.)")
+        snmp_community_hint.grid(row=4, rowspan=3, column=4, columnspan=6, sticky=tk.W)
+        crawl_scope_label = tk.Label(master=quick_push_frame, text="Crawl Scope:")
+        crawl_scope_label.grid(row=7, rowspan=3, column=0, columnspan=2, sticky=tk.W)
+        self.crawl_scope_entry = tk.Entry(master=quick_push_frame, width=10)
+        self.crawl_scope_entry.grid(row=7, rowspan=3, column=2, columnspan=2, sticky=tk.EW)
+        crawl_scope_hint = tk.Label(master=quick_push_frame, text="(Optional. Example: 10.1.0.0/16 !10.1.99.0/24 hops=4 minutes=10 devices=200)")
+        crawl_scope_hint.grid(row=7, rowspan=3, column=4, columnspan=6, sticky=tk.W)
+
         # Populate login creds frame.
         creds_title = tk.Label(master=self.creds_frame, text="Login Credentials", font=(self.font, 18))
         creds_title.grid(row=0, column=0, columnspan=6, sticky=tk.W)
@@ -147,6 +182,10 @@ class MainUI():
         enable_telnet_checkbox.grid(row=1, rowspan=1, column=8, columnspan=1, sticky=tk.E)
         force_telnet_checkbox = tk.Checkbutton(master=self.creds_frame, text="Force Telnet", variable=self.force_telnet_check, onvalue=True, offvalue=False)
         force_telnet_checkbox.grid(row=1, rowspan=1, column=9, columnspan=1, sticky=tk.E)
+        tcp_probe_checkbox = tk.Checkbutton(master=self.creds_frame, text="TCP Probe (22/23)", variable=self.tcp_probe_check, onvalue=True, offvalue=False)
+        tcp_probe_checkbox.grid(row=1, rowspan=1, column=7, columnspan=1, sticky=tk.E)
+        async_ssh_checkbox = tk.Checkbutton(master=self.creds_frame, text="Async SSH", variable=self.async_ssh_check, onvalue=True, offvalue=False)
+        async_ssh_checkbox.grid(row=1, rowspan=1, column=6, columnspan=1, sticky=tk.E)
         creds_title = tk.Label(master=self.creds_frame, text="(Enable secret is not required if enable mode is default for vty connections.)")
         creds_title.grid(row=0, column=6, columnspan=4, sticky=tk.E)
         add_cred_button = tk.Button(master=self.creds_frame, text="Add Creds", foreground="black", background="white", command=self.add_creds_callback)
@@ -271,6 +310,14 @@ class MainUI():
         if any(len(entry.get()) > 0 for entry in self.password_entrys):
             # Check if auto discover has already been started.
             if not self.already_auto_discovering:
+                # Check the crawl scope before anything else, so a typo doesn't crawl the whole network.
+                try:
+                    scope = parse_crawl_scope(self.crawl_scope_entry.get())
+                except ValueError as error:
+                    # Print log and show messagebox.
+                    self.logger.warning(f"Invalid crawl scope: {error}")
+                    messagebox.showerror(title="Invalid Crawl Scope", message=f"The crawl scope couldn't be read: {error}")
+                    return
                 # Ask user if they want to export extra info.
                 export_data_prompt = messagebox.askyesno(title="Export Data?", message="Would you like to export the discovered switch data to a CSV file? It may take longer for discovery to run.")
                 # If they are exporting data, then ask what data they want.
@@ -280,8 +327,6 @@ class MainUI():
                     popup = MultipleCheckboxPopup()
                     # Open the popup and get the return values.
                     export_data_selections = popup.open(["ROUTER", "SWITCH", "WIRELESS AP", "IP PHONE", "CAMERA"], default_check_value=True, prompt="Choose the devices you want to graph: ")
-                # Clear data lists from discover module.
-                clear_discoveries()
                 # Get username and password lists.
                 usernames = [username.get() for username in self.username_entrys]
                 passwords = [password.get() for password in self.password_entrys]
@@ -314,7 +359,7 @@ class MainUI():
                 # Only continue if the first switch login was successful.
                 if auth_success:
                     # Start backprocess for auto discover.
-                    Thread(target=self.auto_discover_back_process, args=(text, usernames, passwords, enable_secrets, self.enable_telnet_check.get(), self.force_telnet_check.get(), export_data_prompt, export_data_selections)).start()
+                    Thread(target=self.auto_discover_back_process, args=(text, usernames, passwords, enable_secrets, self.enable_telnet_check.get(), self.force_telnet_check.get(), export_data_prompt, export_data_selections, self.snmp_community_entry.get(), scope, self.async_ssh_check.get())).start()
                     # Set safety toggle.
                     self.already_auto_discovering = True
                     # Print log.
@@ -333,12 +378,53 @@ class MainUI():
             self.logger.warning("You must enter username and password credentials. Otherwise, I can't log into the switch!")
             messagebox.showwarning(title="Warning", message="You must enter username and password credentials.")
 
-    def auto_discover_back_process(self, text, usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_data=True, export_data_selections=[]) -> None:
+    def auto_discover_back_process(self, text, usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_data=True, export_data_selections=[], snmp_community="", scope=None, async_ssh=False) -> None:
         """
         Helper function for auto discover.
         """
-        # Discover ips.
-        discover_ip_list, export_info = cdp_auto_discover(text, usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_data)
+        # Read neighbors over SNMP first if a community was given.
+        snmp_engine = SnmpDiscoveryEngine(snmp_community) if len(snmp_community) > 0 else None
+        # Log in on one event loop instead of a thread per switch if asked to. Switches it can't handle fall back to netmiko.
+        ssh_transport = AsyncSshTransport() if async_ssh else None
+        # Each run gets its own session, so there's nothing left over from the last one to clear.
+        session = DiscoverySession(usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_data, snmp_engine=snmp_engine, scope=scope, ssh_transport=ssh_transport)
+        try:
+            try:
+                export_info = self.run_auto_discover(session, text, export_data, export_data_selections)
+            finally:
+                # Reset safety toggle once the topology is written, even if discovery failed, so the window shows it
+                # without waiting for licenses.
+                self.already_auto_discovering = False
+
+            # Join in the license info and write the exports again.
+            self.join_license_info(session, export_data, export_info)
+        finally:
+            # Drop license work nobody will wait for, like when discovery failed or nothing is exported.
+            if session.license_collector is not None:
+                session.license_collector.cancel()
+            # Stop SNMP engine and the async transport. The license stage is done with its sessions by now.
+            if snmp_engine is not None:
+                snmp_engine.stop()
+            if ssh_transport is not None:
+                ssh_transport.stop()
+
+    def run_auto_discover(self, session, text, export_data, export_data_selections) -> list:
+        """
+        Runs a discovery session and writes its exports. License info is still being collected when this returns.
+
+        Parameters:
+        -----------
+            session - The DiscoverySession to run.
+            text - The seed switch IPs.
+            export_data - Whether the results should be exported.
+            export_data_selections - The device types to put on the network maps.
+
+        Returns:
+        --------
+            list(dict) - The exported device info.
+        """
+        # Discover ips. License info is collected in the background and joined in below.
+        discover_ip_list, export_info = session.discover(text)
 
         # Store values in discover list array.
         for addr in discover_ip_list:
@@ -352,39 +438,7 @@ class MainUI():
             # Make sure file isn't already open.
             try:
                 # Write normal discovery info.
-                with open('exports/network_crawl.csv', 'w') as file:
-                    # Write the first label line.
-                    file.write(str(list(export_info[0].keys())).replace("license_info", "")[1:-1])
-                    # Loop through each device and append info.
-                    data_string = "\n"
-                    for device in export_info:
-                        # Build info string.
-                        for key in list(export_info[0].keys()):
-                            # Don't append license info.
-                            if key != "license_info":
-                                data_string += str(device[key]) + ", "
-                        
-                        # Add newline.
-                        data_string += "\n"
-
-                    # Write the final string.
-                    file.write(data_string)
-
-                # Write license info.
-                data_string = ""
-                with open('exports/license_info.txt', 'w') as file:
-                    # Loop through each device and append info.
-                    for device in export_info:
-                        # Check if device is a switch.
-                        if device["is_switch"]:
-                            # Save hostname, ip, and license_info.
-                            data_string += f"{device['hostname']} ({device['ip_addr']}):\n\n"
-                            data_string += device["license_info"]
-                            # Add newline.
-                            data_string += "\n\n#######################################################################################\n\n"
-
-                    # Write the final string.
-                    file.write(data_string)
+                self.write_crawl_export(export_info)
 
                 # Open network discovery map.
                 # Create new network map object from pyvis.
@@ -413,8 +467,6 @@ class MainUI():
 
                     # If the device is valid per user input, then append to new list and do other stuff.
                     if matching:
-                        # Remove license info from dictionary.
-                        device.pop("license_info", None)
                         # Append device to new list.
                         filtered_export_info.append(device)
 
@@ -527,8 +579,90 @@ class MainUI():
         # Print log.
         self.logger.info(f"FINISHED! Discovered a total of {len(self.discovery_list)} IPs: {self.discovery_list}")
 
-        # Reset safety toggle.
-        self.already_auto_discovering = False
+        return export_info
+
+    def join_license_info(self, session, export_data, export_info) -> None:
+        """
+        Waits for the session's license stage and writes the license info into the exports.
+
+        Parameters:
+        -----------
+            session - The DiscoverySession that ran.
+            export_data - Whether the results should be exported.
+            export_info - The exported device info from run_auto_discover.
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Join the license info once the license stage is done and write it into the exports.
+        if export_data and session.license_collector is not None and len(export_info) > 0:
+            export_info = session.wait_for_licenses()
+            try:
+                self.write_crawl_export(export_info)
+                self.write_license_export(export_info)
+                self.logger.info("License info has been added to exports/network_crawl.csv and exports/license_info.txt.")
+            except PermissionError as error:
+                # Catch permissions error if file is already opened by user from a previous session.
+                self.logger.error("Unable to export license info. Please make sure the old CSV file is closed if you opened it in a text editor or Excel.", exc_info=error)
+                self.export_permission_error = True
+
+    def write_crawl_export(self, export_info) -> None:
+        """
+        Writes the discovered devices to exports/network_crawl.csv.
+
+        Parameters:
+        -----------
+            export_info - The exported device info.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with open('exports/network_crawl.csv', 'w') as file:
+            # Write the first label line.
+            file.write(str(list(export_info[0].keys())).replace("license_info", "")[1:-1])
+            # Loop through each device and append info.
+            data_string = "\n"
+            for device in export_info:
+                # Build info string.
+                for key in list(export_info[0].keys()):
+                    # Don't append license info.
+                    if key != "license_info":
+                        data_string += str(device[key]) + ", "
+
+                # Add newline.
+                data_string += "\n"
+
+            # Write the final string.
+            file.write(data_string)
+
+    def write_license_export(self, export_info) -> None:
+        """
+        Writes the raw license output of each discovered switch to exports/license_info.txt.
+
+        Parameters:
+        -----------
+            export_info - The exported device info, with license info joined in.
+
+        Returns:
+        --------
+            Nothing
+        """
+        data_string = ""
+        with open('exports/license_info.txt', 'w') as file:
+            # Loop through each device and append info.
+            for device in export_info:
+                # Check if device is a switch.
+                if device["is_switch"]:
+                    # Save hostname, ip, and license_info.
+                    data_string += f"{device['hostname']} ({device['ip_addr']}):\n\n"
+                    data_string += device["license_info"]
+                    # Add newline.
+                    data_string += "\n\n#######################################################################################\n\n"
+
+            # Write the final string.
+            file.write(data_string)
 
     def read_configs_button_callback(self) -> None:
         """
@@ -559,7 +693,8 @@ class MainUI():
                 self.logger.warning("Another instance of the config window has already been started in the background.")
             else:
                 # Ping each switch listed in the textbox to get a list containing their status.
-                Thread(target=ping_of_death, args=(text, self.ip_list,)).start()
+                ping_finished = Event()
+                Thread(target=ping_of_death, args=(text, self.ip_list, ping_finished, self.get_probe_mode())).start()
                 
                 # Check if a configuration window has already been opened.
                 if self.config_window.get_is_window_open() and self.config_window.get_is_window_initialized():
@@ -580,7 +715,7 @@ class MainUI():
                         enable_secrets.pop(i)
                 # Get secret from user if they entered it.
                 # Open configure window and give it the switch ip list, username, and password.
-                self.config_window.run(self.ip_list, usernames, passwords, enable_secrets, self.enable_telnet_check.get(), self.force_telnet_check.get())
+                self.config_window.run(self.ip_list, usernames, passwords, enable_secrets, self.enable_telnet_check.get(), self.force_telnet_check.get(), ping_finished)
         else:
             # Print log info.
             self.logger.warning("You must enter password credentials. Otherwise, I can't log into the switch!")
@@ -604,8 +739,51 @@ class MainUI():
 
         # Get text from textbox.
         text = self.text_box.get('1.0', tk.END).splitlines()
-        # Ping each switch listed in the textbox to get a list containing their status.
-        Thread(target=ping_of_death, args=(text, self.ip_list,)).start()
+        # Ping each switch listed in the textbox to get a list containing their status. The user asked for a fresh check, so skip the cache.
+        Thread(target=ping_of_death, args=(text, self.ip_list, None, self.get_probe_mode(), False)).start()
+
+    def monitor_button_callback(self) -> None:
+        """
+        This function is triggered everytime the Monitor button is pressed. Starts watching the IPs in the textbox,
+        or stops the monitor if it's already running.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Stop the monitor if it's running.
+        if self.monitor is not None and self.monitor.is_running:
+            self.monitor.stop()
+            self.monitor_button.configure(text="Start Monitor")
+            return
+
+        # Print status to console.
+        self.logger.info("\n---------------------------------------------------------\nStarting reachability monitor...\n---------------------------------------------------------")
+
+        # Get text from textbox.
+        text = self.text_box.get('1.0', tk.END).splitlines()
+        # Start monitoring in the background.
+        self.monitor = ReachabilityMonitor(text, mode=self.get_probe_mode())
+        self.monitor.start()
+        self.monitor_button.configure(text="Stop Monitor")
+
+    def get_probe_mode(self) -> str:
+        """
+        Returns the reachability probe mode picked by the TCP Probe checkbox.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            str - PROBE_TCP if the checkbox is ticked, otherwise PROBE_ICMP.
+        """
+        return PROBE_TCP if self.tcp_probe_check.get() else PROBE_ICMP
 
     def update_window(self) -> None:
         """
@@ -648,6 +826,10 @@ class MainUI():
             # Clear list just to be sure.
             self.discovery_list.clear()
 
+        # Reset monitor button if the monitor stopped by itself.
+        if self.monitor is not None and not self.monitor.is_running and self.monitor_button.cget("text") != "Start Monitor":
+            self.monitor_button.configure(text="Start Monitor")
+
         # Call main window event loop.
         self.window.update()
         # If config window has been launched, call its update function.
@@ -668,6 +850,9 @@ class MainUI():
         # Close config window if open.
         if self.config_window.get_is_window_open():
             self.config_window.close_window()
+        # Stop monitor if running.
+        if self.monitor is not None:
+            self.monitor.stop()
         
         # Get contents of text box and username entry.
         switch_ips = self.text_box.get('1.0', tk.END).splitlines()
@@ -693,6 +878,12 @@ class MainUI():
         # Close files.
         self.log_file.close()
         self.cache_file.close()
+        # Save anything the caches learned since the last save.
+        credential_affinity.save()
+        device_type_cache.save()
+        license_strategy_cache.save()
+        crawl_snapshot.save()
+        host_failure_cache.save()
 
         # Close window.
         self.window.destroy()
@@ -0,0 +1,483 @@
+# Import required packages.
+import asyncio
+import logging
+import re
+import time
+from concurrent.futures import Future
+from threading import Thread
+
+import asyncssh
+from netmiko.exceptions import NetmikoAuthenticationException, NetmikoTimeoutException, ReadTimeout
+
+from utils.executor import connection_executor
+from utils.ping import LocalResourceError, is_local_error
+
+# Create constants.
+SSH_PORT = 22
+CONNECT_TIMEOUT = 10.0
+READ_TIMEOUT = 10.0
+MAX_ASYNC_SESSIONS = 2048
+# How much output is read at once, and how much of the end of the output is searched for the prompt.
+READ_CHUNK_SIZE = 65536
+PROMPT_SEARCH_LENGTH = 256
+# Any IOS style prompt, used until the device's own prompt is known.
+GENERIC_PROMPT_PATTERN = re.compile(r"(?:^|\n)([^\s>#]+(?:\([^)]*\))?[>#])\s*$")
+ENABLE_PASSWORD_PATTERN = re.compile(r"[Pp]assword:\s*$")
+
+
+class AsyncSshConnection():
+    """
+    One interactive IOS shell on the async transport's event loop. It has the same enable, find_prompt, send_command,
+    is_alive and disconnect calls as a netmiko connection, except they are coroutines. Errors are raised as the
+    same netmiko exceptions, so callers handle them the same way.
+    """
+    def __init__(self, transport, connection, process, host, secret, read_timeout=READ_TIMEOUT) -> None:
+        # Create class variables and objects.
+        self.transport = transport
+        self.connection = connection
+        self.process = process
+        self.host = host
+        self.secret = secret
+        self.read_timeout = read_timeout
+        self.buffer = ""
+        self.prompt_pattern = GENERIC_PROMPT_PATTERN
+        self.prompt = None
+        self.is_closed = False
+
+    async def read_until(self, pattern, read_timeout=None) -> str:
+        """
+        Reads from the shell until the end of the output matches a pattern.
+
+        Parameters:
+        -----------
+            pattern - The compiled regex to wait for.
+            read_timeout - How many seconds to wait, or None for the connection's read timeout.
+
+        Returns:
+        --------
+            str - Everything read, including the matched text.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (read_timeout if read_timeout is not None else self.read_timeout)
+        output = self.buffer
+        self.buffer = ""
+        # Only the tail can hold the prompt, so long outputs aren't searched over and over.
+        while pattern.search(output[-PROMPT_SEARCH_LENGTH:]) is None:
+            remaining_time = deadline - loop.time()
+            if remaining_time <= 0:
+                raise ReadTimeout(f"Pattern not detected: {pattern.pattern!r} in output from {self.host}.")
+            try:
+                chunk = await asyncio.wait_for(self.process.stdout.read(READ_CHUNK_SIZE), remaining_time)
+            except asyncio.TimeoutError:
+                raise ReadTimeout(f"Pattern not detected: {pattern.pattern!r} in output from {self.host}.") from None
+            # The device hung up.
+            if len(chunk) <= 0:
+                self.is_closed = True
+                raise ReadTimeout(f"{self.host} closed the session.")
+            output += chunk.replace("\r\n", "\n").replace("\r", "")
+
+        return output
+
+    def set_prompt(self, output) -> str:
+        """
+        Learns the device's prompt from the end of some output, so later reads wait for exactly that prompt.
+
+        Parameters:
+        -----------
+            output - Output that ends in a prompt.
+
+        Returns:
+        --------
+            str - The prompt, like switch-1# or switch-1>.
+        """
+        self.prompt = output.rstrip().splitlines()[-1].strip()
+        # The hostname stays the same in enable and config mode.
+        hostname = re.sub(r"(\([^)]*\))?[>#]$", "", self.prompt)
+        self.prompt_pattern = re.compile(r"(?:^|\n)" + re.escape(hostname) + r"(?:\([^)]*\))?[>#]\s*$")
+
+        return self.prompt
+
+    async def find_prompt(self) -> str:
+        """
+        Returns the device's current prompt.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            str - The prompt, like switch-1# or switch-1>.
+        """
+        self.process.stdin.write("\n")
+        return self.set_prompt(await self.read_until(self.prompt_pattern))
+
+    async def send_command(self, command, expect_string=None, read_timeout=None) -> str:
+        """
+        Runs a command and returns its output without the echoed command or the trailing prompt.
+
+        Parameters:
+        -----------
+            command - The command to run.
+            expect_string - A regex that marks the end of the output, like netmiko's. Defaults to the prompt.
+            read_timeout - How many seconds to wait, or None for the connection's read timeout.
+
+        Returns:
+        --------
+            str - The command output.
+        """
+        pattern = re.compile(expect_string) if expect_string is not None else self.prompt_pattern
+        self.process.stdin.write(command + "\n")
+        output = await self.read_until(pattern, read_timeout)
+
+        # Remove the echoed command and the prompt.
+        lines = output.split("\n")
+        if len(lines) > 0 and command in lines[0]:
+            lines = lines[1:]
+        if expect_string is None and len(lines) > 0:
+            lines = lines[:-1]
+
+        return "\n".join(lines).strip("\n")
+
+    async def enable(self) -> None:
+        """
+        Gets a priviledged terminal. Raises ReadTimeout if the secret is wrong, like netmiko does.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Check if already priviledged.
+        if self.prompt is None:
+            await self.find_prompt()
+        if self.prompt.endswith("#"):
+            return
+
+        # Send enable and the secret if it's asked for.
+        self.process.stdin.write("enable\n")
+        pattern = re.compile(ENABLE_PASSWORD_PATTERN.pattern + "|" + self.prompt_pattern.pattern)
+        output = await self.read_until(pattern)
+        if ENABLE_PASSWORD_PATTERN.search(output[-PROMPT_SEARCH_LENGTH:]) is not None:
+            self.process.stdin.write(self.secret + "\n")
+            output = await self.read_until(pattern)
+            # A wrong secret is asked for again. Send blank ones until the device gives up and shows the prompt.
+            while ENABLE_PASSWORD_PATTERN.search(output[-PROMPT_SEARCH_LENGTH:]) is not None:
+                self.process.stdin.write("\n")
+                output = await self.read_until(pattern)
+        self.set_prompt(output)
+        if not self.prompt.endswith("#"):
+            raise ReadTimeout(f"Failed to enter enable mode on {self.host}.")
+
+    def is_alive(self) -> bool:
+        """
+        Checks if the session is still open. Safe to call from any thread.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            bool - Whether the session is open.
+        """
+        return not self.is_closed and not self.process.stdout.at_eof()
+
+    async def disconnect(self) -> None:
+        """
+        Closes the session and frees its slot on the transport.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Don't free the slot twice.
+        if self.connection is None:
+            return
+
+        self.is_closed = True
+        self.connection.close()
+        try:
+            await asyncio.wait_for(self.connection.wait_closed(), self.read_timeout)
+        except (asyncio.TimeoutError, OSError, asyncssh.Error):
+            pass
+        self.connection = None
+        self.transport.release()
+
+
+class SyncSshConnection():
+    """
+    Blocking wrapper around an AsyncSshConnection for code that runs in threads, like the license stage and the
+    configure window. Calls are run on the transport's loop and waited on, so it can stand in for a netmiko connection.
+    """
+    def __init__(self, transport, connection) -> None:
+        # Create class variables and objects.
+        self.transport = transport
+        self.connection = connection
+
+    def run(self, coroutine) -> object:
+        """
+        Runs a coroutine on the transport's loop and waits for it.
+
+        Parameters:
+        -----------
+            coroutine - The coroutine to run.
+
+        Returns:
+        --------
+            object - The coroutine's return value.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self.transport.loop).result()
+
+    def enable(self) -> None:
+        """
+        Gets a priviledged terminal. See AsyncSshConnection.enable.
+        """
+        self.run(self.connection.enable())
+
+    def find_prompt(self) -> str:
+        """
+        Returns the device's current prompt. See AsyncSshConnection.find_prompt.
+        """
+        return self.run(self.connection.find_prompt())
+
+    def send_command(self, command, expect_string=None, read_timeout=None) -> str:
+        """
+        Runs a command and returns its output. See AsyncSshConnection.send_command.
+        """
+        return self.run(self.connection.send_command(command, expect_string, read_timeout))
+
+    def is_alive(self) -> bool:
+        """
+        Checks if the session is still open.
+        """
+        return self.connection.is_alive()
+
+    def disconnect(self) -> None:
+        """
+        Closes the session. See AsyncSshConnection.disconnect.
+        """
+        # The loop may already be gone if the transport was stopped first.
+        if self.transport.loop is not None:
+            self.run(self.connection.disconnect())
+
+
+class AsyncSshTransport():
+    """
+    Opens SSH sessions with asyncssh on one asyncio loop running in a background thread, instead of one blocking
+    netmiko connection and OS thread per session. Thousands of sessions can be open at once. submit() runs a coroutine
+    on the loop and hands back a concurrent.futures.Future, so results can be waited on next to thread pool results.
+
+    Only IOS style shells are understood. Anything the transport can't log into for reasons other than bad credentials
+    or an unreachable device, like an old key exchange, should be retried with netmiko. The port is configurable so the
+    transport can be pointed at a local fake switch.
+
+    Logins go through the executor like connect_device's do. They're spaced per device, take a slot under its
+    concurrency limit while they run, and report how long they took, so both transports share one limit.
+    """
+    def __init__(self, port=SSH_PORT, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT, max_sessions=MAX_ASYNC_SESSIONS, executor=connection_executor) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.executor = executor
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_sessions = max_sessions
+        self.loop = None
+        self.thread = None
+        self.semaphore = None
+        # Metrics.
+        self.open_sessions = 0
+        self.peak_sessions = 0
+        self.connects = 0
+        self.connect_failures = 0
+
+    def start(self) -> None:
+        """
+        Starts the transport's event loop in a background thread.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Don't start twice.
+        if self.loop is not None:
+            return
+
+        # Create loop and run it forever in the background.
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the transport's event loop. Sessions still open are dropped.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Check if running.
+        if self.loop is None:
+            return
+
+        # Stop loop.
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+        self.semaphore = None
+
+    def submit(self, coroutine) -> Future:
+        """
+        Runs a coroutine on the transport's loop.
+
+        Parameters:
+        -----------
+            coroutine - The coroutine to run.
+
+        Returns:
+        --------
+            Future - Resolves to the coroutine's return value.
+        """
+        # Start loop if needed.
+        self.start()
+
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    async def connect(self, remote_device) -> AsyncSshConnection:
+        """
+        Logs into a device and opens an interactive shell with paging turned off. Has to run on the transport's loop.
+
+        Parameters:
+        -----------
+            remote_device - The netmiko connection dictionary. host, username, password and secret are used, and port if it's there.
+
+        Returns:
+        --------
+            AsyncSshConnection - The open session. Raises NetmikoAuthenticationException, NetmikoTimeoutException or
+                                ConnectionRefusedError like netmiko, LocalResourceError if this machine is out of
+                                sockets, and asyncssh errors for anything else.
+        """
+        # Create shared objects on the loop the first time through.
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_sessions)
+
+        # Wait for a free session slot. It's held until the session is closed.
+        await self.semaphore.acquire()
+        self.open_sessions += 1
+        self.peak_sessions = max(self.peak_sessions, self.open_sessions)
+        host = remote_device["host"]
+        try:
+            # Wait for the device's login slot and room under the connection limit. Only the login holds the limit.
+            delay = self.executor.reserve_login(host)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.executor.acquire_login()
+            try:
+                start_time = time.perf_counter()
+                connection = await asyncio.wait_for(asyncssh.connect(host, port=remote_device.get("port", self.port), username=remote_device["username"], password=remote_device["password"], known_hosts=None, client_keys=None, agent_path=None), self.connect_timeout)
+                self.executor.record_connect(True, time.perf_counter() - start_time)
+            except asyncssh.PermissionDenied as error:
+                raise NetmikoAuthenticationException(f"Authentication to device failed: {host}") from error
+            except ConnectionRefusedError:
+                self.executor.record_connect(False)
+                raise
+            except (asyncio.TimeoutError, OSError) as error:
+                # Running out of sockets here says nothing about the device.
+                if isinstance(error, OSError) and is_local_error(error):
+                    raise LocalResourceError(f"Out of sockets while connecting to {host}") from error
+                self.executor.record_connect(False)
+                raise NetmikoTimeoutException(f"TCP connection to device failed: {host}") from error
+            finally:
+                self.executor.release_login()
+
+            # Open a shell and get it ready like netmiko's session preparation.
+            try:
+                process = await connection.create_process(term_type="vt100", term_size=(511, 24), encoding="utf-8", errors="replace")
+                ssh_connection = AsyncSshConnection(self, connection, process, host, remote_device.get("secret", ""), self.read_timeout)
+                ssh_connection.set_prompt(await ssh_connection.read_until(GENERIC_PROMPT_PATTERN))
+                await ssh_connection.send_command("terminal length 0")
+                await ssh_connection.send_command("terminal width 511")
+            except BaseException:
+                connection.close()
+                raise
+        except BaseException:
+            self.connect_failures += 1
+            self.release()
+            raise
+        self.connects += 1
+
+        return ssh_connection
+
+    def connect_device(self, remote_device) -> SyncSshConnection:
+        """
+        Blocking version of connect for code that runs in threads.
+
+        Parameters:
+        -----------
+            remote_device - The netmiko connection dictionary.
+
+        Returns:
+        --------
+            SyncSshConnection - The open session.
+        """
+        return self.wrap(self.submit(self.connect(remote_device)).result())
+
+    def wrap(self, ssh_connection) -> SyncSshConnection:
+        """
+        Wraps an open session so threads can use it like a netmiko connection.
+
+        Parameters:
+        -----------
+            ssh_connection - The AsyncSshConnection.
+
+        Returns:
+        --------
+            SyncSshConnection - The blocking wrapper.
+        """
+        return SyncSshConnection(self, ssh_connection)
+
+    def release(self) -> None:
+        """
+        Frees a session slot. Has to run on the transport's loop.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        self.open_sessions -= 1
+        self.semaphore.release()
+
+    def get_metrics(self) -> dict:
+        """
+        Returns the transport's current state.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            dict - open_sessions, peak_sessions, connects and connect_failures.
+        """
+        return {"open_sessions": self.open_sessions, "peak_sessions": self.peak_sessions, "connects": self.connects, "connect_failures": self.connect_failures}
@@ -0,0 +1,181 @@
+# Import required packages.
+from typing import Iterator
+
+# Create constants.
+# Every neighbor block starts with this at the beginning of a line.
+CDP_BLOCK_MARKER = "\nDevice ID:"
+CDP_ADDRESS_LABEL = "IP address:"
+CDP_PLATFORM_LABEL = "\nPlatform:"
+CDP_CAPABILITIES_LABEL = "Capabilities:"
+CDP_INTERFACE_LABEL = "\nInterface:"
+CDP_PORT_LABEL = "Port ID (outgoing port):"
+CDP_VERSION_LABEL = "\nVersion"
+
+
+def iter_cdp_neighbors(output, export_info=True) -> Iterator[dict]:
+    """
+    Reads show cdp neighbors detail output and yields each neighbor's fields one block at a time.
+
+    Blocks are split on "Device ID:" at the start of a line, so hostnames or version strings containing "Device"
+    don't break a neighbor apart. The output is split once, and inside a block each field is found with one str.find,
+    so the lines we don't use (holdtime, duplex, power, ...) are only ever scanned in C and never looped over in python.
+
+    Parameters:
+    -----------
+        output - The command output.
+        export_info - Whether the fields only the export uses (device_id, interface, device_port) should be read.
+                    Without it the version is only read if the block mentions AIR, since it's only used to spot access points.
+
+    Returns:
+    --------
+        Iterator[dict] - device_id, address, platform, capabilities (list), device_port, interface, and version for each neighbor.
+    """
+    # The first piece is the header before the first neighbor. A field on the last line of a block has no newline after it.
+    blocks = ("\n" + output).split(CDP_BLOCK_MARKER)
+    for i in range(1, len(blocks)):
+        block = blocks[i]
+        neighbor = {"device_id": "NULL", "address": "NULL", "platform": "NULL", "capabilities": [], "device_port": "NULL", "interface": "NULL", "version": ""}
+        # The hostname is the rest of the first line.
+        if export_info:
+            end = block.find("\n")
+            neighbor["device_id"] = block[:end if end >= 0 else None].strip()
+
+        # The management address comes last, so it wins over the entry address.
+        start = block.rfind(CDP_ADDRESS_LABEL)
+        if start >= 0:
+            start += len(CDP_ADDRESS_LABEL)
+            end = block.find("\n", start)
+            neighbor["address"] = block[start:end if end >= 0 else None].strip()
+
+        # Platform and capabilities share a line.
+        start = block.find(CDP_PLATFORM_LABEL)
+        if start >= 0:
+            start += len(CDP_PLATFORM_LABEL)
+            end = block.find("\n", start)
+            platform, _, capabilities = block[start:end if end >= 0 else None].partition(",")
+            neighbor["platform"] = platform.strip()
+            neighbor["capabilities"] = capabilities.replace(CDP_CAPABILITIES_LABEL, "").split()
+
+        # Our interface comes first, then the neighbor's port.
+        start = block.find(CDP_INTERFACE_LABEL) if export_info else -1
+        if start >= 0:
+            start += len(CDP_INTERFACE_LABEL)
+            end = block.find("\n", start)
+            interface, _, port = block[start:end if end >= 0 else None].partition(",")
+            neighbor["interface"] = interface.strip()
+            neighbor["device_port"] = port.replace(CDP_PORT_LABEL, "").strip() or "NULL"
+
+        # The version text starts on the line after the label and runs until the first blank line.
+        start = block.find(CDP_VERSION_LABEL) if export_info or "AIR" in block else -1
+        if start >= 0:
+            start = block.find("\n", start + 1)
+            if start >= 0:
+                end = block.find("\n\n", start)
+                neighbor["version"] = block[start:end if end >= 0 else None].strip()
+
+        yield neighbor
+
+def parse_cdp_neighbors_detail(output, parent_addr, parent_host, export_info) -> Iterator[dict]:
+    """
+    Parses show cdp neighbors detail output into neighbor records.
+
+    Parameters:
+    -----------
+        output - The command output.
+        parent_addr - The IP address of the switch the output came from.
+        parent_host - The hostname of the switch the output came from.
+        export_info - Whether the export fields should be filled in.
+
+    Returns:
+    --------
+        Iterator[dict] - One neighbor record per neighbor, in the order they were listed.
+    """
+    for neighbor in iter_cdp_neighbors(output, export_info):
+        yield build_neighbor_record(neighbor, parent_addr, parent_host, neighbor["interface"], export_info)
+
+def build_neighbor_record(neighbor, parent_addr, parent_host, parent_interface, export_info) -> dict:
+    """
+    Builds a neighbor record from one neighbor's CDP fields. The SSH crawl and the SNMP engine both go through here,
+    so a neighbor gets the same record no matter how it was found.
+
+    Parameters:
+    -----------
+        neighbor - A dictionary of the neighbor's CDP fields, from iter_cdp_neighbors or the SNMP cdpCacheEntry columns.
+        parent_addr - The IP address of the switch the neighbor was found on.
+        parent_host - The hostname of the switch the neighbor was found on.
+        parent_interface - The switch interface the neighbor is plugged into.
+        export_info - Whether the export fields should be filled in.
+
+    Returns:
+    --------
+        dict - The neighbor record.
+    """
+    # Create device info variables.
+    hostname = "NULL"
+    addr = neighbor.get("address", "NULL")
+    local_trunk_interface = "NULL"
+    software_name = "NULL"
+    version = "NULL"
+    platform = "NULL"
+    is_wireless_ap = False
+    is_switch = False
+    is_router = False
+    is_phone = False
+    is_camera = False
+    capabilities = neighbor.get("capabilities", [])
+    version_text = neighbor.get("version", "")
+
+    # Attempt to determine if the device is a switch.
+    if "Switch" in capabilities:
+        is_switch = True
+        if "Router" in capabilities:
+            is_router = True
+    # Find device type.
+    if "AIR" in neighbor.get("platform", "") or "AIR" in version_text or "Trans-Bridge" in capabilities:
+        is_wireless_ap = True
+        is_switch = False
+
+    # Check if export info is toggled on.
+    if export_info:
+        # Get the plain fields.
+        hostname = neighbor.get("device_id", "NULL") or "NULL"
+        local_trunk_interface = neighbor.get("device_port", "NULL") or "NULL"
+        platform = neighbor.get("platform", "NULL") or "NULL"
+        # Find device software version info on the first line that has it.
+        for line in version_text.splitlines():
+            if "Version" in line:
+                sections = line.split(",")
+                software_name = sections[0]
+                for section in sections:
+                    if "Version" in section:
+                        version = section.replace("Version", "").strip()
+                break
+
+        # If both the software name and version were unable to be found assume device is not a switch, but a phone.
+        if software_name == "NULL" and version == "NULL":
+            is_switch = False
+            # If platform is null, then it's not a phone.
+            if platform != "NULL" and platform != "Linux":
+                is_phone = True
+
+        # If it's not any of these, then assume it's a camera.
+        if not any([is_router, is_switch, is_wireless_ap, is_phone]):
+            is_camera = True
+
+    # Add info to dictionary.
+    return {
+        "hostname": hostname,
+        "ip_addr": addr,
+        "local_trunk_interface": local_trunk_interface,
+        "software_name": software_name,
+        "version": version,
+        "platform": platform,
+        "is_wireless_ap": is_wireless_ap,
+        "is_switch": is_switch,
+        "is_router": is_router,
+        "is_phone": is_phone,
+        "is_camera": is_camera,
+        "parent_addr": parent_addr if export_info else "NULL",
+        "parent_host": parent_host if export_info else "NULL",
+        "parent_trunk_interface": parent_interface if export_info else "NULL"
+    }
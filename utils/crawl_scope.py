@@ -0,0 +1,170 @@
+# Import required packages.
+import ipaddress
+import time
+
+# Create constants. These are the reasons a neighbor is left out of a crawl.
+SCOPE_DENIED = "denied prefix"
+SCOPE_NOT_ALLOWED = "outside allowed prefixes"
+SCOPE_DEPTH = "hop limit"
+SCOPE_DEVICES = "device limit"
+SCOPE_TIME = "time budget"
+
+
+class CrawlScope():
+    """
+    Limits how far a discovery is allowed to go. Neighbors outside the allowed prefixes, inside a denied prefix, past the
+    hop limit, past the device limit, or found after the time budget ran out are never logged into. Every limit is
+    optional, and an empty scope lets discovery follow every switch like before.
+    """
+    def __init__(self, allow_prefixes=None, deny_prefixes=None, max_depth=None, time_budget=None, max_devices=None) -> None:
+        # Create class variables and objects. Bad prefixes raise ValueError right away instead of halfway through a crawl.
+        self.allow_networks = [ipaddress.ip_network(prefix.strip(), strict=False) for prefix in allow_prefixes or []]
+        self.deny_networks = [ipaddress.ip_network(prefix.strip(), strict=False) for prefix in deny_prefixes or []]
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.max_devices = max_devices
+        self.start_time = None
+
+    def start(self) -> None:
+        """
+        Starts the time budget clock.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        self.start_time = time.monotonic()
+
+    def get_remaining_time(self) -> float:
+        """
+        Returns how much of the time budget is left.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            float - Seconds left, never below zero. None if there is no time budget or the clock hasn't started.
+        """
+        if self.time_budget is None or self.start_time is None:
+            return None
+
+        return max(0.0, self.time_budget - (time.monotonic() - self.start_time))
+
+    def is_expired(self) -> bool:
+        """
+        Checks if the time budget ran out.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            bool - True if there is a time budget and it's used up.
+        """
+        remaining_time = self.get_remaining_time()
+        return remaining_time is not None and remaining_time <= 0.0
+
+    def is_allowed(self, ip_addr) -> bool:
+        """
+        Checks an address against the prefix lists. Deny prefixes win over allow prefixes.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address to check.
+
+        Returns:
+        --------
+            bool - Whether the address may be crawled.
+        """
+        return self.check_prefixes(ip_addr) is None
+
+    def check_prefixes(self, ip_addr) -> str:
+        """
+        Checks an address against the prefix lists.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address to check.
+
+        Returns:
+        --------
+            str - Why the address is out of scope, or None if it's in scope.
+        """
+        # Nothing to check.
+        if len(self.allow_networks) <= 0 and len(self.deny_networks) <= 0:
+            return None
+        # Anything that isn't an address can't be matched, so it's only crawled when there's no allow list.
+        try:
+            address = ipaddress.ip_address(ip_addr)
+        except ValueError:
+            return SCOPE_NOT_ALLOWED if len(self.allow_networks) > 0 else None
+
+        if any(address in network for network in self.deny_networks):
+            return SCOPE_DENIED
+        if len(self.allow_networks) > 0 and not any(address in network for network in self.allow_networks):
+            return SCOPE_NOT_ALLOWED
+
+        return None
+
+    def check(self, ip_addr, depth, device_count) -> str:
+        """
+        Checks if a newly found switch may be crawled.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            depth - How many hops the switch is from the seed switches.
+            device_count - How many switches the discovery has already contacted.
+
+        Returns:
+        --------
+            str - Why the switch is out of scope, or None if it's in scope.
+        """
+        reason = self.check_prefixes(ip_addr)
+        if reason is None and self.max_depth is not None and depth > self.max_depth:
+            reason = SCOPE_DEPTH
+        if reason is None and self.max_devices is not None and device_count >= self.max_devices:
+            reason = SCOPE_DEVICES
+        if reason is None and self.is_expired():
+            reason = SCOPE_TIME
+
+        return reason
+
+
+def parse_crawl_scope(text) -> CrawlScope:
+    """
+    Builds a crawl scope from the text in the main window. Items are separated by spaces or commas. A prefix allows it, a
+    prefix starting with ! denies it, and hops=, minutes= and devices= set the limits.
+    For example: 10.1.0.0/16 !10.1.99.0/24 hops=4 minutes=10 devices=200
+
+    Parameters:
+    -----------
+        text - The scope text. Empty text gives an unlimited scope.
+
+    Returns:
+    --------
+        CrawlScope - The scope.
+    """
+    allow_prefixes = []
+    deny_prefixes = []
+    limits = {}
+    for item in text.replace(",", " ").split():
+        if "=" in item:
+            # Get limit. int raises ValueError for anything that isn't a number.
+            key, value = item.split("=", 1)
+            if key.lower() not in ("hops", "minutes", "devices"):
+                raise ValueError(f"Unknown crawl scope limit {key}.")
+            limits[key.lower()] = int(value)
+        elif item.startswith("!"):
+            deny_prefixes.append(item[1:])
+        else:
+            allow_prefixes.append(item)
+
+    return CrawlScope(allow_prefixes, deny_prefixes, limits.get("hops"), limits["minutes"] * 60 if "minutes" in limits else None, limits.get("devices"))
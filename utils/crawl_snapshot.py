@@ -0,0 +1,118 @@
+# Import required packages.
+import time
+from typing import List
+
+from utils.json_cache import JsonCache
+
+# Create constants.
+CRAWL_SNAPSHOT_FILE = "crawl_snapshot.json"
+
+
+class CrawlSnapshot(JsonCache):
+    """
+    Keeps what the last discovery found on each switch: its neighbor signature and the switch IPs and neighbor records it
+    reported. The next discovery compares signatures and only fully re-queries switches whose neighbors changed, and it
+    can start on every switch it already knows about without waiting for the crawl to reach it.
+    """
+    def __init__(self, filename=CRAWL_SNAPSHOT_FILE) -> None:
+        # Create parent class.
+        JsonCache.__init__(self, filename)
+
+    def get(self, ip_addr) -> dict:
+        """
+        Returns the last crawl result for a switch.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+
+        Returns:
+        --------
+            dict - The entry (signature, export_info, cdp_ips, device_infos, updated) or None if the switch isn't known.
+        """
+        with self.lock:
+            return self.load().get("switches", {}).get(ip_addr)
+
+    def get_signature(self, ip_addr, export_info) -> str:
+        """
+        Returns the neighbor signature a switch had last time, if its stored result can be reused for this crawl.
+        Results stored without export info can't be reused by a crawl that exports.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            export_info - Whether the current crawl exports neighbor records.
+
+        Returns:
+        --------
+            str - The signature, or None if the switch has to be fully queried.
+        """
+        entry = self.get(ip_addr)
+        if entry is None or (export_info and not entry["export_info"]):
+            return None
+
+        return entry["signature"]
+
+    def store(self, ip_addr, signature, export_info, cdp_ips, device_infos) -> None:
+        """
+        Stores a switch's crawl result. Copies are stored, since the crawl keeps changing its own records.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            signature - The hash of the switch's neighbor table, or None if it isn't known.
+            export_info - Whether the neighbor records were built with export info.
+            cdp_ips - The switch IPs the switch reported.
+            device_infos - The neighbor records the switch reported.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            self.load().setdefault("switches", {})[ip_addr] = {
+                "signature": signature,
+                "export_info": export_info,
+                "cdp_ips": list(cdp_ips),
+                "device_infos": [dict(info) for info in device_infos],
+                "updated": time.time()
+            }
+            self.mark_dirty()
+
+    def get_known_switches(self, seed_ips, max_depth=None, is_allowed=None) -> List[str]:
+        """
+        Walks the stored topology out from the seed switches.
+
+        Parameters:
+        -----------
+            seed_ips - The IPs discovery starts from.
+            max_depth - How many hops out to walk, or None for no limit.
+            is_allowed - A function that takes an IP and returns whether it may be crawled. The walk doesn't go past switches it rejects.
+
+        Returns:
+        --------
+            list - Every stored switch reachable from the seeds, not counting the seeds, closest first.
+        """
+        with self.lock:
+            switches = self.load().get("switches", {})
+            # Breadth first walk over the stored neighbor lists.
+            seen = set(seed_ips)
+            frontier = list(seed_ips)
+            known = []
+            depth = 0
+            while len(frontier) > 0 and (max_depth is None or depth < max_depth):
+                depth += 1
+                next_frontier = []
+                for ip_addr in frontier:
+                    for neighbor in switches.get(ip_addr, {}).get("cdp_ips", []):
+                        if neighbor not in seen and neighbor in switches and (is_allowed is None or is_allowed(neighbor)):
+                            seen.add(neighbor)
+                            known.append(neighbor)
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+
+        return known
+
+
+# Create the crawl snapshot shared by every discovery.
+crawl_snapshot = CrawlSnapshot()
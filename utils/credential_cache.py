@@ -0,0 +1,112 @@
+# Import required packages.
+import ipaddress
+from typing import List, Tuple
+
+from utils.json_cache import JsonCache
+
+# Create constants.
+CREDENTIAL_CACHE_FILE = "credential_affinity.json"
+
+
+class CredentialAffinity(JsonCache):
+    """
+    Remembers which username logged into each device, and how often each username worked in a /24 and on a platform.
+    Credential sets are reordered so the most likely one is tried first. Only usernames are stored, never passwords or secrets.
+    """
+    def __init__(self, filename=CREDENTIAL_CACHE_FILE) -> None:
+        # Create parent class.
+        JsonCache.__init__(self, filename)
+
+    def get_subnet(self, ip_addr) -> str:
+        """
+        Returns the /24 the given IP is in.
+
+        Parameters:
+        -----------
+            ip_addr - The IPv4 address.
+
+        Returns:
+        --------
+            str - The /24 network, or None if the address isn't an IPv4 address.
+        """
+        try:
+            return str(ipaddress.IPv4Network(f"{ip_addr}/24", strict=False))
+        except ValueError:
+            return None
+
+    def order(self, ip_addr, credentials, platform=None) -> List[Tuple[str, str, str]]:
+        """
+        Sorts the credential sets so the one most likely to work on this device comes first.
+        A username that worked on this exact device wins, then the one that worked most in its /24, then on its platform.
+        Ties keep the order the user typed them in.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+            credentials - An iterable of (username, password, secret) tuples.
+            platform - The netmiko device_type of the device if it's known.
+
+        Returns:
+        --------
+            list - The credential tuples, most likely first.
+        """
+        credentials = list(credentials)
+        with self.lock:
+            data = self.load()
+            device_username = data.get("devices", {}).get(ip_addr)
+            subnet_counts = data.get("subnets", {}).get(self.get_subnet(ip_addr), {})
+            platform_counts = data.get("platforms", {}).get(platform, {}) if platform is not None else {}
+
+        # Python's sort is stable, so ties keep their typed order.
+        return sorted(credentials, key=lambda creds: (creds[0] == device_username, subnet_counts.get(creds[0], 0), platform_counts.get(creds[0], 0)), reverse=True)
+
+    def record_success(self, ip_addr, username, platform=None) -> None:
+        """
+        Stores a successful login.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+            username - The username that worked.
+            platform - The netmiko device_type that was used, if it's a concrete one.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            data = self.load()
+            # Pin username to device.
+            data.setdefault("devices", {})[ip_addr] = username
+            # Count username for subnet and platform.
+            subnet = self.get_subnet(ip_addr)
+            if subnet is not None:
+                subnet_counts = data.setdefault("subnets", {}).setdefault(subnet, {})
+                subnet_counts[username] = subnet_counts.get(username, 0) + 1
+            if platform is not None and platform != "autodetect":
+                platform_counts = data.setdefault("platforms", {}).setdefault(platform, {})
+                platform_counts[username] = platform_counts.get(username, 0) + 1
+            self.mark_dirty()
+
+    def record_failure(self, ip_addr, username) -> None:
+        """
+        Stores a rejected login. If the username was pinned to this device, the pin is removed.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+            username - The username that was rejected.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            devices = self.load().get("devices", {})
+            if devices.get(ip_addr) == username:
+                devices.pop(ip_addr)
+                self.mark_dirty()
+
+
+# Create the credential affinity store shared by discovery and autodetect.
+credential_affinity = CredentialAffinity()
@@ -0,0 +1,111 @@
+# Import required packages.
+import time
+
+from utils.json_cache import JsonCache
+
+# Create constants.
+DEVICE_TYPE_CACHE_FILE = "device_types.json"
+
+
+class DeviceTypeCache(JsonCache):
+    """
+    Remembers the netmiko device_type each device was detected as, so known devices connect with a concrete driver
+    instead of running SSHDetect's probe commands again. Entries are keyed by IP, with a hostname index for devices
+    that change address. The SSH banner and serial number are stored when they're known, and a different banner or
+    serial, or a login the driver doesn't fit, throws the entry out. Wrong credentials don't.
+    """
+    def __init__(self, filename=DEVICE_TYPE_CACHE_FILE) -> None:
+        # Create parent class.
+        JsonCache.__init__(self, filename)
+
+    def get(self, ip_addr, hostname=None, banner=None, serial=None) -> str:
+        """
+        Looks up the device_type for a device.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+            hostname - The hostname of the device, used if the IP isn't known.
+            banner - The SSH banner the device sent, if known. A different banner means the device changed.
+            serial - The serial number of the device, if known. A different serial means the device changed.
+
+        Returns:
+        --------
+            str - The netmiko device_type, or None if the device isn't known.
+        """
+        with self.lock:
+            data = self.load()
+            # Find entry by IP, then hostname.
+            entry = data.get("devices", {}).get(ip_addr)
+            if entry is None and hostname is not None:
+                entry = data.get("devices", {}).get(data.get("hostnames", {}).get(hostname.lower()))
+            if entry is None:
+                return None
+
+            # Make sure it's still the same box.
+            if (banner is not None and entry.get("banner") not in (None, banner)) or (serial is not None and entry.get("serial") not in (None, serial)):
+                self.invalidate(ip_addr)
+                return None
+
+            return entry["device_type"]
+
+    def store(self, ip_addr, device_type, hostname=None, banner=None, serial=None) -> None:
+        """
+        Stores the device_type a device was detected as.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+            device_type - The netmiko device_type that worked.
+            hostname - The hostname of the device, if known.
+            banner - The SSH banner the device sent, if known.
+            serial - The serial number of the device, if known.
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Don't store guesses. Telnet is only used when the user allows it, so it's never stored either.
+        if device_type is None or device_type == "autodetect" or device_type.endswith("_telnet"):
+            return
+
+        with self.lock:
+            data = self.load()
+            old_entry = data.setdefault("devices", {}).get(ip_addr, {})
+            # Keep details we already knew. The first banner is kept until the type changes, so get can spot a new box.
+            if old_entry.get("device_type") == device_type and old_entry.get("banner") is not None:
+                banner = old_entry["banner"]
+            data["devices"][ip_addr] = {
+                "device_type": device_type,
+                "hostname": hostname if hostname is not None else old_entry.get("hostname"),
+                "banner": banner if banner is not None else old_entry.get("banner"),
+                "serial": serial if serial is not None else old_entry.get("serial"),
+                "updated": time.time()
+            }
+            if hostname is not None:
+                data.setdefault("hostnames", {})[hostname.lower()] = ip_addr
+            self.mark_dirty()
+
+    def invalidate(self, ip_addr) -> None:
+        """
+        Throws out the entry for a device.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            entry = self.load().get("devices", {}).pop(ip_addr, None)
+            if entry is not None:
+                # Remove hostname index too.
+                if entry.get("hostname") is not None and self.data.get("hostnames", {}).get(entry["hostname"].lower()) == ip_addr:
+                    self.data["hostnames"].pop(entry["hostname"].lower())
+                self.mark_dirty()
+
+
+# Create the device type cache shared by discovery and autodetect.
+device_type_cache = DeviceTypeCache()
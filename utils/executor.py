@@ -0,0 +1,294 @@
+# Import required packages.
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
+
+# Create constants.
+MAX_CONNECTION_THREADS = 128
+INITIAL_CONNECTION_LIMIT = 16
+MIN_CONNECTION_LIMIT = 2
+# Connects faster than this count as healthy and let the limit grow. Failures within this long of the last backoff
+# are the same burst and don't halve the limit again.
+FAST_CONNECT_TIME = 3.0
+# Logins to the same device are spaced at least this many seconds apart.
+LOGIN_INTERVAL = 1.0
+
+
+class AdaptiveExecutor():
+    """
+    A long lived thread pool whose concurrency limit moves like TCP congestion control. The limit doubles while connects
+    are quick (slow start), halves when connects time out or are refused, and after the first backoff only grows by about one
+    slot per limit's worth of quick connects. Tasks past the limit wait in a queue without holding a thread.
+
+    Tasks don't report to the executor themselves. connect_device calls record_connect after every login and
+    wait_for_login before it, so anything that logs in through it is throttled. Logins on an event loop, like the async
+    transport's, take a slot with acquire_login instead of running as a task, so they count against the same limit.
+    """
+    def __init__(self, max_limit=MAX_CONNECTION_THREADS, initial_limit=INITIAL_CONNECTION_LIMIT, min_limit=MIN_CONNECTION_LIMIT, fast_connect_time=FAST_CONNECT_TIME, login_interval=LOGIN_INTERVAL, name="connection") -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.fast_connect_time = fast_connect_time
+        self.login_interval = login_interval
+        self.pool = ThreadPoolExecutor(max_workers=max_limit, thread_name_prefix=name)
+        self.lock = Lock()
+        self.pending = deque()
+        self.in_flight = 0
+        # Event loop logins waiting for a slot, as (loop, future) pairs.
+        self.login_waiters = deque()
+        # Congestion state.
+        self.limit = float(min(initial_limit, max_limit))
+        self.slow_start_threshold = float(max_limit)
+        self.last_backoff = 0.0
+        # Earliest time the next login to each device may start.
+        self.next_login = {}
+        # Metrics.
+        self.completed = 0
+        self.connect_successes = 0
+        self.connect_failures = 0
+        self.connect_time_total = 0.0
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Queues a task. It starts as soon as the concurrency limit allows.
+
+        Parameters:
+        -----------
+            fn - The function to run.
+            args, kwargs - The arguments to run it with.
+
+        Returns:
+        --------
+            Future - Resolves to the function's return value. Cancelling it before it starts removes it from the queue.
+        """
+        future = Future()
+        with self.lock:
+            self.pending.append((future, fn, args, kwargs))
+        self.dispatch()
+
+        return future
+
+    def dispatch(self) -> None:
+        """
+        Starts queued tasks until the concurrency limit is reached.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            while len(self.pending) > 0 and self.in_flight < int(self.limit):
+                future, fn, args, kwargs = self.pending.popleft()
+                # Skip tasks that were cancelled while they waited.
+                if not future.set_running_or_notify_cancel():
+                    continue
+                self.in_flight += 1
+                self.pool.submit(self.run, future, fn, args, kwargs)
+
+            # Wake as many event loop logins as there's room for. They take their slot themselves.
+            room = int(self.limit) - self.in_flight
+            while len(self.login_waiters) > 0 and room > 0:
+                loop, waiter = self.login_waiters.popleft()
+                # Skip logins that were cancelled while they waited.
+                if waiter.done():
+                    continue
+                try:
+                    loop.call_soon_threadsafe(self.wake_login, waiter)
+                except RuntimeError:
+                    # The loop was closed while it waited.
+                    continue
+                room -= 1
+
+    def run(self, future, fn, args, kwargs) -> None:
+        """
+        Pool thread target. Runs one task and starts the next ones.
+
+        Parameters:
+        -----------
+            future - The task's future.
+            fn - The function to run.
+            args, kwargs - The arguments to run it with.
+
+        Returns:
+        --------
+            Nothing
+        """
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self.completed += 1
+            self.dispatch()
+
+    def wake_login(self, waiter) -> None:
+        """
+        Wakes an event loop login waiting in acquire_login. Has to run on the waiter's loop.
+
+        Parameters:
+        -----------
+            waiter - The waiter's future.
+
+        Returns:
+        --------
+            Nothing
+        """
+        if not waiter.done():
+            waiter.set_result(None)
+
+    async def acquire_login(self) -> None:
+        """
+        Waits until the concurrency limit has room and takes a slot, for logins that run on an event loop instead of as
+        a task. The slot has to be given back with release_login.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            # Queued tasks go first.
+            with self.lock:
+                if len(self.pending) <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                waiter = loop.create_future()
+                self.login_waiters.append((loop, waiter))
+
+            # Check again once dispatch says there's room.
+            await waiter
+
+    def release_login(self) -> None:
+        """
+        Gives back a slot taken with acquire_login and starts whatever was waiting for it.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            self.in_flight -= 1
+        self.dispatch()
+
+    def reserve_login(self, ip_addr) -> float:
+        """
+        Reserves the next login slot for a device, so retries and reconnects don't hammer one device or its TACACS server.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+
+        Returns:
+        --------
+            float - How many seconds to wait before logging in.
+        """
+        with self.lock:
+            now = time.monotonic()
+            start_time = max(now, self.next_login.get(ip_addr, 0.0))
+            self.next_login[ip_addr] = start_time + self.login_interval
+
+        return start_time - now
+
+    def wait_for_login(self, ip_addr) -> None:
+        """
+        Blocks until a new login to the device is allowed. Event loop code awaits asyncio.sleep(reserve_login(ip_addr)) instead.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Sleep until the device's slot comes up.
+        delay = self.reserve_login(ip_addr)
+        if delay > 0:
+            time.sleep(delay)
+
+    def record_connect(self, success, elapsed=None) -> None:
+        """
+        Adjusts the concurrency limit after a connect.
+
+        Parameters:
+        -----------
+            success - Whether the device answered. Timeouts and refused connections are failures, bad credentials aren't.
+            elapsed - How many seconds the connect took, if it succeeded.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            old_limit = int(self.limit)
+            if success:
+                self.connect_successes += 1
+                self.connect_time_total += elapsed if elapsed is not None else 0.0
+                # Only quick connects mean there's room for more.
+                if elapsed is not None and elapsed <= self.fast_connect_time:
+                    if self.limit < self.slow_start_threshold:
+                        self.limit = min(self.max_limit, self.limit + 1.0)
+                    else:
+                        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            else:
+                self.connect_failures += 1
+                # Back off once per burst of failures.
+                now = time.monotonic()
+                if now - self.last_backoff > self.fast_connect_time:
+                    self.last_backoff = now
+                    self.slow_start_threshold = max(float(self.min_limit), self.limit / 2.0)
+                    self.limit = self.slow_start_threshold
+            new_limit = int(self.limit)
+
+        # Print log and start anything the new limit allows.
+        if new_limit < old_limit:
+            self.logger.debug(f"Connects are timing out, lowering the connection limit from {old_limit} to {new_limit}.")
+        elif new_limit > old_limit:
+            self.dispatch()
+
+    def get_metrics(self) -> dict:
+        """
+        Returns the executor's current state.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            dict - limit, in_flight, queue_depth, completed, connect_successes, connect_failures, and average_connect_time.
+        """
+        with self.lock:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "queue_depth": len(self.pending),
+                "completed": self.completed,
+                "connect_successes": self.connect_successes,
+                "connect_failures": self.connect_failures,
+                "average_connect_time": self.connect_time_total / self.connect_successes if self.connect_successes > 0 else None
+            }
+
+
+# Create the connection executor shared by discovery and autodetect.
+connection_executor = AdaptiveExecutor()
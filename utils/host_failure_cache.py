@@ -0,0 +1,126 @@
+# Import required packages.
+import time
+from typing import Dict
+
+from utils.json_cache import JsonCache
+
+# Create constants.
+HOST_FAILURE_CACHE_FILE = "host_failures.json"
+FAILURE_TIMEOUT = "timeout"
+FAILURE_REFUSED = "refused"
+FAILURE_AUTH = "auth"
+# How many seconds each kind of failure is remembered for.
+FAILURE_TTLS = {
+    FAILURE_TIMEOUT: 30 * 60,
+    FAILURE_REFUSED: 30 * 60,
+    FAILURE_AUTH: 60 * 60
+}
+
+
+class HostFailureCache(JsonCache):
+    """
+    Remembers hosts discovery couldn't reach or log into, and why. CDP advertises plenty of management IPs we have no
+    business with, and each one costs a full netmiko timeout per credential set. Hosts in here are skipped until their
+    entry expires. Auth failures are only skipped while the same usernames are being tried, so new credentials are
+    always given a chance.
+    """
+    def __init__(self, filename=HOST_FAILURE_CACHE_FILE) -> None:
+        # Create parent class.
+        JsonCache.__init__(self, filename)
+
+    def get_reason(self, ip_addr, usernames=None) -> str:
+        """
+        Checks if a host should be skipped.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the host.
+            usernames - The usernames about to be tried. An auth failure only counts if they were all tried before.
+
+        Returns:
+        --------
+            str - The failure reason (timeout, refused, auth), or None if the host should be tried.
+        """
+        with self.lock:
+            entry = self.load().get("hosts", {}).get(ip_addr)
+            if entry is None:
+                return None
+            # Throw out expired entries.
+            if time.time() >= entry["expires"]:
+                self.clear_host(ip_addr)
+                return None
+            # New usernames might work.
+            if entry["reason"] == FAILURE_AUTH and usernames is not None and not set(usernames) <= set(entry["usernames"]):
+                return None
+
+            return entry["reason"]
+
+    def store(self, ip_addr, reason, usernames=None) -> None:
+        """
+        Remembers that a host failed.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the host.
+            reason - Why it failed (timeout, refused, auth).
+            usernames - The usernames that were tried. Only usernames are stored, never passwords.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            now = time.time()
+            old_entry = self.load().setdefault("hosts", {}).get(ip_addr, {})
+            self.data["hosts"][ip_addr] = {
+                "reason": reason,
+                "usernames": sorted(set(usernames)) if usernames is not None else [],
+                "count": old_entry.get("count", 0) + 1,
+                "last_failure": now,
+                "expires": now + FAILURE_TTLS.get(reason, FAILURE_TTLS[FAILURE_TIMEOUT])
+            }
+            self.mark_dirty()
+
+    def clear_host(self, ip_addr) -> None:
+        """
+        Forgets a host, after it answered or its entry expired.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the host.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            if self.load().get("hosts", {}).pop(ip_addr, None) is not None:
+                self.mark_dirty()
+
+    def get_skipped(self, ip_addrs, since, usernames=None) -> Dict[str, str]:
+        """
+        Returns which of the given hosts were skipped because of a failure from before a point in time.
+
+        Parameters:
+        -----------
+            ip_addrs - The hosts to check.
+            since - A time.time() value, usually when the discovery started. Failures after it happened this run and weren't skipped.
+            usernames - The usernames that were being tried.
+
+        Returns:
+        --------
+            dict - IP -> failure reason.
+        """
+        skipped = {}
+        with self.lock:
+            hosts = self.load().get("hosts", {})
+            for ip_addr in ip_addrs:
+                entry = hosts.get(ip_addr)
+                if entry is not None and entry["last_failure"] < since and self.get_reason(ip_addr, usernames) is not None:
+                    skipped[ip_addr] = entry["reason"]
+
+        return skipped
+
+
+# Create the host failure cache shared by every discovery.
+host_failure_cache = HostFailureCache()
@@ -0,0 +1,111 @@
+# Import required packages.
+import json
+import logging
+import os
+from threading import RLock
+
+# Create constants.
+CACHE_DIRECTORY = "cache"
+
+
+class JsonCache():
+    """
+    A dictionary that is kept in a JSON file under the cache directory so it survives between runs.
+    The file is read the first time the data is needed and only written back when something changed.
+    Subclasses should hold self.lock while touching self.data and call mark_dirty after changing it.
+    """
+    def __init__(self, filename) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.path = os.path.join(CACHE_DIRECTORY, filename)
+        self.data = {}
+        self.lock = RLock()
+        self.is_loaded = False
+        self.is_dirty = False
+
+    def load(self) -> dict:
+        """
+        Reads the cache file if it hasn't been read yet. A missing or broken file gives an empty cache.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            dict - The cached data.
+        """
+        with self.lock:
+            # Only read once.
+            if not self.is_loaded:
+                self.is_loaded = True
+                try:
+                    with open(self.path, "r", encoding="utf-8") as file:
+                        self.data = json.load(file)
+                except FileNotFoundError:
+                    self.data = {}
+                except (OSError, ValueError):
+                    # Print log and start over, a cache is never worth crashing for.
+                    self.logger.warning(f"Unable to read {self.path}, starting with an empty cache.")
+                    self.data = {}
+
+            return self.data
+
+    def mark_dirty(self) -> None:
+        """
+        Flags the data as changed so the next save writes it.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        self.is_dirty = True
+
+    def save(self) -> None:
+        """
+        Writes the data back to the cache file if it changed. The file is replaced in one step so a crash can't leave half a file.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            # Nothing to write.
+            if not self.is_dirty:
+                return
+
+            try:
+                # Write to a temp file, then swap it in.
+                os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+                with open(f"{self.path}.tmp", "w", encoding="utf-8") as file:
+                    json.dump(self.data, file, indent=1)
+                os.replace(f"{self.path}.tmp", self.path)
+                self.is_dirty = False
+            except OSError:
+                # Print log.
+                self.logger.warning(f"Unable to save {self.path}.")
+
+    def clear(self) -> None:
+        """
+        Empties the cache. The file is emptied on the next save.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            self.is_loaded = True
+            self.data = {}
+            self.mark_dirty()
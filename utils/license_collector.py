@@ -0,0 +1,220 @@
+# Import required packages.
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock, Semaphore
+
+from netmiko.exceptions import NetmikoAuthenticationException
+from utils.credential_cache import credential_affinity
+from utils.license_strategy import get_license_info, license_strategy_cache
+from utils.open_connection import connect_device
+
+# Create constants.
+MAX_LICENSE_THREADS = 16
+# Open sessions handed over by discovery wait in the queue, so only this many are kept. Past that, the license stage logs in again.
+MAX_HELD_LICENSE_SESSIONS = 64
+
+# Create the license executor shared by every collector. It's separate from the discovery executor so license commands
+# never hold up the crawl.
+license_executor = ThreadPoolExecutor(max_workers=MAX_LICENSE_THREADS, thread_name_prefix="license")
+
+
+class LicenseCollector():
+    """
+    Collects license info for discovered switches as a separate stage next to topology discovery. Discovery hands each
+    switch's open session over as soon as it's done with it, so most switches don't need a second login, and the crawl
+    moves on without waiting for any license command. Switches discovered without a session, like over SNMP, are
+    logged into again.
+    """
+    def __init__(self, usernames, passwords, enable_secrets, platforms=None, executor=None, max_held_sessions=MAX_HELD_LICENSE_SESSIONS) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.usernames = usernames
+        self.passwords = passwords
+        self.enable_secrets = enable_secrets
+        # CDP platform of each switch, shared with the discovery session that fills it in.
+        self.platforms = platforms if platforms is not None else {}
+        self.executor = executor if executor is not None else license_executor
+        self.held_sessions = Semaphore(max_held_sessions)
+        self.lock = Lock()
+        # License futures keyed by switch IP, and the sessions waiting in the queue with them.
+        self.futures = {}
+        self.held_connections = {}
+
+    def submit(self, ip_addr, hostname=None, device_type="autodetect", ssh_connection=None) -> bool:
+        """
+        Queues a switch for license collection. Each switch is only queued once.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            hostname - The hostname of the switch, if known.
+            device_type - The netmiko device_type the switch logged in with, if known.
+            ssh_connection - An open, enabled session to the switch that discovery is done with.
+
+        Returns:
+        --------
+            bool - Whether the collector took the session. If not, the caller still has to close it.
+        """
+        with self.lock:
+            # Don't queue twice.
+            if ip_addr in self.futures:
+                return False
+            # Only keep the session if there's room.
+            if ssh_connection is not None and not self.held_sessions.acquire(blocking=False):
+                ssh_connection = None
+            if ssh_connection is not None:
+                self.held_connections[ip_addr] = ssh_connection
+            self.futures[ip_addr] = self.executor.submit(self.collect, ip_addr, hostname, device_type, ssh_connection)
+
+        return ssh_connection is not None
+
+    def collect(self, ip_addr, hostname, device_type, ssh_connection) -> dict:
+        """
+        Executor target. Gets one switch's license info and closes its session.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            hostname - The hostname of the switch, if known.
+            device_type - The netmiko device_type the switch logged in with, if known.
+            ssh_connection - An open session to the switch, or None to log in again.
+
+        Returns:
+        --------
+            dict - The license dictionary, or None if the switch couldn't be reached.
+        """
+        held = ssh_connection is not None
+        with self.lock:
+            self.held_connections.pop(ip_addr, None)
+        try:
+            # Log in again if discovery didn't hand us a session.
+            if ssh_connection is None:
+                ssh_connection, device_type = self.connect(ip_addr)
+                if ssh_connection is None:
+                    return None
+            # The session may have timed out while it waited in the queue.
+            elif not ssh_connection.is_alive():
+                ssh_connection.disconnect()
+                ssh_connection, device_type = self.connect(ip_addr)
+                if ssh_connection is None:
+                    return None
+            if hostname is None:
+                hostname = ssh_connection.find_prompt()[:-1]
+
+            # Create base dictionary and fill it in.
+            license_dict = {"ip_addr": ip_addr, "hostname": hostname, "license_state": "NULL", "expire_period": "NULL", "raw_output": "NULL"}
+            return get_license_info(ssh_connection, license_dict, ip_addr, device_type, self.platforms.get(ip_addr))
+        except Exception:
+            # One bad switch shouldn't stop the others.
+            self.logger.exception(f"Unable to collect license info from {ip_addr}.")
+            return None
+        finally:
+            # Close session and free its slot.
+            if ssh_connection is not None:
+                try:
+                    ssh_connection.disconnect()
+                except Exception:
+                    pass
+            if held:
+                self.held_sessions.release()
+
+    def connect(self, ip_addr) -> tuple:
+        """
+        Logs into a switch over SSH with the credentials most likely to work.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+
+        Returns:
+        --------
+            tuple - The enabled session and its device_type, or (None, None) if no credentials worked.
+        """
+        for username, password, secret in credential_affinity.order(ip_addr, zip(self.usernames, self.passwords, self.enable_secrets)):
+            # If secret is empty use normal password.
+            if len(secret) <= 0:
+                secret = password
+
+            # Create device dictionary and connect.
+            remote_device = {"device_type": "autodetect", "host": ip_addr, "username": username, "password": password, "secret": secret}
+            try:
+                ssh_connection = connect_device(remote_device)
+            except NetmikoAuthenticationException:
+                # Forget this username for the switch and try the next one.
+                credential_affinity.record_failure(ip_addr, username)
+                continue
+            except Exception:
+                # Unreachable.
+                continue
+            # Get priviledged terminal.
+            try:
+                ssh_connection.enable()
+            except Exception:
+                # The enable secret is wrong.
+                ssh_connection.disconnect()
+                continue
+
+            # Remember what worked.
+            credential_affinity.record_success(ip_addr, username, remote_device["device_type"])
+            return ssh_connection, remote_device["device_type"]
+
+        return None, None
+
+    def get_pending_count(self) -> int:
+        """
+        Returns how many switches are still waiting for license info.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            int - The number of unfinished switches.
+        """
+        with self.lock:
+            return sum(1 for future in self.futures.values() if not future.done())
+
+    def wait(self, timeout=None) -> dict:
+        """
+        Waits for the queued switches and returns their license info.
+
+        Parameters:
+        -----------
+            timeout - How many seconds to wait, or None to wait for all of them.
+
+        Returns:
+        --------
+            dict - IP -> license dictionary for every switch that finished with license info.
+        """
+        with self.lock:
+            futures = dict(self.futures)
+        wait(list(futures.values()), timeout=timeout)
+        # Keep what the switches taught us.
+        license_strategy_cache.save()
+
+        return {ip_addr: future.result() for ip_addr, future in futures.items() if future.done() and not future.cancelled() and future.result() is not None}
+
+    def cancel(self, ip_addrs=None) -> None:
+        """
+        Drops switches that haven't started yet and closes their sessions.
+
+        Parameters:
+        -----------
+            ip_addrs - The switches to drop, or None for every switch.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            for ip_addr, future in self.futures.items():
+                if ip_addrs is not None and ip_addr not in ip_addrs:
+                    continue
+                # Close the session of anything that never ran.
+                if future.cancel() and ip_addr in self.held_connections:
+                    try:
+                        self.held_connections.pop(ip_addr).disconnect()
+                    except Exception:
+                        pass
+                    self.held_sessions.release()
@@ -0,0 +1,279 @@
+# Import required packages.
+import re
+import time
+from typing import List
+
+from netmiko.exceptions import ReadTimeout
+from utils.json_cache import JsonCache
+
+# Create constants.
+LICENSE_STRATEGY_FILE = "license_strategies.json"
+# Strategy names, in the order they're tried when nothing is known about a switch.
+LICENSE_FEATURE = "feature"
+LICENSE_STATUS = "status"
+LICENSE_RIGHT_TO_USE = "right_to_use"
+LICENSE_COMMANDS = {
+    LICENSE_FEATURE: "show license | include Feature|Period|State",
+    LICENSE_STATUS: "show license all | include Status:",
+    LICENSE_RIGHT_TO_USE: "show license right-to-use"
+}
+DEFAULT_LICENSE_ORDER = [LICENSE_FEATURE, LICENSE_STATUS, LICENSE_RIGHT_TO_USE]
+COMMAND_ERROR_MARKERS = ["Invalid input", "Incomplete command", "Ambiguous command"]
+
+
+def is_command_error(output) -> bool:
+    """
+    Checks if the switch rejected a command instead of answering it.
+
+    Parameters:
+    -----------
+        output - The command output.
+
+    Returns:
+    --------
+        bool - Whether the output is an IOS error message.
+    """
+    return output.lstrip().startswith("%") or any(marker in output for marker in COMMAND_ERROR_MARKERS)
+
+def parse_feature_license(output, license_dict) -> bool:
+    """
+    Parses show license output from classic IOS switches.
+
+    Parameters:
+    -----------
+        output - The command output.
+        license_dict - The license dictionary to fill in.
+
+    Returns:
+    --------
+        bool - Whether the switch understood the command.
+    """
+    # Check if the command output failed.
+    if is_command_error(output) or len(output.splitlines()) <= 3:
+        return False
+    # Split output by keyword INDEX.
+    sections = output.split("Index")
+    if len(sections) < 2:
+        return False
+
+    # Store raw license output.
+    license_dict["raw_output"] = output
+    # Use the section with more info. Some switches only have one.
+    lines = sections[1].splitlines() if len(sections[1].splitlines()) >= 3 or len(sections) < 3 else sections[2].splitlines()
+    # Check for expire status.
+    for line in lines:
+        # Get license period.
+        if "Period left" in line:
+            # Remove unneccesary keywords and remove leading and trailing whitespace.
+            line = line.replace("Period left:", "").strip()
+            # Replace commas and tabs with dashes and spaces.
+            line = line.replace(",", " -")
+            line = line.replace("\t", " ")
+            # Append info to license dictionary.
+            license_dict["expire_period"] = line
+        # Get license state.
+        if "License State" in line:
+            # Remove uneccesary keywords and remove leading and trailing whitespace.
+            line = line.replace("License State:", "").strip()
+            # Replace commas and tabs with dashes and spaces.
+            line = line.replace(",", " -")
+            line = line.replace("\t", " ")
+            # Append info the license dictionary.
+            license_dict["license_state"] = line
+
+    return True
+
+def parse_status_license(output, license_dict) -> bool:
+    """
+    Parses show license all output from smart licensing switches.
+
+    Parameters:
+    -----------
+        output - The command output.
+        license_dict - The license dictionary to fill in.
+
+    Returns:
+    --------
+        bool - Whether the switch understood the command.
+    """
+    # Check if the command output failed.
+    lines = output.splitlines()
+    if is_command_error(output) or len(lines) <= 3:
+        return False
+
+    # Store raw license output.
+    license_dict["raw_output"] = output
+    # The first line should be the register status.
+    license_dict["license_state"] = lines[0]
+    # The second value should be the expiration time.
+    license_dict["expire_period"] = lines[1]
+
+    return True
+
+def parse_right_to_use_license(output, license_dict) -> bool:
+    """
+    Parses show license right-to-use output from right to use switches.
+
+    Parameters:
+    -----------
+        output - The command output.
+        license_dict - The license dictionary to fill in.
+
+    Returns:
+    --------
+        bool - Whether the switch understood the command.
+    """
+    # Check if the command ran successfully.
+    if is_command_error(output) or len(output) <= 3:
+        return False
+
+    # Split output by newlines. Cutoff first two.
+    names = ""
+    periods = ""
+    for line in output.splitlines()[2:]:
+        # Check if we hit the end of the list.
+        if "--------" in line:
+            break
+        # Split line sections up by spaces.
+        info = re.split(" +", line)
+        if len(info) < 3:
+            continue
+        # Add data to var.
+        names += info[1] + f"({info[2]})" + " | "
+        periods += info[-1] + " | "
+    # Output without any license rows isn't an answer.
+    if len(names) <= 0:
+        return False
+
+    # Append data to license dictionary.
+    license_dict["raw_output"] = output
+    license_dict["license_state"] = names
+    license_dict["expire_period"] = periods
+
+    return True
+
+# Create parser lookup. Defined after the parsers so the names exist.
+LICENSE_PARSERS = {
+    LICENSE_FEATURE: parse_feature_license,
+    LICENSE_STATUS: parse_status_license,
+    LICENSE_RIGHT_TO_USE: parse_right_to_use_license
+}
+
+
+class LicenseStrategyCache(JsonCache):
+    """
+    Remembers which show license variant each switch answers, and which one works for each platform. A switch we've
+    seen before, or one whose platform we've seen before, is sent the right command first, so it only needs one license
+    command instead of up to three. Strategies are never shared by device_type alone, since one IOS driver covers
+    switches that answer different variants.
+    """
+    def __init__(self, filename=LICENSE_STRATEGY_FILE) -> None:
+        # Create parent class.
+        JsonCache.__init__(self, filename)
+
+    def get_platform_key(self, device_type, platform=None) -> str:
+        """
+        Returns the platform key a switch's strategy is shared under.
+
+        Parameters:
+        -----------
+            device_type - The netmiko device_type the switch logged in with.
+            platform - The CDP platform of the switch, if a neighbor reported it.
+
+        Returns:
+        --------
+            str - The key, or None if the platform isn't known.
+        """
+        if platform is None or platform == "NULL":
+            return None
+
+        return f"{device_type}|{platform}"
+
+    def order(self, ip_addr, device_type, platform=None) -> List[str]:
+        """
+        Sorts the license strategies so the one most likely to work on this switch comes first.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            device_type - The netmiko device_type the switch logged in with.
+            platform - The CDP platform of the switch, if a neighbor reported it.
+
+        Returns:
+        --------
+            list - The strategy names, most likely first.
+        """
+        with self.lock:
+            data = self.load()
+            # This exact switch wins, then its platform.
+            strategy = data.get("devices", {}).get(ip_addr)
+            key = self.get_platform_key(device_type, platform)
+            if strategy is None and key is not None:
+                strategy = data.get("platforms", {}).get(key)
+
+        # Move the known strategy to the front.
+        if strategy not in LICENSE_COMMANDS:
+            return list(DEFAULT_LICENSE_ORDER)
+
+        return [strategy] + [name for name in DEFAULT_LICENSE_ORDER if name != strategy]
+
+    def store(self, ip_addr, strategy, device_type, platform=None) -> None:
+        """
+        Stores the strategy that worked on a switch. Only call it once the output parsed.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            strategy - The strategy name that worked.
+            device_type - The netmiko device_type the switch logged in with.
+            platform - The CDP platform of the switch, if a neighbor reported it.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            data = self.load()
+            # Only write if something changed.
+            key = self.get_platform_key(device_type, platform)
+            if data.get("devices", {}).get(ip_addr) == strategy and (key is None or data.get("platforms", {}).get(key) == strategy):
+                return
+            data.setdefault("devices", {})[ip_addr] = strategy
+            if key is not None:
+                data.setdefault("platforms", {})[key] = strategy
+            data["updated"] = time.time()
+            self.mark_dirty()
+
+
+# Create the license strategy cache shared by every discovery.
+license_strategy_cache = LicenseStrategyCache()
+
+
+def get_license_info(ssh_connection, license_dict, ip_addr, device_type, platform=None) -> dict:
+    """
+    Fills in a switch's license info, sending the show license variant most likely to work first.
+
+    Parameters:
+    -----------
+        ssh_connection - The live connection to the switch.
+        license_dict - The base license dictionary to fill in.
+        ip_addr - The IP address of the switch.
+        device_type - The netmiko device_type the switch logged in with.
+        platform - The CDP platform of the switch, if a neighbor reported it.
+
+    Returns:
+    --------
+        dict - The license dictionary.
+    """
+    for strategy in license_strategy_cache.order(ip_addr, device_type, platform):
+        # Catch any readtimeouts.
+        try:
+            output = ssh_connection.send_command(LICENSE_COMMANDS[strategy])
+        except ReadTimeout:
+            continue
+        # Stop at the first variant the switch understands.
+        if LICENSE_PARSERS[strategy](output, license_dict):
+            license_strategy_cache.store(ip_addr, strategy, device_type, platform)
+            break
+
+    return license_dict
@@ -0,0 +1,321 @@
+# Import required packages.
+import asyncio
+import logging
+import math
+import time
+from array import array
+from threading import Thread
+from typing import List
+
+from utils.logging_handlers import CsvHandler
+from utils.ping import PING_TIMEOUT, PROBE_ICMP, PROBE_TCP, TCP_PROBE_TIMEOUT, IcmpSweeper, LocalResourceError, TcpProber, expand_targets, get_max_in_flight, reachability_cache
+from utils.resolver import resolver_cache
+
+# Create constants.
+MONITOR_INTERVAL = 10.0
+MONITOR_HISTORY_LENGTH = 60
+MONITOR_MAX_IN_FLIGHT = 256
+MONITOR_CSV_FILE = "logs/monitor.csv"
+MONITOR_CSV_HEADER = "TIMESTAMP,IP,HOSTNAME,STATE,RTT_MS,LOSS_PERCENT"
+STATE_UNKNOWN = 0
+STATE_UP = 1
+STATE_DOWN = 2
+STATE_NAMES = {STATE_UNKNOWN: "UNKNOWN", STATE_UP: "UP", STATE_DOWN: "DOWN"}
+
+
+class ReachabilityMonitor():
+    """
+    Re-sweeps a fixed set of hosts every interval seconds and only reports hosts that change state.
+
+    Every host gets MONITOR_HISTORY_LENGTH slots of RTT history in one flat array of doubles, NaN meaning the probe
+    was lost. All hosts are probed once per pass, so the ring buffer position is shared and only the pass counter
+    needs to move. Probes go through one long lived ICMP socket (or TCP prober) with at most max_in_flight outstanding,
+    so thousands of hosts cost a short burst every interval instead of a thread per host.
+    """
+    def __init__(self, text, interval=MONITOR_INTERVAL, mode=PROBE_ICMP, max_in_flight=MONITOR_MAX_IN_FLIGHT, history_length=MONITOR_HISTORY_LENGTH) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.text = text
+        self.interval = interval
+        self.mode = mode
+        self.max_in_flight = max_in_flight
+        self.history_length = history_length
+        self.ip_addrs = []
+        self.hostnames = []
+        self.index = {}
+        self.rtt_history = array("d")
+        self.states = bytearray()
+        self.pass_count = 0
+        self.loop = None
+        self.stop_event = None
+        self.thread = None
+        self.is_running = False
+
+        # Transition rows go to their own csv file and not to the main log.
+        self.csv_logger = logging.getLogger(f"{__name__}.transitions")
+        self.csv_logger.propagate = False
+        self.csv_logger.setLevel(logging.INFO)
+        if not self.csv_logger.handlers:
+            csv_handler = CsvHandler(MONITOR_CSV_FILE, MONITOR_CSV_HEADER)
+            csv_handler.setFormatter(logging.Formatter("%(asctime)s,%(message)s", "%Y-%m-%d %H:%M:%S"))
+            self.csv_logger.addHandler(csv_handler)
+
+    def start(self) -> None:
+        """
+        Starts monitoring in a background thread.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Don't start twice.
+        if self.is_running:
+            return
+
+        # Set toggle and start thread.
+        self.is_running = True
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Tells the monitor thread to finish its current pass and exit.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Set toggle.
+        self.is_running = False
+        # Wake the loop up if it's sleeping between passes.
+        if self.loop is not None and self.stop_event is not None and not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self.stop_event.set)
+            except RuntimeError:
+                # Loop already closed.
+                pass
+
+    def run(self) -> None:
+        """
+        Thread target. Runs the monitor on its own selector event loop until stopped.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Selector loops support add_reader on every platform, proactor loops on windows don't.
+        self.loop = asyncio.SelectorEventLoop()
+        try:
+            self.loop.run_until_complete(self.monitor())
+        except Exception:
+            self.logger.exception("Reachability monitor stopped unexpectedly.")
+        finally:
+            self.is_running = False
+            self.loop.close()
+
+    async def monitor(self) -> None:
+        """
+        Resolves the targets once and then sweeps them every interval until stopped.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Create stop event on this loop.
+        self.stop_event = asyncio.Event()
+
+        # Resolve everything up front, the host list doesn't change while monitoring.
+        await self.load_targets()
+        if len(self.ip_addrs) <= 0:
+            self.logger.warning("Reachability monitor has nothing to watch. Enter some IPs first.")
+            return
+        self.logger.info(f"Monitoring {len(self.ip_addrs)} hosts every {self.interval} seconds. Only state changes will be logged.")
+
+        # Create prober. Timeouts have to fit inside the interval.
+        timeout = min(PING_TIMEOUT, self.interval / 2)
+        if self.mode == PROBE_TCP:
+            prober = TcpProber(min(timeout, TCP_PROBE_TIMEOUT))
+        else:
+            prober = IcmpSweeper(timeout)
+        prober.open(self.loop)
+
+        try:
+            while self.is_running:
+                # Sweep every host.
+                start_time = time.monotonic()
+                await self.sweep(prober)
+                elapsed = time.monotonic() - start_time
+
+                # Print a summary of the first pass so the user knows where things stand.
+                if self.pass_count == 1:
+                    up_count = self.states.count(STATE_UP)
+                    self.logger.info(f"Monitor baseline: {up_count} of {len(self.ip_addrs)} hosts are up.")
+                # Warn if we can't keep up with the interval.
+                if elapsed > self.interval:
+                    self.logger.warning(f"Monitor pass took {elapsed:.1f} seconds, longer than the {self.interval} second interval.")
+
+                # Sleep until the next pass or until we're told to stop.
+                try:
+                    await asyncio.wait_for(self.stop_event.wait(), max(0.0, self.interval - elapsed))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            # Close socket.
+            prober.close()
+            self.logger.info("Reachability monitor stopped.")
+
+    async def load_targets(self) -> None:
+        """
+        Expands the textbox lines, resolves them, and allocates the history buffers.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Resolve all names in one batch and remove duplicates.
+        targets = list(expand_targets(self.text))
+        resolved = await resolver_cache.resolve_many(targets)
+        self.ip_addrs = list(dict.fromkeys(ip_addr for ip_addr in resolved.values() if ip_addr is not None))
+        self.index = {ip_addr: i for i, ip_addr in enumerate(self.ip_addrs)}
+
+        # Get hostnames for nicer log messages.
+        hostnames = await resolver_cache.reverse_lookup_many(self.ip_addrs)
+        self.hostnames = [hostnames[ip_addr] or ip_addr for ip_addr in self.ip_addrs]
+
+        # Allocate history. Every slot starts out as a lost probe.
+        self.rtt_history = array("d", [math.nan]) * (len(self.ip_addrs) * self.history_length)
+        self.states = bytearray(len(self.ip_addrs))
+        self.pass_count = 0
+
+    async def sweep(self, prober) -> None:
+        """
+        Probes every host once and records the results.
+
+        Parameters:
+        -----------
+            prober - The IcmpSweeper or TcpProber to send the probes through.
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Every host writes to the same slot this pass.
+        slot = self.pass_count % self.history_length
+        self.pass_count += 1
+        host_indexes = iter(range(len(self.ip_addrs)))
+
+        async def worker():
+            # Keep pulling hosts until the iterator is empty.
+            for i in host_indexes:
+                try:
+                    reachable, rtt, _ = await prober.probe(self.ip_addrs[i])
+                except LocalResourceError as error:
+                    # We ran out of sockets, the host didn't go anywhere. Record nothing so its state stays the same.
+                    self.logger.error(f"{error}. Skipping {self.ip_addrs[i]} this pass.")
+                    continue
+                self.record(i, slot, reachable, rtt)
+
+        await asyncio.gather(*[worker() for _ in range(min(self.max_in_flight, get_max_in_flight(self.mode), len(self.ip_addrs)))])
+
+    def record(self, i, slot, reachable, rtt) -> None:
+        """
+        Stores one probe result and reports it if the host changed state.
+
+        Parameters:
+        -----------
+            i - The host's index.
+            slot - The ring buffer slot for this pass.
+            reachable - Whether the host answered.
+            rtt - The round trip time in seconds, or None.
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Store rtt.
+        self.rtt_history[i * self.history_length + slot] = rtt if reachable and rtt is not None else math.nan
+        # Keep the reachability cache warm for the configure window.
+        reachability_cache.store(self.ip_addrs[i], reachable, rtt, self.hostnames[i])
+
+        # Check for a state change.
+        old_state = self.states[i]
+        new_state = STATE_UP if reachable else STATE_DOWN
+        if old_state == new_state:
+            return
+        self.states[i] = new_state
+
+        # Hosts that are up on the first pass are the baseline, not a transition.
+        if old_state == STATE_UNKNOWN and new_state == STATE_UP:
+            return
+
+        # Report transition.
+        ip_addr, hostname = self.ip_addrs[i], self.hostnames[i]
+        loss = self.get_loss_percent(ip_addr)
+        if new_state == STATE_UP:
+            self.logger.info(f"Monitor: {hostname} ({ip_addr}) is back UP, {rtt * 1000:.1f}ms.")
+        else:
+            self.logger.warning(f"Monitor: {hostname} ({ip_addr}) went DOWN. {loss:.0f}% loss over the last {min(self.pass_count, self.history_length)} passes.")
+        self.csv_logger.info(f"{ip_addr},{hostname},{STATE_NAMES[new_state]},{f'{rtt * 1000:.2f}' if reachable and rtt is not None else ''},{loss:.1f}")
+
+    def get_history(self, ip_addr) -> List[float]:
+        """
+        Returns the RTT history of a host, oldest first.
+
+        Parameters:
+        -----------
+            ip_addr - The IPv4 address.
+
+        Returns:
+        --------
+            list - RTTs in seconds, NaN for lost probes. Empty if the host isn't monitored.
+        """
+        # Check host exists.
+        i = self.index.get(ip_addr)
+        if i is None or self.pass_count <= 0:
+            return []
+
+        # Get this hosts section of the buffer and unroll it.
+        history = self.rtt_history[i * self.history_length:(i + 1) * self.history_length]
+        if self.pass_count < self.history_length:
+            return history[:self.pass_count].tolist()
+        slot = self.pass_count % self.history_length
+
+        return (history[slot:] + history[:slot]).tolist()
+
+    def get_loss_percent(self, ip_addr) -> float:
+        """
+        Returns the percent of probes lost over the stored history.
+
+        Parameters:
+        -----------
+            ip_addr - The IPv4 address.
+
+        Returns:
+        --------
+            float - The loss percent, or 0.0 if there's no history.
+        """
+        history = self.get_history(ip_addr)
+        if len(history) <= 0:
+            return 0.0
+
+        return 100.0 * sum(1 for rtt in history if math.isnan(rtt)) / len(history)
@@ -1,29 +1,364 @@
 # Import required packages and modules.
-from ast import Tuple
-from functools import partial
-import re
+import hashlib
 import logging
-from multiprocessing.pool import ThreadPool
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Tuple
 from netmiko import NetmikoAuthenticationException
 from netmiko.exceptions import NetmikoAuthenticationException, NetmikoTimeoutException
 from netmiko.exceptions import NetmikoAuthenticationException, NetmikoTimeoutException, ReadTimeout
 from netmiko.ssh_dispatcher import ConnectHandler
-
-# Define Constants.
-MAX_DISCOVERY_THREADS = 100
-
-# Create global file variables.
-ip_discovery_list = []
-export_info_list = []
-license_info = []
-
-def cdp_auto_discover(ip_list, usernames, passwords, enable_secrets, enable_telnet=False, force_telnet=False, export_info=False, recursion_level=0) -> list:
+from utils.cdp_parser import parse_cdp_neighbors_detail
+from utils.crawl_scope import SCOPE_TIME, CrawlScope
+from utils.crawl_snapshot import crawl_snapshot
+from utils.credential_cache import credential_affinity
+from utils.device_type_cache import device_type_cache
+from utils.executor import connection_executor
+from utils.host_failure_cache import FAILURE_AUTH, FAILURE_REFUSED, FAILURE_TIMEOUT, host_failure_cache
+from utils.license_collector import LicenseCollector
+from utils.open_connection import connect_device
+from utils.ping import LocalResourceError, reachability_cache
+from utils.resolver import resolver_cache
+
+# Create constants.
+# The lines that identify each neighbor. Holdtimes change every few seconds, so they're left out.
+# How long the license stage gets after discovery finishes, unless the caller says otherwise.
+LICENSE_WAIT_TIME = 120.0
+CDP_SIGNATURE_KEYWORDS = ["Device ID", "IP address", "Interface"]
+CDP_SIGNATURE_COMMAND = "show cdp neighbors detail | include " + "|".join(CDP_SIGNATURE_KEYWORDS)
+
+
+class DiscoverySession():
     """
-    This function takes in a list of strings containing the ip addresses to start auto discovery with.
-    Then new processes are spawned that run a show cdp neighbors command and parse the output to find more connected switches.
-    Those new switches then go through the same process until no more switches are discoverd.
+    One CDP auto discovery run. The session owns its frontier, duplicate indexes, license results and exported records,
+    so several sessions can crawl different sites at the same time. Sessions share the discovery executor and
+    connection code, and nothing in the session is global.
+    """
+    def __init__(self, usernames, passwords, enable_secrets, enable_telnet=False, force_telnet=False, export_info=False, executor=None, snmp_engine=None, incremental=True, collect_licenses=True, scope=None, ssh_transport=None) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.usernames = usernames
+        self.passwords = passwords
+        self.enable_secrets = enable_secrets
+        self.enable_telnet = enable_telnet
+        self.force_telnet = force_telnet
+        self.export_info = export_info
+        self.executor = executor if executor is not None else connection_executor
+        # Switches are asked over SNMP first if an engine is given, and only logged into over SSH if that fails.
+        self.snmp_engine = snmp_engine
+        # Switches are logged into on the async transport if one is given, and only handed to netmiko if it can't handle them.
+        self.ssh_transport = ssh_transport
+        # Limits on how far the crawl goes. Neighbors outside it are only kept as records, mapped to why they were left out.
+        self.scope = scope if scope is not None else CrawlScope()
+        self.out_of_scope = {}
+        # Results from the last discovery. Switches whose neighbors didn't change aren't fully queried again. They're still
+        # logged into to check, and their licenses are still read if licenses are collected, since those can change.
+        self.snapshot = crawl_snapshot if incremental else None
+        # Queries started early for switches the last discovery found, waiting for the crawl to reach them.
+        self.prefetched = {}
+        self.unchanged_count = 0
+        # Switches skipped because they failed in an earlier discovery, mapped to why they failed.
+        self.skipped_hosts = {}
+        # Results.
+        self.ip_discovery_list = []
+        self.export_info_list = []
+        # License results keyed by switch IP, and by normalized hostname for records without a usable IP.
+        self.license_info = {}
+        self.license_hostname_index = {}
+        # Indexes kept alongside the lists above so membership checks don't scan them.
+        self.ip_discovery_index = set()
+        self.export_hostname_index = set()
+        # CDP platform of each switch, as reported by the neighbor that found it. Picks the license command to send first.
+        self.platforms = {}
+        # License info is only exported, so it's only collected when exporting. It runs as its own stage next to the crawl.
+        self.license_collector = LicenseCollector(usernames, passwords, enable_secrets, self.platforms) if export_info and collect_licenses else None
+        # Depth each switch was found at. Also stops the same switch from being submitted twice.
+        self.depths = {}
+        # Futures that are still running, mapped to the switch they're crawling, and the ones the SNMP engine is running.
+        self.in_flight = {}
+        self.snmp_queries = set()
+        self.async_queries = set()
+
+    def discover(self, ip_list) -> Tuple[list, list]:
+        """
+        This function takes in a list of strings containing the ip addresses to start auto discovery with.
+        Each switch is handed to the discovery executor, which runs a show cdp neighbors command and parses the output to find more connected switches.
+        Every newly found switch is submitted as soon as its parent finishes, so discovery never waits on the slowest switch of a level.
+        Discovery ends when nothing is left in flight.
+
+        Parameters:
+        -----------
+            ip_list - A list of the initially known switch IPs.
+
+        Returns:
+        --------
+            list(string) - A list of strings containg the new switch IPs. Duplicated are removed.
+            list(dict) - The exported device info.
+        """
+        # Failures from before this point are the ones the negative cache skipped.
+        start_time = time.time()
+        self.scope.start()
+        # The seed list comes straight from the textbox. Resolve any hostnames in one batch so they dedupe against the IPs CDP gives us.
+        seeds = [addr.strip() for addr in ip_list if len(addr.strip()) > 0]
+        resolved = resolver_cache.resolve_many_sync(seeds)
+        for addr in seeds:
+            ip_addr = resolved[addr] if resolved[addr] is not None else addr
+            if ip_addr not in self.depths:
+                self.submit(ip_addr, 0)
+        # Start on every switch we already know is behind the seeds, so nothing waits for its parent to finish first.
+        # With a device limit we can't know ahead of time which switches will make the cut, so nothing is started early.
+        if self.snapshot is not None and self.scope.max_devices is None:
+            for ip_addr in self.snapshot.get_known_switches(list(self.depths), self.scope.max_depth, self.scope.is_allowed):
+                self.prefetched[ip_addr] = self.start_query(ip_addr)
+
+        # Keep handling switches as they finish until the frontier is empty.
+        while len(self.in_flight) > 0:
+            done, _ = wait(self.in_flight, timeout=self.scope.get_remaining_time(), return_when=FIRST_COMPLETED)
+            # Out of time. Drop whatever hasn't finished, switches that are mid login finish on their own and are ignored.
+            if len(done) <= 0:
+                for future, ip_addr in self.in_flight.items():
+                    future.cancel()
+                    self.out_of_scope.setdefault(ip_addr, SCOPE_TIME)
+                self.in_flight.clear()
+                self.snmp_queries.clear()
+                self.async_queries.clear()
+                self.logger.warning(f"Discovery ran out of its {self.scope.time_budget} second time budget.")
+                break
+            for future in done:
+                parent_addr = self.in_flight.pop(future)
+                came_from_snmp = future in self.snmp_queries
+                self.snmp_queries.discard(future)
+                self.async_queries.discard(future)
+                depth = self.depths[parent_addr]
+                # Get this switches results.
+                try:
+                    result = future.result()
+                except Exception:
+                    # Print log and move on, one bad switch shouldn't end the whole discovery.
+                    self.logger.exception(f"Discovery of {parent_addr} failed.")
+                    continue
+                # SNMP didn't work on this switch, log in over SSH instead. If the async transport couldn't handle it, use netmiko.
+                if result is None:
+                    self.submit(parent_addr, depth, use_snmp=False, use_async=came_from_snmp)
+                    continue
+                discovered_ip_addrs, device_infos, signature = result
+                # Reuse the last result if the neighbors didn't change, otherwise remember this one for next time.
+                if discovered_ip_addrs is None:
+                    entry = self.snapshot.get(parent_addr)
+                    discovered_ip_addrs, device_infos = entry["cdp_ips"], [dict(info) for info in entry["device_infos"]]
+                    self.unchanged_count += 1
+                elif self.snapshot is not None:
+                    self.snapshot.store(parent_addr, signature, self.export_info, discovered_ip_addrs, device_infos)
+
+                # SSH crawls already handed their session to the license stage. Switches read over SNMP get logged into again.
+                if self.license_collector is not None and came_from_snmp:
+                    self.license_collector.submit(parent_addr)
+
+                # Crawl any new switches in scope right away. The rest are kept as leaf records and never logged into.
+                in_scope_ips = []
+                for ip_addr in discovered_ip_addrs:
+                    if ip_addr not in self.depths:
+                        # Checked every time it's found, a switch past the hop limit may turn up closer through another path.
+                        reason = self.scope.check(ip_addr, depth + 1, len(self.depths))
+                        if reason is not None:
+                            self.out_of_scope[ip_addr] = reason
+                            continue
+                        self.out_of_scope.pop(ip_addr, None)
+                        self.submit(ip_addr, depth + 1)
+                    in_scope_ips.append(ip_addr)
+                # Store results.
+                new_ips = self.record_discoveries(in_scope_ips, device_infos, depth)
+
+                # Print log.
+                if len(new_ips) > 0:
+                    self.logger.info(f"Discovered IPs {new_ips} from the following device: {parent_addr}")
 
-    This method is recursive.
+        # Print log.
+        self.logger.info("Discovery has reached the end of the network.")
+        if self.unchanged_count > 0:
+            self.logger.info(f"{self.unchanged_count} of {len(self.depths)} switches hadn't changed since the last discovery and weren't queried again.")
+        # Report what the scope left out.
+        if len(self.out_of_scope) > 0:
+            counts = Counter(self.out_of_scope.values())
+            self.logger.info(f"Left {len(self.out_of_scope)} switches out of the crawl ({', '.join(f'{count} {reason}' for reason, count in sorted(counts.items()))}): {sorted(self.out_of_scope)}")
+        # Report what was skipped because it failed in an earlier discovery.
+        self.skipped_hosts = host_failure_cache.get_skipped(self.depths, start_time, self.usernames)
+        if len(self.skipped_hosts) > 0:
+            counts = Counter(self.skipped_hosts.values())
+            self.logger.info(f"Skipped {len(self.skipped_hosts)} switches that recently failed ({', '.join(f'{count} {reason}' for reason, count in sorted(counts.items()))}): {sorted(self.skipped_hosts)}")
+        metrics = self.executor.get_metrics()
+        self.logger.debug(f"Connection executor: limit {metrics['limit']}, {metrics['connect_successes']} connects, {metrics['connect_failures']} timeouts or refusals.")
+
+        # Switches the last discovery found that the crawl never reached aren't part of the network anymore. Drop any
+        # license work their early queries queued too.
+        for future in self.prefetched.values():
+            future.cancel()
+        if self.license_collector is not None and len(self.prefetched) > 0:
+            self.license_collector.cancel(set(self.prefetched))
+        self.prefetched.clear()
+
+        # Licenses are still being collected. Call wait_for_licenses to join them to the export records.
+        if self.license_collector is not None and self.license_collector.get_pending_count() > 0:
+            self.logger.info(f"Topology is ready. Still collecting license info from {self.license_collector.get_pending_count()} switches.")
+        # Keep the credentials and drivers that worked for next time.
+        credential_affinity.save()
+        device_type_cache.save()
+        host_failure_cache.save()
+        if self.snapshot is not None:
+            self.snapshot.save()
+
+        return self.ip_discovery_list, self.export_info_list
+
+    def submit(self, ip_addr, depth, use_snmp=True, use_async=True) -> None:
+        """
+        Hands a switch to the SNMP engine, the async transport or the executor to be crawled.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            depth - How many hops the switch is from the seed switches.
+            use_snmp - Whether to try SNMP first, if the session has an SNMP engine.
+            use_async - Whether to log in on the async transport, if the session has one.
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Record depth.
+        self.depths[ip_addr] = depth
+        # Adopt the query if it was already started from the snapshot.
+        if use_snmp and ip_addr in self.prefetched:
+            self.in_flight[self.prefetched.pop(ip_addr)] = ip_addr
+            return
+        self.in_flight[self.start_query(ip_addr, use_snmp, use_async)] = ip_addr
+
+    def start_query(self, ip_addr, use_snmp=True, use_async=True) -> Future:
+        """
+        Starts querying a switch over SNMP or SSH.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            use_snmp - Whether to try SNMP first, if the session has an SNMP engine.
+            use_async - Whether to log in on the async transport, if the session has one.
+
+        Returns:
+        --------
+            Future - Resolves to the same tuple as get_cdp_neighbors_info, or None if SNMP didn't answer or the async transport couldn't log in.
+        """
+        # Try SNMP first. The engine's futures resolve to None if the switch doesn't answer.
+        if use_snmp and self.snmp_engine is not None:
+            future = self.snmp_engine.submit(ip_addr, self.export_info)
+            self.snmp_queries.add(future)
+            return future
+
+        # Log in over SSH. Pass the last signature so an unchanged switch can be skipped.
+        known_signature = self.snapshot.get_signature(ip_addr, self.export_info) if self.snapshot is not None else None
+        if use_async and self.ssh_transport is not None:
+            future = self.ssh_transport.submit(get_cdp_neighbors_info_async(self.ssh_transport, self.usernames, self.passwords, self.enable_secrets, self.enable_telnet, self.force_telnet, self.export_info, ip_addr, known_signature, self.license_collector))
+            self.async_queries.add(future)
+            return future
+        return self.executor.submit(get_cdp_neighbors_info, self.usernames, self.passwords, self.enable_secrets, self.enable_telnet, self.force_telnet, self.export_info, ip_addr, known_signature, self.license_collector)
+
+    def record_discoveries(self, discovered_ip_addrs, device_infos, depth) -> list:
+        """
+        Adds one switches discovered IPs and neighbor records to the session, skipping duplicates.
+        Duplicates are found through the IP and hostname indexes, so every check is constant time no matter how big the lists get.
+
+        Parameters:
+        -----------
+            discovered_ip_addrs - The switch IPs found on the device.
+            device_infos - The neighbor records found on the device.
+            depth - How many hops the device is from the seed switches.
+
+        Returns:
+        --------
+            list - The IPs that hadn't been discovered before.
+        """
+        # Get resulting IPs and filter out duplicates.
+        new_ips = []
+        for ip_addr in discovered_ip_addrs:
+            if ip_addr not in self.ip_discovery_index:
+                # Append them to discover list. Also create a new list with this switches new unique IPs.
+                self.ip_discovery_index.add(ip_addr)
+                self.ip_discovery_list.append(ip_addr)
+                new_ips.append(ip_addr)
+
+        # Check if export info is toggled on.
+        if self.export_info:
+            for info in device_infos:
+                # Remember the platform of switches we're about to log into.
+                if info.get("is_switch") and info.get("platform", "NULL") != "NULL":
+                    self.platforms.setdefault(info["ip_addr"], info["platform"])
+                # Add device info to info list if its hostname isn't already there.
+                if len(info) > 0 and info["hostname"] != "NULL":
+                    hostname = normalize_hostname(info["hostname"])
+                    if hostname not in self.export_hostname_index:
+                        # Add recursion level to info.
+                        info["recursion_level"] = depth
+                        # Finally, append to list.
+                        self.export_hostname_index.add(hostname)
+                        self.export_info_list.append(info)
+
+        return new_ips
+
+    def wait_for_licenses(self, timeout=LICENSE_WAIT_TIME) -> list:
+        """
+        Waits for the license stage and joins its results to the export records. Switches still queued when the timeout
+        runs out are dropped. The stage gets its own time after discovery instead of what's left of the scope's budget,
+        which may be nothing.
+
+        Parameters:
+        -----------
+            timeout - How many seconds to wait, or None to wait for every switch.
+
+        Returns:
+        --------
+            list(dict) - The exported device info with license info attached.
+        """
+        # Store licenses by IP and hostname.
+        if self.license_collector is not None:
+            for ip_addr, license_dict in self.license_collector.wait(timeout).items():
+                self.license_info[ip_addr] = license_dict
+                self.license_hostname_index[normalize_hostname(license_dict["hostname"])] = license_dict
+            # Out of time. Switches mid command finish on their own and are ignored.
+            pending_count = self.license_collector.get_pending_count()
+            if timeout is not None and pending_count > 0:
+                self.license_collector.cancel()
+                self.logger.warning(f"License collection ran out of time with {pending_count} switches left.")
+
+        # Attach license info to each export record in one pass.
+        self.merge_license_info()
+
+        return self.export_info_list
+
+    def merge_license_info(self) -> None:
+        """
+        Attaches the license results to the exported records with one lookup per record.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        for export_data in self.export_info_list:
+            # Find the license by IP first, then by hostname.
+            license_data = self.license_info.get(export_data["ip_addr"])
+            if license_data is None:
+                license_data = self.license_hostname_index.get(normalize_hostname(export_data["hostname"]))
+            # Add license info, or empty license info if nothing matches.
+            export_data["license_state"] = license_data["license_state"] if license_data is not None else "NULL"
+            export_data["license_expire_period"] = license_data["expire_period"] if license_data is not None else "NULL"
+            export_data["license_info"] = license_data["raw_output"] if license_data is not None else "NULL"
+
+
+def cdp_auto_discover(ip_list, usernames, passwords, enable_secrets, enable_telnet=False, force_telnet=False, export_info=False, scope=None) -> Tuple[list, list]:
+    """
+    Runs a new discovery session from the given seed switches.
 
     Parameters:
     -----------
@@ -32,78 +367,99 @@ def cdp_auto_discover(ip_list, usernames, passwords, enable_secrets, enable_teln
         list(string) - A list of the password creds.
         boolean - Whether or not to try telnet if ssh fails.
         boolean - Whether of not to try and export info.
+        CrawlScope - Limits on how far discovery goes, or None to follow every switch.
 
     Returns:
     --------
         list(string) - A list of strings containg the new switch IPs. Duplicated are removed.
+        list(dict) - The exported device info.
     """
-    # Create instance variables and objects.
-    logger = logging.getLogger(__name__)
+    session = DiscoverySession(usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_info, scope=scope)
+    discovery_list, _ = session.discover(ip_list)
 
-    # Check if length of IP list is greater than zero.
-    if len(ip_list) == 0:
-        # Print log.
-        logger.info("Discovery has reached the end of the network, closing recursive branches now.")
-
-        # # Check if we are at the end/bottom of recursion before appending license info. Check if license_info has already been emptied.
-        # if len(license_info) > 0:
-        # Loop through export info and license info.
-        for export_data in export_info_list:
-            # Add empty license info in case nothing matches.
-            export_data["license_state"] = "NULL"
-            export_data["license_expire_period"] = "NULL"
-            export_data["license_info"] = "NULL"
-            for license_data in license_info:
-                # Check if the license hostname appears in export hostname. If so, then append license data to dictionary.
-                if license_data["ip_addr"] == export_data["ip_addr"]:
-                    export_data["license_state"] = license_data["license_state"]
-                    export_data["license_expire_period"] = license_data["expire_period"]
-                    export_data["license_info"] = license_data["raw_output"]
-
-        # Clear license_info arrray.
-        license_info.clear()
-
-        # Return if we hit the end of the switch line.
-        return ip_discovery_list, export_info_list
-    else:
-        # Create a new thread pool and get cdp info.
-        pool = ThreadPool(MAX_DISCOVERY_THREADS)
-        # Loop through each ip and create a new thread to get info.
-        result_ips = pool.map_async(partial(get_cdp_neighbors_info, usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_info), ip_list)
-        # Wait for pool threads to finish.
-        pool.close()
-        pool.join()
+    return discovery_list, session.wait_for_licenses()
 
-        # Get resulting IPs and filter out duplicates.
-        new_ips = []
-        for discovered_ip_addrs, device_infos in result_ips.get():
-            for ip_addr in discovered_ip_addrs:
-                if not ip_addr in ip_discovery_list:
-                    # Append them to discover list. Also create a new list with this recursion layers new unique IPs.
-                    ip_discovery_list.append(ip_addr)
-                    new_ips.append(ip_addr)
-            for info in device_infos:
-                # Add device info to info list if not already there.
-                if export_info and len(info) > 0 and info["hostname"] != "NULL" and not info in export_info_list:
-                    # Use list comprehension to check of the hostname has already been put into the dictionary list.
-                    hostnames = [key_val["hostname"] for key_val in export_info_list]
-                    # If not already there insert it.
-                    if info["hostname"] not in hostnames:
-                        # Add recursion level to info.
-                        info["recursion_level"] = recursion_level
-                        # Finally, append to list.
-                        export_info_list.append(info)
+def normalize_hostname(hostname) -> str:
+    """
+    Returns the hostname in the form used for duplicate checks. CDP device IDs can differ in case and padding between neighbors.
 
-        # Print log.
-        logger.info(f"Discovered IPs {new_ips} from the following devices: {ip_list}")
+    Parameters:
+    -----------
+        hostname - The hostname to normalize.
 
-        # Increment recursion level.
-        recursion_level += 1
+    Returns:
+    --------
+        str - The stripped, lowercase hostname.
+    """
+    return hostname.strip().lower()
 
-        # Recursion baby.
-        return cdp_auto_discover(new_ips, usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_info, recursion_level)
+def get_cdp_neighbors_signature(ssh_connection) -> str:
+    """
+    Hashes the switches CDP neighbor table. Holdtimes change every few seconds, so only the device IDs, addresses, and
+    interfaces are hashed. The same neighbors on the same ports always give the same signature.
 
-def get_cdp_neighbors_info(usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_info, ip_addr) -> Tuple(list):
+    Parameters:
+    -----------
+        ssh_connection - The live connection to the switch.
+
+    Returns:
+    --------
+        str - The signature.
+    """
+    return make_cdp_neighbors_signature(ssh_connection.send_command(CDP_SIGNATURE_COMMAND))
+
+def make_cdp_neighbors_signature(output, is_full_output=False) -> str:
+    """
+    Hashes the output of CDP_SIGNATURE_COMMAND. The lines are sorted so neighbor order doesn't matter.
+
+    Parameters:
+    -----------
+        output - The command output.
+        is_full_output - The output is the full show cdp neighbors detail, so pick out the lines CDP_SIGNATURE_COMMAND would.
+
+    Returns:
+    --------
+        str - The signature. The same for both kinds of output from the same neighbor table.
+    """
+    # Get the lines that identify each neighbor.
+    lines = sorted(line.strip() for line in output.splitlines() if len(line.strip()) > 0 and (not is_full_output or any(keyword in line for keyword in CDP_SIGNATURE_KEYWORDS)))
+
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+def collect_cdp_neighbors(output, ip_addr, prompt, export_info) -> Tuple[list, list]:
+    """
+    Turns show cdp neighbors detail output into the switch IPs to crawl next and the neighbor records to export.
+
+    Parameters:
+    -----------
+        output - The command output.
+        ip_addr - The IP address of the switch the output came from.
+        prompt - The hostname of the switch the output came from.
+        export_info - Whether the export fields should be filled in and the records kept.
+
+    Returns:
+    --------
+        list - The neighbor switch IPs.
+        list - The neighbor records, without duplicates. Empty if export_info is off.
+    """
+    cdp_neighbors_result_ips = []
+    device_infos = []
+    device_info_keys = set()
+    # Parse output one neighbor block at a time.
+    for device_info in parse_cdp_neighbors_detail(output, ip_addr, prompt, export_info):
+        # Append final ip to the cdp info list.
+        if device_info["ip_addr"] != "NULL" and device_info["is_switch"]:
+            cdp_neighbors_result_ips.append(device_info["ip_addr"])
+
+        # Append device to the device infos list. All values are strings or bools, so the values make a hashable key.
+        device_info_key = tuple(device_info.values())
+        if export_info and device_info_key not in device_info_keys:
+            device_info_keys.add(device_info_key)
+            device_infos.append(device_info)
+
+    return cdp_neighbors_result_ips, device_infos
+
+def get_cdp_neighbors_info(usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_info, ip_addr, known_signature=None, license_collector=None) -> Tuple[list, list, str]:
     """
     This function opens a new ssh connection with the given ip and gets cdp neighbors info.
 
@@ -114,33 +470,47 @@ def get_cdp_neighbors_info(usernames, passwords, enable_secrets, enable_telnet,
         enable_secrets - The secrets for enable mode.
         enable_telnet - Toggle telnet login attempts.
         ip_addr - The IP address of the switch.
+        known_signature - The neighbor signature from the last discovery. If it still matches, the switch isn't queried
+                          any further. It still costs a login and the signature command.
+        license_collector - The LicenseCollector to hand the open session to once the neighbors are read, or None to just close it.
 
     Returns:
     --------
-        list - A list containing the connected cdp devices IP info.
-        device_info - A list containing other device info.
+        list - A list containing the connected cdp devices IP info. None if the neighbors match known_signature.
+        device_info - A list containing other device info. None if the neighbors match known_signature.
+        signature - The switches neighbor signature, or None if it couldn't be read.
     """
     # Create instance variables and objects.
     logger = logging.getLogger(__name__)
     ssh_connection = None
     cdp_neighbors_result_ips = []
     device_infos = []
+    signature = None
+
+    # Don't wait on a switch that recently timed out, refused us, or rejected these usernames.
+    failure_reason = host_failure_cache.get_reason(ip_addr, usernames) if len(ip_addr) > 0 else None
+    if failure_reason is not None:
+        logger.debug(f"Skipping {ip_addr}, it failed recently ({failure_reason}).")
+        return cdp_neighbors_result_ips, device_infos, signature
 
     # Check if IP length is greater than zero.
     if len(ip_addr) > 0:
-        for username, password, secret in zip(usernames, passwords, enable_secrets):
+        # Try the credentials most likely to work on this switch first.
+        for username, password, secret in credential_affinity.order(ip_addr, zip(usernames, passwords, enable_secrets)):
             # If secret is empty use normal password.
             if len(secret) <= 0:
                 secret = password
 
             # Create device dictionary.
             remote_device = {"device_type": "autodetect", "host": ip_addr, "username": username, "password": password, "secret": secret}
+            failure_reason = None
             # If the device is not a switch codemiko will crash.
             # Attempt to open SSH connection first, then Telnet.
             try:
-                # Open new ssh connection with switch.
-                ssh_connection = ConnectHandler(**remote_device)
+                # Open new ssh connection with switch. Known switches skip autodetect.
+                ssh_connection = connect_device(remote_device)
             except NetmikoTimeoutException:
+                failure_reason = FAILURE_TIMEOUT
                 # Check if telnet connections have been enabled.
                 if enable_telnet or force_telnet:
                     try:
@@ -151,7 +521,13 @@ def get_cdp_neighbors_info(usernames, passwords, enable_secrets, enable_telnet,
                     except (NetmikoAuthenticationException, ConnectionRefusedError, TimeoutError, Exception):
                         # Do nothing. Errors are expected, handling is slow.
                         pass
-            except (NetmikoAuthenticationException, ConnectionRefusedError, TimeoutError):
+            except (NetmikoAuthenticationException, ConnectionRefusedError, TimeoutError) as error:
+                # Forget this username for the switch if it was rejected.
+                if isinstance(error, NetmikoAuthenticationException):
+                    failure_reason = FAILURE_AUTH
+                    credential_affinity.record_failure(ip_addr, username)
+                else:
+                    failure_reason = FAILURE_REFUSED if isinstance(error, ConnectionRefusedError) else FAILURE_TIMEOUT
                 # Check if force telnet connections have been enabled.
                 if force_telnet:
                     try:
@@ -166,6 +542,10 @@ def get_cdp_neighbors_info(usernames, passwords, enable_secrets, enable_telnet,
                 # Do nothing. Errors are expected, handling is slow.
                 pass
 
+            # A switch that didn't answer won't answer the next credentials either, so don't pay the timeout again.
+            if (ssh_connection is None or not ssh_connection.is_alive()) and failure_reason in (FAILURE_TIMEOUT, FAILURE_REFUSED) and not (enable_telnet or force_telnet):
+                break
+
             # Configure terminal properties if connection is alive.
             if ssh_connection is not None and ssh_connection.is_alive():
                 # If the enable password is wrong, then netmiko will throw an error.
@@ -183,245 +563,171 @@ def get_cdp_neighbors_info(usernames, passwords, enable_secrets, enable_telnet,
             if ssh_connection is not None and ssh_connection.is_alive():
                 # Get parent hostname.
                 prompt = ssh_connection.find_prompt()[:-1]
+                # We just logged in, so the switch is reachable. Remember it so the configure window doesn't ping it again.
+                reachability_cache.store(ip_addr, True, hostname=prompt)
+                host_failure_cache.clear_host(ip_addr)
+                failure_reason = None
+                # Remember which credentials and driver worked.
+                credential_affinity.record_success(ip_addr, username, remote_device["device_type"])
+                device_type_cache.store(ip_addr, remote_device["device_type"], hostname=prompt)
+
+                # Check if the neighbors changed since the last discovery. There's nothing to compare against the first time.
+                if known_signature is not None:
+                    try:
+                        if get_cdp_neighbors_signature(ssh_connection) == known_signature:
+                            # Nothing changed, the last result is still good. Licenses can still change, so hand the session on if they're collected.
+                            if license_collector is None or not license_collector.submit(ip_addr, prompt, remote_device["device_type"], ssh_connection):
+                                ssh_connection.disconnect()
+                            return None, None, known_signature
+                    except ReadTimeout:
+                        # Query the switch like normal.
+                        pass
 
-                # Create base dictionary.
-                license_dict = {"ip_addr": ip_addr, "license_state": "NULL", "expire_period": "NULL", "raw_output": "NULL"}
-                
                 # Catch any readtimeouts.
                 try:
-                    # Get license information about parent switch.
-                    license_output = ssh_connection.send_command("show license | include Feature|Period|State")
-                    # Check if the command output failed.
-                    if len(license_output.splitlines()) <= 3:
-                        # Run different show license command.
-                        license_output = ssh_connection.send_command("show license all | include Status:")
-                        # Check if it failed again, and run different command.
-                        if len(license_output.splitlines()) <= 3:
-                            # Run different show license command.
-                            license_output = ssh_connection.send_command("show license right-to-use")
-                            # Check if the command ran successfully.
-                            if len(license_output) > 3:
-                                # Store raw license output.
-                                license_dict["raw_output"] = license_output
-
-                                # Parse output.
-                                # Split output by newlines. Cutoff first two.
-                                license_output = license_output.splitlines()[2:]
-                                # Loop through license slots.
-                                names = ""
-                                periods = ""
-                                for line in license_output:
-                                    # Check if we hit the end of the list.
-                                    if "--------" not in line:
-                                        # Split line sections up by spaces.
-                                        info = re.split(" +", line)
-                                        # Add data to var.
-                                        names += info[1] + f"({info[2]})" + " | "
-                                        periods += info[-1] + " | "
-                                    else:
-                                        # Stop looping.
-                                        break
-                                # Append data to license dictionary.
-                                license_dict["license_state"] = names
-                                license_dict["expire_period"] = periods
-
-                        else:
-                            # Store raw license output.
-                            license_dict["raw_output"] = license_output
-
-                            # Parse ouput.
-                            # Split output by newlines.
-                            license_output = license_output.splitlines()
-                            # The first line should be the register status.
-                            license_dict["license_state"] = license_output[0]
-                            # The second value should be the expiration time.
-                            license_dict["expire_period"] = license_output[1]
-                    else:
-                        # Store raw license output.
-                        license_dict["raw_output"] = license_output
-
-                        # Parse output.
-                        # Split output by keyword INDEX.
-                        license_output = license_output.split("Index")
-                        # Use the section with more info.
-                        license_output = license_output[1].splitlines() if len(license_output[1].splitlines()) >= 3 else license_output[2].splitlines()
-                        # Check for expire status.
-                        for line in license_output:
-                            # Get license period.
-                            if "Period left" in line:
-                                # Remove unneccesary keywords and remove leading and trailing whitespace.
-                                line = line.replace("Period left:", "").strip()
-                                # Replace commas and tabs with dashes and spaces.
-                                line = line.replace(",", " -")
-                                line = line.replace("\t", " ")
-                                # Append info to license dictionary.
-                                license_dict["expire_period"] = line
-                            # Get license state.
-                            if "License State" in line:
-                                # Remove uneccesary keywords and remove leading and trailing whitespace.
-                                line = line.replace("License State:", "").strip()
-                                # Replace commas and tabs with dashes and spaces.
-                                line = line.replace(",", " -")
-                                line = line.replace("\t", " ")
-                                # Append info the license dictionary.
-                                license_dict["license_state"] = line
-
-                    # Append information to the list.
-                    license_info.append(license_dict)
-
                     #######################################################################
                     # Get the IP and hostname info.
                     #######################################################################
                     # Run cdp command to get relavant info.
                     output = ssh_connection.send_command("show cdp neighbors detail")#| sec Device|Management|Capabilities|Version|Interface")
+                    cdp_neighbors_result_ips, device_infos = collect_cdp_neighbors(output, ip_addr, prompt, export_info)
+                    signature = make_cdp_neighbors_signature(output, is_full_output=True)
 
-                    # Parse output, split string based on the Device keyword.
-                    device_cdps = re.split("Device", output)
-                    # Loop through device strings.
-                    for device in device_cdps:
-                        # Split lines.
-                        info = device.splitlines()
-
-                        # Create device info variables.
-                        device_info = {}
-                        hostname = "NULL"
-                        addr = "NULL"
-                        local_trunk_interface = "NULL"
-                        software_name = "NULL"
-                        version = "NULL"
-                        platform = "NULL"
-                        is_wireless_ap = False
-                        is_switch = False
-                        is_router = False
-                        is_phone = False
-                        is_camera = False
-                        parent_addr = "NULL"
-                        parent_host = "NULL"
-                        parent_trunk_interface = "NULL"
-                        # Loop through each line and find the device info.
-                        for line in info:
-                            # Find device IP address.
-                            if "IP address:" in line:
-                                # Replace keyword.
-                                addr = line.replace("IP address: ", "").strip()
-                            # Attempt to determine if the device is a switch.
-                            if "Platform" in line and "Switch" in line:
-                                is_switch = True
-                                if "Router" in line:
-                                    is_router = True
-                            # Find device type:
-                            if "AIR" in line or "Trans-Bridge" in line:
-                                is_wireless_ap = True
-                                is_switch = False
-                            # Check if export info is toggled on.
-                            if export_info and len(addr) > 0:
-                                # Find device hostname.
-                                if "ID:" in line:
-                                    # Replace keyword.
-                                    line = line.replace("ID:", "")
-                                    # Remove whitespace and store data.
-                                    hostname = line.strip()
-
-                                # Find device software version info.
-                                if "Version :" not in line and "Version" in line:
-                                    # Split line up by commas.
-                                    line = re.split(",", line)
-                                    # Loop through and find software name and version.
-                                    for i, section in enumerate(line):
-                                        # First line will be the software name.
-                                        if i == 0:
-                                            software_name = section
-                                        # Find version.
-                                        if "Version" in section:
-                                            # Remove keyword.
-                                            section = section.replace("Version", "")
-                                            # Strip whitespace and store.
-                                            version = section.strip()
-
-                                # Find platform.
-                                if "Platform" in line:
-                                    # Remove keyword and other garbage after the comma
-                                    line = line.replace("Platform:", "")
-                                    line = line.split(",", 1)[0]
-                                    # Remove whitespace and store.
-                                    platform = line.strip()
-
-                                # Find the local trunk interface and parent interface.
-                                if "Interface:" in line:
-                                    # Split line by comma.
-                                    line = re.split(",", line)
-                                    # Get and store the local and remote interface.
-                                    remote_interface = line[0]
-                                    local_interface = line[1]
-                                    # Remove unessesary keyword arguments.
-                                    remote_interface = remote_interface.replace("Interface:", "")
-                                    local_interface = local_interface.replace("Port ID (outgoing port):", "")
-                                    # Remove whitespace and store.
-                                    local_trunk_interface = local_interface.strip()
-                                    parent_trunk_interface = remote_interface.strip()
-
-                        # If both the software name and version were unable to be found assume device is not a switch, but a phone.
-                        if export_info:
-                            if software_name == "NULL" and version == "NULL":
-                                is_switch = False
-                                # If platform is null, then it's not a phone.
-                                if platform != "NULL" and platform != "Linux":
-                                    is_phone = True
-
-                            # If it's not any of these, then assume it's a camera.
-                            if not any([is_router, is_switch, is_wireless_ap, is_phone]):
-                                is_camera = True
-
-                            # Append parent address to device.
-                            parent_addr = ip_addr
-                            parent_host = prompt
-
-                        # Add info to dictionary.
-                        device_info["hostname"] = hostname
-                        device_info["ip_addr"] = addr
-                        device_info["local_trunk_interface"] = local_trunk_interface
-                        device_info["software_name"] = software_name
-                        device_info["version"] = version
-                        device_info["platform"] = platform
-                        device_info["is_wireless_ap"] = is_wireless_ap
-                        device_info["is_switch"] = is_switch
-                        device_info["is_router"] = is_router
-                        device_info["is_phone"] = is_phone
-                        device_info["is_camera"] = is_camera
-                        device_info["parent_addr"] = parent_addr
-                        device_info["parent_host"] = parent_host
-                        device_info["parent_trunk_interface"] = parent_trunk_interface
-
-                        # Remove leading whitespace and append final ip to the cdp info list.
-                        if addr != "NULL" and is_switch:
-                            cdp_neighbors_result_ips.append(addr)
-
-                        # Append device to the device infos list.
-                        if export_info and device_info not in device_infos:
-                            device_infos.append(device_info)
-
-                    # Close ssh connection.
-                    ssh_connection.disconnect()
+                    # Hand the session to the license stage, or close it if there isn't one.
+                    if license_collector is None or not license_collector.submit(ip_addr, prompt, remote_device["device_type"], ssh_connection):
+                        ssh_connection.disconnect()
                     # Stop looping through for loop.
                     break
                 except ReadTimeout:
                     # Nothing to do.
                     pass
 
-    return cdp_neighbors_result_ips, device_infos
+        # Remember switches that couldn't be reached or logged into, so the next crawls skip them.
+        if failure_reason is not None:
+            host_failure_cache.store(ip_addr, failure_reason, usernames)
+
+    return cdp_neighbors_result_ips, device_infos, signature
 
-def clear_discoveries() -> None:
+async def get_cdp_neighbors_info_async(transport, usernames, passwords, enable_secrets, enable_telnet, force_telnet, export_info, ip_addr, known_signature=None, license_collector=None) -> Tuple[list, list, str]:
     """
-    This method clears the global lists.
+    The same as get_cdp_neighbors_info, but logs in on an AsyncSshTransport so thousands of switches can be crawled on
+    one event loop. Has to run on the transport's loop.
 
     Parameters:
     -----------
-        None
+        transport - The AsyncSshTransport to log in with.
+        usernames - The login username list
+        passwords - The login password list
+        enable_secrets - The secrets for enable mode.
+        enable_telnet - Toggle telnet login attempts.
+        force_telnet - Toggle telnet only logins.
+        export_info - Whether the export fields should be filled in.
+        ip_addr - The IP address of the switch.
+        known_signature - The neighbor signature from the last discovery. If it still matches, the switch isn't queried any further.
+        license_collector - The LicenseCollector to hand the open session to once the neighbors are read, or None to just close it.
 
     Returns:
     --------
-        Nothing
+        The same tuple as get_cdp_neighbors_info, or None if the switch should be retried with netmiko. That happens when
+        telnet is needed or the transport can't talk to the switch, like when it only knows old key exchanges. Raises
+        LocalResourceError if this machine ran out of sockets, which isn't stored in the host failure cache.
     """
-    # Clear global lists.
-    ip_discovery_list.clear()
-    export_info_list.clear()
+    # Create instance variables and objects.
+    logger = logging.getLogger(__name__)
+    ssh_connection = None
+
+    # Don't wait on a switch that recently timed out, refused us, or rejected these usernames.
+    failure_reason = host_failure_cache.get_reason(ip_addr, usernames) if len(ip_addr) > 0 else None
+    if failure_reason is not None:
+        logger.debug(f"Skipping {ip_addr}, it failed recently ({failure_reason}).")
+        return [], [], None
+    # Telnet is netmiko's job.
+    if len(ip_addr) <= 0 or force_telnet:
+        return None if force_telnet else ([], [], None)
+
+    # Try the credentials most likely to work on this switch first.
+    for username, password, secret in credential_affinity.order(ip_addr, zip(usernames, passwords, enable_secrets)):
+        # If secret is empty use normal password.
+        if len(secret) <= 0:
+            secret = password
+
+        # Create device dictionary and connect.
+        remote_device = {"device_type": "cisco_ios", "host": ip_addr, "username": username, "password": password, "secret": secret}
+        failure_reason = None
+        try:
+            ssh_connection = await transport.connect(remote_device)
+        except NetmikoAuthenticationException:
+            # Forget this username for the switch and try the next one.
+            failure_reason = FAILURE_AUTH
+            credential_affinity.record_failure(ip_addr, username)
+            continue
+        except (NetmikoTimeoutException, ConnectionRefusedError) as error:
+            # Let netmiko try telnet.
+            if enable_telnet:
+                return None
+            # A switch that didn't answer won't answer the next credentials either.
+            failure_reason = FAILURE_REFUSED if isinstance(error, ConnectionRefusedError) else FAILURE_TIMEOUT
+            break
+        except LocalResourceError:
+            # This machine is out of sockets, nothing is wrong with the switch. Fail this crawl of it without remembering it.
+            raise
+        except Exception:
+            # Print log and let netmiko try, it knows more devices.
+            logger.debug(f"The async transport couldn't log into {ip_addr}, retrying with netmiko.", exc_info=True)
+            return None
+
+        # If the enable password is wrong, then the transport will throw an error.
+        try:
+            # Get priviledged terminal.
+            await ssh_connection.enable()
+            break
+        except ReadTimeout:
+            # Close connection and set ssh_connection back to None.
+            await ssh_connection.disconnect()
+            ssh_connection = None
+            # Print log.
+            logger.warning(f"Unable to access {ip_addr}! \x1b[31;1mThere may be more devices behind this switch. To find these devices, please setup {ip_addr} like the other accessible devices.")
+
+    # Check if connection was actually opened.
+    if ssh_connection is None:
+        # Remember switches that couldn't be reached or logged into, so the next crawls skip them.
+        if failure_reason is not None:
+            host_failure_cache.store(ip_addr, failure_reason, usernames)
+        return [], [], None
+
+    try:
+        # Get parent hostname.
+        prompt = (await ssh_connection.find_prompt())[:-1]
+        # We just logged in, so the switch is reachable. Remember it and the credentials that worked.
+        reachability_cache.store(ip_addr, True, hostname=prompt)
+        host_failure_cache.clear_host(ip_addr)
+        credential_affinity.record_success(ip_addr, username, remote_device["device_type"])
+
+        # Check if the neighbors changed since the last discovery. There's nothing to compare against the first time.
+        signature = None
+        if known_signature is not None:
+            try:
+                signature = make_cdp_neighbors_signature(await ssh_connection.send_command(CDP_SIGNATURE_COMMAND))
+            except ReadTimeout:
+                # Query the switch like normal.
+                pass
+        if known_signature is not None and signature == known_signature:
+            # Nothing changed, the last result is still good. The session only goes on if licenses are collected.
+            cdp_neighbors_result_ips, device_infos = None, None
+        else:
+            # Get the IP and hostname info.
+            output = await ssh_connection.send_command("show cdp neighbors detail")
+            cdp_neighbors_result_ips, device_infos = collect_cdp_neighbors(output, ip_addr, prompt, export_info)
+            signature = make_cdp_neighbors_signature(output, is_full_output=True)
+    except Exception as error:
+        # The switch stopped answering or dropped the session. Close it, so its session slot is freed, and move on like netmiko does.
+        if not isinstance(error, ReadTimeout):
+            logger.warning(f"Lost the session to {ip_addr} while reading its neighbors: {error!r}")
+        await ssh_connection.disconnect()
+        return [], [], None
+
+    # Hand the session to the license stage, or close it if there isn't one. The license stage runs in threads, so it gets the blocking wrapper.
+    if license_collector is None or not license_collector.submit(ip_addr, prompt, remote_device["device_type"], transport.wrap(ssh_connection)):
+        await ssh_connection.disconnect()
+
+    return cdp_neighbors_result_ips, device_infos, signature
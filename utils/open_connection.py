@@ -2,18 +2,129 @@
 from cmd import PROMPT
 import re
 import logging
-from functools import partial
-from multiprocessing.pool import ThreadPool
 import string
+import time
 from tkinter import messagebox
+from typing import Tuple
 import netmiko
 from netmiko.exceptions import NetmikoAuthenticationException, NetmikoTimeoutException, ReadTimeout
-from netmiko.ssh_dispatcher import ConnectHandler
+from netmiko.ssh_autodetect import SSHDetect
+from netmiko.ssh_dispatcher import ConnectHandler, redispatch
+from utils.credential_cache import credential_affinity
+from utils.device_type_cache import device_type_cache
+from utils.executor import connection_executor
+from utils.running_config import RunningConfig
+from utils.session_registry import session_registry
 
 # Create constants.
-SSH_THREADS = 100
+VLAN_NUMBER_TABLE = str.maketrans("", "", string.ascii_letters)
+# Errors a login with the wrong driver ends in. The driver couldn't find or set up the prompt it expected.
+DRIVER_MISMATCH_ERRORS = (ReadTimeout, ValueError)
 
-def ssh_autodetect_info(usernames, passwords, enable_secrets, enable_telnet, force_telnet, ip_addr, result_info=None) -> str:
+def get_ssh_banner(connection) -> str:
+    """
+    Returns the SSH version banner the device sent when the connection was opened.
+
+    Parameters:
+    -----------
+        connection - The netmiko connection.
+
+    Returns:
+    --------
+        str - The banner, or None for telnet connections or if it can't be found.
+    """
+    try:
+        return connection.remote_conn_pre.get_transport().remote_version
+    except AttributeError:
+        return None
+
+def connect_device(remote_device) -> netmiko.ssh_dispatcher:
+    """
+    Opens an SSH connection to the device through open_device_connection. Logins to the same device are spaced out, and
+    every connect is reported to the connection executor so it can back off when devices or the TACACS server slow down.
+    Only the login itself is timed, detecting the device type takes seconds on a healthy switch.
+
+    Parameters:
+    -----------
+        remote_device - The netmiko connection dictionary.
+
+    Returns:
+    --------
+        ssh_connection - The live connection object to the device.
+    """
+    # Wait our turn for this device.
+    connection_executor.wait_for_login(remote_device["host"])
+
+    # Connect and report how it went.
+    try:
+        ssh_connection, login_time = open_device_connection(remote_device)
+    except (NetmikoTimeoutException, ConnectionRefusedError, TimeoutError):
+        connection_executor.record_connect(False)
+        raise
+    connection_executor.record_connect(True, login_time)
+
+    return ssh_connection
+
+def open_device_connection(remote_device) -> Tuple[netmiko.ssh_dispatcher, float]:
+    """
+    Opens an SSH connection to the device. If the device_type is autodetect, the device_type cache is checked first and known
+    devices connect with their real driver right away. Unknown devices are detected once with SSHDetect, and the same session
+    is redispatched onto the detected driver so we don't log in twice. remote_device["device_type"] is updated to the driver used.
+
+    Parameters:
+    -----------
+        remote_device - The netmiko connection dictionary.
+
+    Returns:
+    --------
+        ssh_connection - The live connection object to the device.
+        float - How many seconds the login took. Detecting and switching the driver afterwards isn't counted.
+    """
+    # Get device ip.
+    ip_addr = remote_device["host"]
+
+    # Use the device type we found last time.
+    if remote_device["device_type"] == "autodetect":
+        cached_device_type = device_type_cache.get(ip_addr)
+        if cached_device_type is not None:
+            remote_device["device_type"] = cached_device_type
+            start_time = time.monotonic()
+            try:
+                ssh_connection = ConnectHandler(**remote_device)
+            except DRIVER_MISMATCH_ERRORS:
+                # The driver didn't fit, so the device changed. Forget it and let the caller handle the error like normal.
+                device_type_cache.invalidate(ip_addr)
+                remote_device["device_type"] = "autodetect"
+                raise
+
+            # A different SSH banner means a different box, even if the driver happened to fit. Detect it again.
+            if device_type_cache.get(ip_addr, banner=get_ssh_banner(ssh_connection)) is not None:
+                return ssh_connection, time.monotonic() - start_time
+            ssh_connection.disconnect()
+            remote_device["device_type"] = "autodetect"
+
+    # Connect straight away if we know the device type.
+    if remote_device["device_type"] != "autodetect":
+        start_time = time.monotonic()
+        ssh_connection = ConnectHandler(**remote_device)
+        login_time = time.monotonic() - start_time
+        device_type_cache.store(ip_addr, remote_device["device_type"], banner=get_ssh_banner(ssh_connection))
+        return ssh_connection, login_time
+
+    # Detect the device type, then switch the open session over to the right driver.
+    start_time = time.monotonic()
+    guesser = SSHDetect(**remote_device)
+    login_time = time.monotonic() - start_time
+    best_match = guesser.autodetect()
+    ssh_connection = guesser.connection
+    if best_match is not None:
+        redispatch(ssh_connection, device_type=best_match)
+        remote_device["device_type"] = best_match
+        device_type_cache.store(ip_addr, best_match, banner=get_ssh_banner(ssh_connection))
+
+    return ssh_connection, login_time
+
+def ssh_autodetect_info(usernames, passwords, enable_secrets, enable_telnet, force_telnet, ip_addr, result_info=None, device_type="autodetect", park_session=False) -> str:
     """
     This method will attempt to autodetect the switch device info using netmiko's
     ssh_autodetect
@@ -28,6 +139,8 @@ def ssh_autodetect_info(usernames, passwords, enable_secrets, enable_telnet, for
         ip_address - The ip address of the device to try to connect to.
         result_info - This can be used as a reference variable if this function is running in
                     a thread and it's return values can't be retrieved.
+        device_type - The netmiko device_type to connect with. Pass a hint from the TCP probe's SSH banner to skip autodetect.
+        park_session - Leave the session enabled and parked in the session registry for ssh_telnet, instead of closing it.
 
     Returns:
     --------
@@ -38,21 +151,24 @@ def ssh_autodetect_info(usernames, passwords, enable_secrets, enable_telnet, for
     remote_device = None
     ssh_connection = None
 
-    # Try each username.
-    for username, password, secret in zip(usernames, passwords, enable_secrets):
+    # Try each username, starting with the one most likely to work on this device.
+    for username, password, secret in credential_affinity.order(ip_addr, zip(usernames, passwords, enable_secrets), device_type if device_type != "autodetect" else None):
         # If secret is empty use normal password.
         if len(secret) <= 0:
             secret = password
 
         # Create device dictionary.
-        remote_device = {"device_type": "autodetect", "host": ip_addr, "username": username, "password": password, "secret": secret}
+        remote_device = {"device_type": device_type, "host": ip_addr, "username": username, "password": password, "secret": secret}
+        # Telnet was the only port that answered the probe, but telnet isn't allowed. Try SSH like normal.
+        if device_type == "cisco_ios_telnet" and not (enable_telnet or force_telnet):
+            remote_device["device_type"] = "autodetect"
         # If the device is not a switch codemiko will crash.
         # Attempt to open SSH connection first, then Telnet.
         try:
             # Print logging info.
-            logger.info(f"Autodetecting model and opening connection for {ip_addr}")
+            logger.info(f"Autodetecting model and opening connection for {ip_addr}" if remote_device["device_type"] == "autodetect" else f"Opening {remote_device['device_type']} connection for {ip_addr}")
             # Open new ssh connection with switch.
-            ssh_connection = ConnectHandler(**remote_device)
+            ssh_connection = connect_device(remote_device)
         except NetmikoTimeoutException:
             # Check is telnet is enabled.
             if enable_telnet or force_telnet:
@@ -73,6 +189,8 @@ def ssh_autodetect_info(usernames, passwords, enable_secrets, enable_telnet, for
                 # Print log.
                 logger.warning(f"Unable to connect to device {ip_addr} with SSH. Skipping TELNET as it is not enabled...")
         except NetmikoAuthenticationException:
+            # Forget this username for the device.
+            credential_affinity.record_failure(ip_addr, username)
             # Check if force telnet is enabled.
             if force_telnet:
                 # Print log.
@@ -111,8 +229,12 @@ def ssh_autodetect_info(usernames, passwords, enable_secrets, enable_telnet, for
                 remote_device["host"] = prompt[:-1]
                 # Store known ip address.
                 remote_device["ip_address"] = ip_addr
-                # Close connection.
-                ssh_connection.disconnect()
+                # Remember which credentials and driver worked.
+                credential_affinity.record_success(ip_addr, username, remote_device["device_type"])
+                device_type_cache.store(ip_addr, remote_device["device_type"], hostname=remote_device["host"])
+                # Hand the session to whoever opens this device next, or close it.
+                if not park_session or not park_connection(ip_addr, ssh_connection):
+                    ssh_connection.disconnect()
                 # Stop looping through for loop.
                 break
             except ValueError:
@@ -127,7 +249,34 @@ def ssh_autodetect_info(usernames, passwords, enable_secrets, enable_telnet, for
 
     return result_info
 
-def ssh_autodetect_switchlist_info(usernames, passwords, enable_secrets, enable_telnet, force_telnet, ip_list, device_list) -> None:
+def park_connection(ip_addr, ssh_connection) -> bool:
+    """
+    Gets a session ready the same way ssh_telnet does and parks it in the session registry.
+
+    Parameters:
+    -----------
+        ip_addr - The ip address of the device.
+        ssh_connection - The live connection object to the device.
+
+    Returns:
+    --------
+        bool - Whether the session was parked. If not, the caller still has to close it.
+    """
+    # If the enable password is wrong, then netmiko will throw an error. Let ssh_telnet report it later.
+    try:
+        # Get priviledged terminal.
+        ssh_connection.enable()
+
+        # Tell switch to continuously print output.
+        prompt = ssh_connection.find_prompt()
+        ssh_connection.send_command("terminal length 0", expect_string=prompt)
+        ssh_connection.send_command("set length 0", expect_string=prompt)
+    except (ReadTimeout, AttributeError, ValueError):
+        return False
+
+    return session_registry.park(ip_addr, ssh_connection)
+
+def ssh_autodetect_switchlist_info(usernames, passwords, enable_secrets, enable_telnet, force_telnet, ip_list, device_list, device_hints=None) -> None:
     """
     This method will attempt to autodetect a list of switches device info using netmiko's
     ssh_autodetect.
@@ -141,38 +290,45 @@ def ssh_autodetect_switchlist_info(usernames, passwords, enable_secrets, enable_
         force_telnet - Boolean val to force telnet fallback.
         ip_list - The ip addresses of the device to try to connect to.
         device_list - The list to store the deivce info in. (Returned in same order as ip_list)
+        device_hints - An optional dictionary of ip -> netmiko device_type found by the TCP probe.
 
     Returns:
     --------
         Nothing
     """
     # Create method instance variables.
-    thread_pool = ThreadPool(SSH_THREADS)
     logger = logging.getLogger(__name__)
+    if device_hints is None:
+        device_hints = {}
+
+    def autodetect(ip_addr):
+        # Connect with the probe's device type if we have one. Keep the session for when the device is picked.
+        return ssh_autodetect_info(usernames, passwords, enable_secrets, enable_telnet, force_telnet, ip_addr, device_type=device_hints.get(ip_addr, "autodetect"), park_session=True)
 
     # Check if the ip list actually contains something.
     if len(ip_list) > 0:
         # Try to auth with one switch first.
-        first_switch = ssh_autodetect_info(usernames, passwords, enable_secrets, enable_telnet, force_telnet, ip_list.pop(0))
+        first_switch = autodetect(ip_list.pop(0))
         # Check if auth was successful.
         if first_switch["host"] != "Unable_to_Authenticate":
             # Append first device to device list.
             device_list.append(first_switch)
 
-            # Loop through each line and try to ping it in a new thread.
-            devices = thread_pool.map_async(partial(ssh_autodetect_info, usernames, passwords, enable_secrets, enable_telnet, force_telnet), ip_list)
-            # Wait for pool threads to finish.
-            thread_pool.close()
-            thread_pool.join()
+            # Hand the rest to the shared connection executor. It ramps up while logins are quick and backs off when they time out.
+            devices = [connection_executor.submit(autodetect, ip_addr) for ip_addr in ip_list]
 
-            # Get results from pool.
-            for switch in devices.get():
-                device_list.append(switch)
+            # Get results in the same order as the ip list.
+            for switch in devices:
+                device_list.append(switch.result())
         else:
             # Print log.
             logger.warning("Can't authenticate with the given credentials. Please enter the correct username and password.")
             # Append none to device list.
             device_list.append(None)
+
+        # Keep the credentials and drivers that worked for next time.
+        credential_affinity.save()
+        device_type_cache.save()
     else:
         # Print log.
         logger.warning("No IPs were givin. Can't open any SSH sessions to autodetect.")
@@ -199,15 +355,38 @@ def ssh_telnet(device, enable_telnet, force_telnet, store_config_info=False) ->
     # Get device ip.
     ip_addr = device["ip_address"]
 
+    # Pick up the session autodetect left logged in, if it's still there. It's already enabled with paging off.
+    ssh_connection = session_registry.claim(ip_addr)
+    if ssh_connection is not None:
+        # Print log.
+        logger.info(f"Reusing the autodetect session for {ip_addr}")
+        # Store info if toggle is set.
+        if store_config_info:
+            # Get device interface, vlan, and config info. get_config_info logs its own errors and returns no interfaces.
+            interfaces, vlans, running_config = get_config_info(ssh_connection)
+            if ssh_connection.is_alive() and len(interfaces) > 0:
+                # Store info in device dictionary.
+                device["interfaces"] = interfaces
+                device["vlans"] = vlans
+                device["config"] = running_config.text
+                device["running_config"] = running_config
+            else:
+                # The session went bad while parked. Log in again like normal.
+                logger.warning(f"The autodetect session for {ip_addr} stopped responding. Opening a new one...")
+                session_registry.close(ssh_connection)
+                ssh_connection = None
+        if ssh_connection is not None:
+            return ssh_connection
+
     # Only give connect handler what it needs.
     remote_device = {"device_type": device["device_type"], "host": ip_addr, "username": device["username"], "password": device["password"], "secret": device["secret"]}
     # If the device is not a switch codemiko will crash.
     # Attempt to open SSH connection first, then Telnet.
     try:
         # Print logging info.
-        logger.info(f"Autodetecting model and opening connection for {ip_addr}")
+        logger.info(f"Autodetecting model and opening connection for {ip_addr}" if remote_device["device_type"] == "autodetect" else f"Opening {remote_device['device_type']} connection for {ip_addr}")
         # Open new ssh connection with switch.
-        ssh_connection = ConnectHandler(**remote_device)
+        ssh_connection = connect_device(remote_device)
     except NetmikoTimeoutException:
         # Check is telnet is enabled.
         if enable_telnet or force_telnet:
@@ -265,16 +444,18 @@ def ssh_telnet(device, enable_telnet, force_telnet, store_config_info=False) ->
             # Store info if toggle is set.
             if store_config_info:
                 # Get device interface, vlan, and config info.
-                interfaces, vlans, config = get_config_info(ssh_connection)
+                interfaces, vlans, running_config = get_config_info(ssh_connection)
                 # Store info in device dictionary.
                 device["interfaces"] = interfaces
                 device["vlans"] = vlans
-                device["config"] = config
+                device["config"] = running_config.text
+                device["running_config"] = running_config
         except (ReadTimeout, AttributeError):
             # Store default values in device dictionary.
             device["interfaces"] = []
             device["vlans"] = []
             device["config"] = []
+            device["running_config"] = RunningConfig("")
             # Print log.
             logger.error(f"Unable to enter priviledged mode. The enable password is incorrect for device {device['ip_address']} {device['host']}.")
     else:
@@ -296,11 +477,12 @@ def get_config_info(connection) -> netmiko.ssh_dispatcher:
     Returns:
         interfaces - A list containing info about the devices interfaces.
         vlans - A list containing info about the devices vlans.
-        config - The raw config output from the device.
+        running_config - The parsed config from the device. Its text is an error message if the config couldn't be pulled.
     """
     # Create instance variables.
     interfaces = []
     vlans = []
+    running_config = None
     config = "Unable to pull config from device. Check console output for errors. Try refreshing device info."
     logger = logging.getLogger(__name__)
 
@@ -319,202 +501,19 @@ def get_config_info(connection) -> netmiko.ssh_dispatcher:
                 ###########################################################################
                 # Get config output.
                 config = connection.send_command("show run", expect_string=prompt)
-                # Split config text into lines and remove first three.
-                config = config.split("\n")[3:]
-                # Reassemble.
-                config_output = ""
-                for line in config:
-                    config_output += line + "\n"
-                # Store config.
-                config = config_output
+                # Split config text into lines, remove first three, and reassemble.
+                config = "".join(line + "\n" for line in config.split("\n")[3:])
+                # Parse it once. Everything else reads this.
+                running_config = RunningConfig(config)
 
                 ###########################################################################
-                # Parse and store interfaces output.
+                # Parse and store interface and vlan output.
                 ###########################################################################
-                # Get interface output.
+                # Get interface and vlan output.
                 interface_output = connection.send_command("show interface status", expect_string=prompt)
-
-                # Parse interface output.
-                output_split = interface_output.splitlines()[2:]
-                for line in output_split:
-                    # Check length of line.
-                    if len(line) > 2:
-                        # Split the current line by spaces.
-                        line = re.split(" +", line)
-                        # Keep the interface name and strip it of leading and trailing whitespace.
-                        name = line[0].strip()
-                        # Append new dictionary to interfaces list.
-                        interfaces.append({"name" : name})
-
-                ## Get individual interface data.
-                # Split up config by !.
-                config_blocks = re.split("!+", config)
-
-                interface_blocks = []
-                # Loop through the split up config blocks and only keep the interface ones.          
-                for block in config_blocks:
-                    # Check if the block contains the word interface.
-                    if "interface" in block:
-                        # Remove first two chars from block.
-                        block = block[1:]
-                        # split block up by new lines.
-                        block = block.splitlines()
-                        # Append to list.
-                        interface_blocks.append(block)
-                
-                # Loop through the interfaces and blocks and match them by name.
-                for interface in interfaces:
-                    for interface_data in interface_blocks:
-                        # Get interface name.
-                        name_data = re.split(" +", interface_data[0])[1]
-                        block_name = name_data[:2] + name_data.translate(str.maketrans('', '', string.ascii_letters + "-"))
-                        # Check if names are equal.
-                        if interface["name"] == block_name:
-                            # Add relevant info to the interface using the interface_data list.
-                            description = ""
-                            shutdown = False
-                            switch_mode_access = False
-                            switch_mode_trunk = False
-                            spanning_tree_portfast = False
-                            spanning_tree_bpduguard = False
-                            switch_access_vlan = 0
-                            switch_voice_vlan = 0
-                            switch_trunk_vlan = 0
-
-
-                            # Loop through each config line for the interface and get data.
-                            for data in interface_data:
-                                # Get Description info.
-                                if "description" in data and description == "" and "macro" not in data:
-                                    # Remove unneeded keyword from data.
-                                    data = data.replace("description", "")
-                                    # Remove trailing and leading spaces and set description equal to new data.
-                                    description = data.strip()
-
-                                # Get port shutdown info.
-                                if "shutdown" in data and not "no shutdown" in data:
-                                    # Set toggle.
-                                    shutdown = True
-
-                                # Check for sw mo acc interface flag.
-                                if "switchport mode access" in data:
-                                    # Set toggle.
-                                    switch_mode_access = True
-
-                                # Check for spanning tree.
-                                if "spanning-tree portfast" in data:
-                                    # Set toggle.
-                                    spanning_tree_portfast = True
-                                if "spanning-tree bpduguard enable" in data:
-                                    # Set toggle.
-                                    spanning_tree_bpduguard = True
-
-                                # Check for trunk mode data.
-                                if "switchport mode trunk" in data:
-                                    # Set toggle.
-                                    switch_mode_trunk = True
-
-                                # Check for access, voicem, and trunk vlan number.
-                                if "switchport access vlan" in data:
-                                    # Remove all letters from data.
-                                    data = data.translate(str.maketrans('', '', string.ascii_letters))
-                                    # Remove trailing and leading whitespace and store.
-                                    switch_access_vlan = data.strip()
-                                if "switchport voice vlan" in data:
-                                    # Remove all letters from data.
-                                    data = data.translate(str.maketrans('', '', string.ascii_letters))
-                                    # Remove trailing and leading whitespace and store.
-                                    switch_voice_vlan = data.strip()
-                                if "switchport trunk native vlan" in data:
-                                    # Remove all letters from data.
-                                    data = data.translate(str.maketrans('', '', string.ascii_letters))
-                                    # Remove trailing and leading whitespace and store.
-                                    switch_trunk_vlan = data.strip()
-
-                                
-                            # Add description to interface dictionary.
-                            interface["description"] = description
-                            interface["shutdown"] = shutdown
-                            interface["switchport mode access"] = switch_mode_access
-                            interface["switchport mode trunk"] = switch_mode_trunk
-                            interface["spanning-tree portfast"] = spanning_tree_portfast
-                            interface["spanning-tree bpduguard enable"] = spanning_tree_bpduguard
-                            interface["switchport access vlan"] = switch_access_vlan
-                            interface["switchport voice vlan"] = switch_voice_vlan
-                            interface["switchport trunk native vlan"] = switch_trunk_vlan
-                            interface["config_has_changed"] = False
-
-                ###########################################################################
-                # Parse and store vlan output.
-                ###########################################################################
-                # Add interface and vlan info to the switch device dictionary.
                 vlan_output = connection.send_command("show vlan brief", expect_string=prompt)
-                output_split = vlan_output.splitlines()[3:]
-                # Loop through each line and get relavent data.
-                for line in output_split:
-                    # Check line validity.
-                    if len(line) > 2:
-                        # Split line into words at each whitespace.
-                        line = re.split(" +", line)
-                        # Check if vlan is active.
-                        if "active" in line[2]:
-                            # Get data.
-                            vlan = line[0]
-                            name = line[1]
-                            # Append to vlan array.
-                            vlans.append({"vlan" : vlan, "name" : name})
-
-                ## Get individual interface data.
-                # Split up config by !.
-                config_blocks = re.split("!+", config)
-
-                vlan_blocks = []
-                # Loop through the split up config blocks and only keep the interface ones.          
-                for block in config_blocks:
-                    # Check if the block contains the word interface.
-                    if "interface Vlan" in block:
-                        # split block up by new lines and remove first line. (it's empty)
-                        block = block.splitlines()[1:]
-                        # Append to list.
-                        vlan_blocks.append(block)
-                
-                # Loop through the vlans and blocks and match them by name.
-                for vlan in vlans:
-                    for vlan_data in vlan_blocks:
-                        # Get vlan name.
-                        name_data = re.split(" +", vlan_data[0])[1]
-                        block_name = name_data.translate(str.maketrans('', '', string.ascii_letters + "-"))
-                        # Check if names are equal.
-                        if vlan["vlan"] == block_name:
-                            # Add relevant info to the vlan using the vlan_data list.
-                            description = ""
-                            ip_addr = ""
-                            shutdown = False
-
-                            # Loop through each config line for the vlan and get data.
-                            for data in vlan_data:
-                                # Get Description info.
-                                if "description" in data and description == "" and "macro" not in data:
-                                    # Remove unneeded keyword from data.
-                                    data = data.replace("description", "")
-                                    # Remove trailing and leading spaces and set description equal to new data.
-                                    description = data.strip()
-                                # Get ip address info.
-                                if not "no ip address" in data and "ip address" in data:
-                                    # Remove uneeded keyword from data.
-                                    data = data.replace("ip address", "")
-                                    # Remove trailing and leading spaces and set new data.
-                                    ip_addr = data.strip()
-                                # Get vlan shutdown info.
-                                if "shutdown" in data and not "no shutdown" in data:
-                                    # Set toggle.
-                                    shutdown = True
-                                
-                            # Add description to vlan dictionary.
-                            vlan["description"] = description
-                            vlan["ip address"] = ip_addr
-                            vlan["shutdown"] = shutdown
-                            vlan["config_has_changed"] = False
+                # Match them up with their config blocks.
+                interfaces, vlans = parse_config_info(running_config, interface_output, vlan_output)
             else:
                 # If the priv level is below 15, then print error.
                 logger.critical("Could not escalate priviledges even though the enable secret is correct. Check the minimum privilege level for the vty connections in the configuration.")
@@ -524,4 +523,166 @@ def get_config_info(connection) -> netmiko.ssh_dispatcher:
         # Print log.
         logger.error("Something goofy happened while updating switch configuration info: ", exc_info=error, stack_info=True)
 
-    return interfaces, vlans, config
\ No newline at end of file
+    # Wrap error messages, so callers always get a parsed config back.
+    if running_config is None:
+        running_config = RunningConfig(config)
+
+    return interfaces, vlans, running_config
+
+def parse_interface_block(interface_data) -> dict:
+    """
+    Gets the settings the configure window shows from an interface's config lines.
+
+    Parameters:
+    -----------
+        interface_data - The interface block's config lines.
+
+    Returns:
+    --------
+        dict - The interface settings.
+    """
+    # Add relevant info to the interface using the interface_data list.
+    description = ""
+    shutdown = False
+    switch_mode_access = False
+    switch_mode_trunk = False
+    spanning_tree_portfast = False
+    spanning_tree_bpduguard = False
+    switch_access_vlan = 0
+    switch_voice_vlan = 0
+    switch_trunk_vlan = 0
+
+    # Loop through each config line for the interface and get data.
+    for data in interface_data:
+        # Get Description info.
+        if "description" in data and description == "" and "macro" not in data:
+            # Remove unneeded keyword from data.
+            data = data.replace("description", "")
+            # Remove trailing and leading spaces and set description equal to new data.
+            description = data.strip()
+
+        # Get port shutdown info.
+        if "shutdown" in data and not "no shutdown" in data:
+            # Set toggle.
+            shutdown = True
+
+        # Check for sw mo acc interface flag.
+        if "switchport mode access" in data:
+            # Set toggle.
+            switch_mode_access = True
+
+        # Check for spanning tree.
+        if "spanning-tree portfast" in data:
+            # Set toggle.
+            spanning_tree_portfast = True
+        if "spanning-tree bpduguard enable" in data:
+            # Set toggle.
+            spanning_tree_bpduguard = True
+
+        # Check for trunk mode data.
+        if "switchport mode trunk" in data:
+            # Set toggle.
+            switch_mode_trunk = True
+
+        # Check for access, voicem, and trunk vlan number.
+        if "switchport access vlan" in data:
+            # Remove all letters from data, then trailing and leading whitespace and store.
+            switch_access_vlan = data.translate(VLAN_NUMBER_TABLE).strip()
+        if "switchport voice vlan" in data:
+            # Remove all letters from data, then trailing and leading whitespace and store.
+            switch_voice_vlan = data.translate(VLAN_NUMBER_TABLE).strip()
+        if "switchport trunk native vlan" in data:
+            # Remove all letters from data, then trailing and leading whitespace and store.
+            switch_trunk_vlan = data.translate(VLAN_NUMBER_TABLE).strip()
+
+    return {"description": description, "shutdown": shutdown, "switchport mode access": switch_mode_access, "switchport mode trunk": switch_mode_trunk, "spanning-tree portfast": spanning_tree_portfast, "spanning-tree bpduguard enable": spanning_tree_bpduguard, "switchport access vlan": switch_access_vlan, "switchport voice vlan": switch_voice_vlan, "switchport trunk native vlan": switch_trunk_vlan, "config_has_changed": False}
+
+def parse_vlan_block(vlan_data) -> dict:
+    """
+    Gets the settings the configure window shows from an interface Vlan's config lines.
+
+    Parameters:
+    -----------
+        vlan_data - The interface Vlan block's config lines.
+
+    Returns:
+    --------
+        dict - The vlan settings.
+    """
+    # Add relevant info to the vlan using the vlan_data list.
+    description = ""
+    ip_addr = ""
+    shutdown = False
+
+    # Loop through each config line for the vlan and get data.
+    for data in vlan_data:
+        # Get Description info.
+        if "description" in data and description == "" and "macro" not in data:
+            # Remove unneeded keyword from data.
+            data = data.replace("description", "")
+            # Remove trailing and leading spaces and set description equal to new data.
+            description = data.strip()
+        # Get ip address info.
+        if not "no ip address" in data and "ip address" in data:
+            # Remove uneeded keyword from data.
+            data = data.replace("ip address", "")
+            # Remove trailing and leading spaces and set new data.
+            ip_addr = data.strip()
+        # Get vlan shutdown info.
+        if "shutdown" in data and not "no shutdown" in data:
+            # Set toggle.
+            shutdown = True
+
+    return {"description": description, "ip address": ip_addr, "shutdown": shutdown, "config_has_changed": False}
+
+def parse_config_info(running_config, interface_output, vlan_output) -> tuple:
+    """
+    Builds the interface and vlan lists from show interface status, show vlan brief, and the running config. Config
+    blocks are looked up by name in the parsed config, instead of comparing every interface against every block.
+
+    Parameters:
+    -----------
+        running_config - The parsed running config.
+        interface_output - The show interface status output.
+        vlan_output - The show vlan brief output.
+
+    Returns:
+    --------
+        interfaces - A list containing info about the devices interfaces.
+        vlans - A list containing info about the devices vlans.
+    """
+    # Create instance variables.
+    interfaces = []
+    vlans = []
+
+    # Parse interface output.
+    for line in interface_output.splitlines()[2:]:
+        # Check length of line.
+        if len(line) > 2:
+            # Keep the interface name and strip it of leading and trailing whitespace.
+            interface = {"name": re.split(" +", line)[0].strip()}
+            # Add the settings from its config block.
+            section = running_config.get_interface(interface["name"])
+            if section is not None:
+                interface.update(parse_interface_block(section.get_lines()))
+            # Append new dictionary to interfaces list.
+            interfaces.append(interface)
+
+    # Loop through each vlan line and get relavent data.
+    for line in vlan_output.splitlines()[3:]:
+        # Check line validity.
+        if len(line) > 2:
+            # Split line into words at each whitespace.
+            line = re.split(" +", line)
+            # Check if vlan is active.
+            if "active" in line[2]:
+                # Get data.
+                vlan = {"vlan": line[0], "name": line[1]}
+                # Add the settings from its interface Vlan block.
+                section = running_config.get_vlan_interface(vlan["vlan"])
+                if section is not None:
+                    vlan.update(parse_vlan_block(section.get_lines()))
+                # Append to vlan array.
+                vlans.append(vlan)
+
+    return interfaces, vlans
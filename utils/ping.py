@@ -1,13 +1,817 @@
 # Import required packages.
+import asyncio
+import errno
 import subprocess
 import platform
 import logging
 import socket
-from multiprocessing.pool import ThreadPool
-from typing import Tuple
+import struct
+import time
+import os
+import ipaddress
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Tuple
+from utils.resolver import resolver_cache
 
 # Create constants.
 PING_THREADS = 100
+PING_TIMEOUT = 2.0
+MAX_PINGS_IN_FLIGHT = 4096
+# Sockets kept free for the resolver, logging, and the rest of the app when sizing TCP sweeps.
+RESERVED_FILE_DESCRIPTORS = 128
+# Windows selector loops use select(), which can't watch more than 512 sockets.
+WINDOWS_SELECT_LIMIT = 512
+# Running out of sockets or buffers is our problem, not the host's. Those probes are retried for this long.
+LOCAL_ERROR_RETRY_TIME = 30.0
+LOCAL_ERROR_RETRY_DELAY = 0.05
+LOCAL_ERRNOS = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, getattr(errno, "WSAEMFILE", errno.EMFILE), getattr(errno, "WSAENOBUFS", errno.ENOBUFS)}
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+ICMP_PAYLOAD = b"PythonSwitchConfigurator".ljust(32, b"\x00")
+PROBE_ICMP = "icmp"
+PROBE_TCP = "tcp"
+TCP_PROBE_TIMEOUT = 1.5
+REACHABLE_TTL = 300.0
+UNREACHABLE_TTL = 30.0
+SSH_PORT = 22
+TELNET_PORT = 23
+# Substrings of SSH server banners and the netmiko device_type they identify. First match wins.
+SSH_BANNER_DEVICE_TYPES = [
+    ("Cisco", "cisco_ios"),
+    ("HUAWEI", "huawei"),
+    ("Comware", "hp_comware"),
+    ("ROSSSH", "mikrotik_routeros"),
+    ("Juniper", "juniper_junos"),
+]
+
+class LocalResourceError(Exception):
+    """
+    Raised when a probe couldn't be sent because this machine ran out of sockets or buffers. It says nothing about
+    whether the host is up, so it must never be reported or cached as down.
+    """
+
+def is_local_error(error) -> bool:
+    """
+    Checks if a socket error came from this machine running out of sockets or buffers.
+
+    Parameters:
+    -----------
+        error - The OSError.
+
+    Returns:
+    --------
+        bool - True for EMFILE, ENFILE, and ENOBUFS.
+    """
+    return error.errno in LOCAL_ERRNOS
+
+def get_max_in_flight(mode) -> int:
+    """
+    Returns how many probes can be outstanding at once without running out of sockets. ICMP probes share one socket,
+    but every TCP probe opens two, one each for SSH and telnet.
+
+    Parameters:
+    -----------
+        mode - PROBE_ICMP or PROBE_TCP.
+
+    Returns:
+    --------
+        int - The number of sweep workers.
+    """
+    if mode != PROBE_TCP:
+        return MAX_PINGS_IN_FLIGHT
+
+    # Get the open file limit. There's no resource module on windows, but select() has its own cap there.
+    if platform.system().lower() == "windows":
+        file_limit = WINDOWS_SELECT_LIMIT
+    else:
+        import resource
+        file_limit, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if file_limit == resource.RLIM_INFINITY:
+            file_limit = MAX_PINGS_IN_FLIGHT * 2
+
+    return max(1, min(MAX_PINGS_IN_FLIGHT, (file_limit - RESERVED_FILE_DESCRIPTORS) // 2))
+
+def icmp_checksum(data) -> int:
+    """
+    Computes the internet checksum (RFC 1071) used by the ICMP header.
+
+    Parameters:
+    -----------
+        data - The bytes to compute the checksum over.
+
+    Returns:
+    --------
+        int - The 16 bit ones complement checksum.
+    """
+    # Pad odd length data with a zero byte.
+    if len(data) % 2:
+        data += b"\x00"
+    # Sum up all 16 bit words.
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    # Fold the carry bits back into the lower 16 bits.
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+
+    return ~total & 0xFFFF
+
+def build_echo_request(identifier, sequence) -> bytes:
+    """
+    Packs an ICMP echo request with the given identifier and sequence number.
+
+    Parameters:
+    -----------
+        identifier - The ICMP echo identifier.
+        sequence - The ICMP echo sequence number.
+
+    Returns:
+    --------
+        bytes - The packed ICMP packet.
+    """
+    # Build header with an empty checksum, then fill in the real checksum.
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    checksum = icmp_checksum(header + ICMP_PAYLOAD)
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, identifier, sequence)
+
+    return header + ICMP_PAYLOAD
+
+def subprocess_ping(ip_addr) -> bool:
+    """
+    Pings the given address once using the operating system's ping command. This is only used when
+    the platform won't give us an ICMP socket. (Windows without admin rights, locked down linux boxes, etc)
+
+    Parameters:
+    -----------
+        ip_addr - The address to ping.
+
+    Returns:
+    --------
+        bool - True if the host replied.
+    """
+    # Ping commands will be different if we are on linux or windows.
+    if platform.system() == "Windows":
+        command = ["ping", "-n", "1", "-w", str(int(PING_TIMEOUT * 1000)), ip_addr]
+    else:
+        command = ["ping", "-c", "1", "-W", str(int(PING_TIMEOUT)), ip_addr]
+
+    # Ping the machine and check the response.
+    return subprocess.call(command, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT) == 0
+
+
+class IcmpSweeper():
+    """
+    Asyncio ICMP echo engine. Every echo request is sent from one socket and replies are matched back to
+    their waiting probe by identifier and sequence number, so thousands of hosts can be outstanding at once.
+
+    Unprivileged ICMP datagram sockets are tried first, then raw sockets. If neither can be opened the
+    sweeper falls back to running the system ping command in a small thread pool.
+    """
+    def __init__(self, timeout=PING_TIMEOUT) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.timeout = timeout
+        self.socket = None
+        self.is_raw = False
+        self.identifier = os.getpid() & 0xFFFF
+        self.sequence = 0
+        self.pending = {}
+        self.loop = None
+        self.fallback_pool = None
+
+    def open(self, loop) -> None:
+        """
+        Opens the ICMP socket and registers it with the given event loop. The loop must support add_reader,
+        so on windows it has to be a SelectorEventLoop.
+
+        Parameters:
+        -----------
+            loop - The asyncio event loop the sweeper will run on.
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Store loop.
+        self.loop = loop
+
+        # Try an unprivileged datagram socket first, then a raw socket.
+        for sock_type in (socket.SOCK_DGRAM, socket.SOCK_RAW):
+            try:
+                self.socket = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+                self.is_raw = sock_type == socket.SOCK_RAW
+                break
+            except (PermissionError, OSError):
+                self.socket = None
+
+        # Check if we were given a socket.
+        if self.socket is not None:
+            # Make socket non blocking and listen for replies.
+            self.socket.setblocking(False)
+            self.loop.add_reader(self.socket.fileno(), self.on_readable)
+        else:
+            # Print log.
+            self.logger.warning("Unable to open an ICMP socket, falling back to the system ping command. Run as admin/root for faster pings.")
+            # Create fallback pool.
+            self.fallback_pool = ThreadPoolExecutor(PING_THREADS)
+
+    def close(self) -> None:
+        """
+        Unregisters and closes the ICMP socket and any fallback threads.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Close socket.
+        if self.socket is not None:
+            self.loop.remove_reader(self.socket.fileno())
+            self.socket.close()
+            self.socket = None
+        # Close fallback pool.
+        if self.fallback_pool is not None:
+            self.fallback_pool.shutdown(wait=False)
+            self.fallback_pool = None
+        # Cancel anything still waiting.
+        for _, future, _ in self.pending.values():
+            if not future.done():
+                future.cancel()
+        self.pending.clear()
+
+    def next_sequence(self) -> int:
+        """
+        Returns the next free 16 bit sequence number.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            int - A sequence number that isn't currently in flight.
+        """
+        # Loop until we find a sequence number that isn't waiting on a reply.
+        while True:
+            self.sequence = (self.sequence + 1) & 0xFFFF
+            if self.sequence not in self.pending:
+                return self.sequence
+
+    def on_readable(self) -> None:
+        """
+        Called by the event loop whenever the ICMP socket has data. Drains the socket and resolves the matching probes.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Read until the socket is empty.
+        while True:
+            try:
+                data, address = self.socket.recvfrom(2048)
+            except OSError:
+                # Socket is empty.
+                break
+
+            # Raw sockets (and datagram sockets on some platforms) include the IP header. Strip it off.
+            if len(data) >= 20 and data[0] >> 4 == 4:
+                data = data[(data[0] & 0x0F) * 4:]
+            # Make sure we have a full ICMP header.
+            if len(data) < 8:
+                continue
+
+            # Unpack ICMP header.
+            icmp_type, _, _, identifier, sequence = struct.unpack("!BBHHH", data[:8])
+            # Only care about echo replies.
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # The kernel rewrites the identifier on datagram sockets and filters replies for us, so only check it on raw ones.
+            if self.is_raw and identifier != self.identifier:
+                continue
+
+            # Match the reply to its probe.
+            probe = self.pending.get(sequence)
+            if probe is not None and probe[0] == address[0]:
+                # Remove from pending and resolve future with the round trip time.
+                ip_addr, future, send_time = self.pending.pop(sequence)
+                if not future.done():
+                    future.set_result(time.perf_counter() - send_time)
+
+    async def probe(self, ip_addr) -> Tuple[bool, float, str]:
+        """
+        Sends one echo request to the given IP and waits for the reply. Raises LocalResourceError if the request
+        couldn't be sent because the socket buffers stayed full.
+
+        Parameters:
+        -----------
+            ip_addr - The IPv4 address to probe.
+
+        Returns:
+        --------
+            Tuple[bool - is reachable?, float - round trip time in seconds or None, str - device hint (always None for ICMP)]
+        """
+        # Use system ping if no socket is available.
+        if self.socket is None:
+            send_time = time.perf_counter()
+            reachable = await self.loop.run_in_executor(self.fallback_pool, subprocess_ping, ip_addr)
+            return reachable, (time.perf_counter() - send_time) if reachable else None, None
+
+        # Register probe before sending so a fast reply can't beat us.
+        sequence = self.next_sequence()
+        future = self.loop.create_future()
+        self.pending[sequence] = (ip_addr, future, time.perf_counter())
+        try:
+            # Send the request, waiting for buffer space if the socket is full.
+            packet = build_echo_request(self.identifier, sequence)
+            deadline = time.monotonic() + LOCAL_ERROR_RETRY_TIME
+            while True:
+                try:
+                    self.socket.sendto(packet, (ip_addr, 0))
+                    break
+                except (BlockingIOError, InterruptedError):
+                    await asyncio.sleep(0.001)
+                except OSError as error:
+                    # Out of buffers, wait for some to free up.
+                    if not is_local_error(error):
+                        raise
+                    if time.monotonic() >= deadline:
+                        raise LocalResourceError(f"Out of socket buffers while pinging {ip_addr}") from error
+                    await asyncio.sleep(LOCAL_ERROR_RETRY_DELAY)
+
+            # Wait for the reply.
+            rtt = await asyncio.wait_for(future, self.timeout)
+            return True, rtt, None
+        except (asyncio.TimeoutError, OSError):
+            return False, None, None
+        finally:
+            # Make sure probe is removed.
+            self.pending.pop(sequence, None)
+
+class ReachabilityCache():
+    """
+    Remembers recent probe results by IP so reopening the configure window doesn't sweep the same hosts again.
+    Up hosts are trusted for REACHABLE_TTL seconds and down hosts for UNREACHABLE_TTL seconds. Auto discovery
+    and the configure window also store hosts they've logged into, since a login proves the host is up.
+    """
+    def __init__(self, reachable_ttl=REACHABLE_TTL, unreachable_ttl=UNREACHABLE_TTL) -> None:
+        # Create class variables and objects.
+        self.reachable_ttl = reachable_ttl
+        self.unreachable_ttl = unreachable_ttl
+        self.entries = {}
+        self.lock = Lock()
+
+    def get(self, ip_addr, require_hint=False) -> dict:
+        """
+        Returns the cached result for an IP if it's still fresh.
+
+        Parameters:
+        -----------
+            ip_addr - The IPv4 address.
+            require_hint - Only return entries that came from a TCP probe, so they carry a device hint.
+
+        Returns:
+        --------
+            dict - The entry (reachable, rtt, hostname, device_hint, probed_tcp, timestamp) or None if unknown or stale.
+        """
+        with self.lock:
+            entry = self.entries.get(ip_addr)
+        # Check entry age.
+        if entry is None or (require_hint and not entry["probed_tcp"]):
+            return None
+        if time.monotonic() - entry["timestamp"] > (self.reachable_ttl if entry["reachable"] else self.unreachable_ttl):
+            return None
+
+        return entry
+
+    def store(self, ip_addr, reachable, rtt=None, hostname=None, device_hint=None, probed_tcp=False) -> None:
+        """
+        Stores a probe result. Hostnames and device hints already known for the IP are kept if the new result doesn't have them.
+
+        Parameters:
+        -----------
+            ip_addr - The IPv4 address.
+            reachable - Whether the host answered.
+            rtt - The round trip time in seconds, if known.
+            hostname - The resolved hostname, if known.
+            device_hint - The netmiko device_type hint, if known.
+            probed_tcp - Whether the result came from a TCP probe.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            old_entry = self.entries.get(ip_addr, {})
+            self.entries[ip_addr] = {
+                "reachable": reachable,
+                "rtt": rtt if rtt is not None else old_entry.get("rtt"),
+                "hostname": hostname if hostname is not None else old_entry.get("hostname"),
+                "device_hint": device_hint if device_hint is not None else old_entry.get("device_hint"),
+                "probed_tcp": probed_tcp or old_entry.get("probed_tcp", False),
+                "timestamp": time.monotonic()
+            }
+
+    def clear(self) -> None:
+        """
+        Empties the cache.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            self.entries.clear()
+
+
+# Create the reachability cache shared by the whole program.
+reachability_cache = ReachabilityCache()
+
+def classify_ssh_banner(banner) -> str:
+    """
+    Guesses the netmiko device_type from an SSH server identification banner like SSH-2.0-Cisco-1.25.
+
+    Parameters:
+    -----------
+        banner - The first line the SSH server sent.
+
+    Returns:
+    --------
+        str - The netmiko device_type, or None if the banner doesn't identify the platform.
+    """
+    # Check banner against known platforms.
+    if banner is not None and banner.startswith("SSH-"):
+        for keyword, device_type in SSH_BANNER_DEVICE_TYPES:
+            if keyword.lower() in banner.lower():
+                return device_type
+
+    return None
+
+
+class TcpProber():
+    """
+    Checks reachability by opening TCP connections to the SSH and telnet ports instead of pinging. This gets through
+    sites that drop ICMP, and the SSH banner tells us what kind of device is on the other end before we ever log in.
+    Has the same open/close/probe surface as the IcmpSweeper.
+    """
+    def __init__(self, timeout=TCP_PROBE_TIMEOUT) -> None:
+        # Create class variables and objects.
+        self.timeout = timeout
+        self.loop = None
+
+    def open(self, loop) -> None:
+        """
+        Stores the event loop the prober will run on.
+
+        Parameters:
+        -----------
+            loop - The asyncio event loop.
+
+        Returns:
+        --------
+            Nothing
+        """
+        self.loop = loop
+
+    def close(self) -> None:
+        """
+        Nothing to close, every probe cleans up its own connection.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        self.loop = None
+
+    async def connect(self, ip_addr, port) -> Tuple[bool, float, str]:
+        """
+        Opens a TCP connection to the given port and reads the first line the server sends.
+
+        Parameters:
+        -----------
+            ip_addr - The IPv4 address to connect to.
+            port - The TCP port.
+
+        Returns:
+        --------
+            Tuple[bool - did the connection open?, float - connect time in seconds or None, str - banner line or None]
+        """
+        # Create instance variables.
+        banner = None
+        deadline = time.monotonic() + LOCAL_ERROR_RETRY_TIME
+
+        while True:
+            send_time = time.perf_counter()
+            try:
+                # Open connection.
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(ip_addr, port), self.timeout)
+                break
+            except asyncio.TimeoutError:
+                return False, None, None
+            except OSError as error:
+                # Refused or unreachable means the port is closed. Running out of sockets here doesn't.
+                if not is_local_error(error):
+                    return False, None, None
+                if time.monotonic() >= deadline:
+                    raise LocalResourceError(f"Out of sockets while connecting to {ip_addr} port {port}") from error
+                await asyncio.sleep(LOCAL_ERROR_RETRY_DELAY)
+        rtt = time.perf_counter() - send_time
+
+        try:
+            # Only SSH servers talk first, telnet servers wait on option negotiation.
+            if port == SSH_PORT:
+                banner = (await asyncio.wait_for(reader.readline(), self.timeout)).decode("ascii", "ignore").strip()
+        except (asyncio.TimeoutError, OSError):
+            pass
+        finally:
+            # Close connection.
+            writer.close()
+
+        return True, rtt, banner
+
+    async def probe(self, ip_addr) -> Tuple[bool, float, str]:
+        """
+        Connects to the SSH and telnet ports at the same time and classifies the device from whichever answered.
+
+        Parameters:
+        -----------
+            ip_addr - The IPv4 address to probe.
+
+        Returns:
+        --------
+            Tuple[bool - is reachable?, float - connect time in seconds or None, str - netmiko device_type hint or None]
+
+        Raises LocalResourceError if this machine stayed out of sockets.
+        """
+        # Try both ports at once.
+        (ssh_open, ssh_rtt, banner), (telnet_open, telnet_rtt, _) = await asyncio.gather(self.connect(ip_addr, SSH_PORT), self.connect(ip_addr, TELNET_PORT))
+
+        # Prefer SSH.
+        if ssh_open:
+            return True, ssh_rtt, classify_ssh_banner(banner)
+        elif telnet_open:
+            return True, telnet_rtt, "cisco_ios_telnet"
+
+        return False, None, None
+
+def parse_address_range(text) -> Tuple[ipaddress.IPv4Address, ipaddress.IPv4Address]:
+    """
+    Parses a dash range like 10.0.0.1-10.0.0.50 or the short form 10.0.0.1-50.
+
+    Parameters:
+    -----------
+        text - The range string.
+
+    Returns:
+    --------
+        Tuple[IPv4Address - first address, IPv4Address - last address]
+    """
+    # Split start and end.
+    start, end = [part.strip() for part in text.split("-", 1)]
+    start = ipaddress.IPv4Address(start)
+    # If the end is just a number, it replaces the last octet of the start address.
+    if end.isdigit():
+        end = ipaddress.IPv4Address(".".join(str(start).split(".")[:3] + [end]))
+    else:
+        end = ipaddress.IPv4Address(end)
+
+    return start, end
+
+def parse_exclusion(text) -> list:
+    """
+    Turns an exclusion line (without the leading !) into a list of networks.
+
+    Parameters:
+    -----------
+        text - An ip, CIDR block, or dash range.
+
+    Returns:
+    --------
+        list - The IPv4Network objects covering the exclusion.
+    """
+    # Dash ranges get summarized into the smallest set of networks.
+    if "-" in text:
+        start, end = parse_address_range(text)
+        return list(ipaddress.summarize_address_range(start, end))
+
+    return [ipaddress.IPv4Network(text, strict=False)]
+
+def expand_targets(text) -> Iterator[str]:
+    """
+    Lazily expands the lines of the IP textbox into single ping targets. Lines can be an ip, a hostname,
+    a CIDR block (10.0.0.0/24), a dash range (10.0.0.1-10.0.0.50 or 10.0.0.1-50), or an exclusion (!10.0.0.5, !10.0.0.0/28, !10.0.0.1-9).
+    Blocks and ranges are walked one address at a time, so a /16 is never held in memory.
+
+    Parameters:
+    -----------
+        text - A list containing strings of ips.
+
+    Returns:
+    --------
+        Iterator[str] - Every address or hostname to ping.
+    """
+    # Create instance variables.
+    logger = logging.getLogger(__name__)
+    exclusions = []
+    excluded_names = set()
+    lines = [line.strip() for line in text if len(line.strip()) > 0]
+
+    # Exclusions can appear anywhere in the textbox, so gather them up first.
+    for line in lines:
+        if line.startswith("!"):
+            try:
+                exclusions.extend(parse_exclusion(line[1:].strip()))
+            except ValueError:
+                # Not an address, so it must be a hostname.
+                excluded_names.add(line[1:].strip().lower())
+
+    # Loop through each line and yield its addresses.
+    for line in lines:
+        # Skip exclusion lines.
+        if line.startswith("!"):
+            continue
+
+        try:
+            # Check for CIDR block.
+            if "/" in line:
+                network = ipaddress.IPv4Network(line, strict=False)
+                # Don't throw away the only addresses of /31 and /32 networks.
+                addresses = network.hosts() if network.num_addresses > 2 else iter(network)
+            # Check for dash range.
+            elif "-" in line and line.replace("-", "").replace(".", "").replace(" ", "").isdigit():
+                start, end = parse_address_range(line)
+                addresses = (ipaddress.IPv4Address(addr) for addr in range(int(start), int(end) + 1))
+            else:
+                # Must be a single ip or hostname.
+                if line.lower() not in excluded_names:
+                    try:
+                        if not any(ipaddress.IPv4Address(line) in network for network in exclusions):
+                            yield line
+                    except ValueError:
+                        # Hostnames can't be checked against networks.
+                        yield line
+                continue
+        except ValueError:
+            # Print log.
+            logger.warning(f"Unable to understand textbox line '{line}'. Skipping it.")
+            continue
+
+        # Yield each address in the block that isn't excluded.
+        for address in addresses:
+            if not any(address in network for network in exclusions):
+                yield str(address)
+
+async def resolve_and_probe(prober, ip_or_hostname, include_hint=False, use_cache=True) -> Tuple[bool, str, str]:
+    """
+    Resolves the given target, probes it with the prober, and looks up its hostname if it's up.
+    Fresh entries in the reachability cache are returned without probing.
+
+    Parameters:
+    -----------
+        prober - The IcmpSweeper or TcpProber to send the probe through.
+        ip_or_hostname - The machines IP address or hostname on the network.
+        include_hint - Whether to append the prober's device_type hint to the result.
+        use_cache - Whether a fresh reachability cache entry can be used instead of probing.
+
+    Returns:
+    --------
+        Tuple[bool - is reachable?, str - IP adress, str - hostname(, str - device_type hint)]
+    """
+    # Create instance variables.
+    logger = logging.getLogger(__name__)
+    reachable = False
+    rtt = None
+    device_hint = None
+    cached = None
+    is_local_failure = False
+
+    # Resolve the target to an IPv4 address through the shared cache.
+    ip_addr = await resolver_cache.resolve(ip_or_hostname)
+    if ip_addr is not None:
+        # Check if we already know about this host. TCP sweeps need an entry that came from a TCP probe for the device hint.
+        if use_cache:
+            cached = reachability_cache.get(ip_addr, require_hint=include_hint)
+        if cached is not None:
+            reachable, rtt, device_hint = cached["reachable"], cached["rtt"], cached["device_hint"]
+        else:
+            # Ping the machine. If this machine is out of sockets we don't know anything about the host.
+            try:
+                reachable, rtt, device_hint = await prober.probe(ip_addr)
+            except LocalResourceError as error:
+                logger.error(f"{error}. Not caching {ip_addr} as down, lower the sweep size or raise the open file limit.")
+                is_local_failure = True
+
+    # Check the response.
+    if reachable:
+        # Resolve hostname through the shared cache. Set hostname equal to ip address if there's no PTR record.
+        hostname = cached["hostname"] if cached is not None and cached["hostname"] is not None else await resolver_cache.reverse_lookup(ip_addr)
+        if hostname is None:
+            hostname = ip_addr
+        # Print host is up.
+        logger.info(f"Ping of {ip_addr}: Host {hostname} is up!" + (f" Looks like {device_hint}." if device_hint is not None else "") + (" (cached)" if cached is not None else ""))
+        result = (True, ip_addr, hostname)
+    else:
+        # Print host id down.
+        logger.warning(f"Unable to talk to {ip_or_hostname}")
+        result = (False, None, None)
+
+    # Remember what we found.
+    if ip_addr is not None and cached is None and not is_local_failure:
+        reachability_cache.store(ip_addr, reachable, rtt, result[2], device_hint, probed_tcp=include_hint)
+
+    # Append the device hint if asked for.
+    if include_hint:
+        result += (device_hint,)
+
+    return result
+
+async def async_ping_sweep(targets, callback, timeout=PING_TIMEOUT, max_in_flight=None, mode=PROBE_ICMP, use_cache=True) -> None:
+    """
+    Pings every given target over a single ICMP socket. A fixed number of workers pull targets from the
+    iterator, so at most max_in_flight probes are outstanding and the targets are only expanded as fast as they're pinged.
+
+    Parameters:
+    -----------
+        targets - An iterable of IP addresses or hostnames.
+        callback - Called with each (reachable, ip, hostname) tuple as soon as that target finishes.
+                In TCP mode the tuple has a fourth value, the device_type hint from the SSH banner.
+        timeout - How long to wait for each reply in seconds.
+        max_in_flight - The max number of echo requests waiting on a reply at once. Sized from the open file limit if None.
+        mode - PROBE_ICMP to ping, PROBE_TCP to connect to the SSH/telnet ports instead.
+        use_cache - Whether fresh reachability cache entries can be used instead of probing.
+
+    Returns:
+    --------
+        Nothing
+    """
+    # Create instance variables.
+    logger = logging.getLogger(__name__)
+
+    # Don't open more sockets than the OS lets us have.
+    if max_in_flight is None:
+        max_in_flight = get_max_in_flight(mode)
+    # Create prober on the running loop.
+    if mode == PROBE_TCP:
+        sweeper = TcpProber(min(timeout, TCP_PROBE_TIMEOUT))
+    else:
+        sweeper = IcmpSweeper(timeout)
+    sweeper.open(asyncio.get_event_loop())
+    # All workers share one iterator.
+    targets = iter(targets)
+
+    async def worker():
+        # Keep pulling targets until the iterator is empty.
+        for target in targets:
+            try:
+                result = await resolve_and_probe(sweeper, target, mode == PROBE_TCP, use_cache)
+            except Exception:
+                # One bad target shouldn't stop the sweep. Report it as down.
+                logger.exception(f"Unable to probe {target}")
+                result = (False, None, None, None) if mode == PROBE_TCP else (False, None, None)
+            callback(result)
+
+    try:
+        await asyncio.gather(*[worker() for _ in range(max_in_flight)])
+    finally:
+        # Close socket.
+        sweeper.close()
+
+def ping_sweep(targets, callback, timeout=PING_TIMEOUT, max_in_flight=None, mode=PROBE_ICMP, use_cache=True) -> None:
+    """
+    Blocking wrapper around async_ping_sweep. Runs the sweep on a new selector event loop in the calling thread.
+
+    Parameters:
+    -----------
+        targets - An iterable of IP addresses or hostnames.
+        callback - Called with each (reachable, ip, hostname) tuple as soon as that target finishes.
+        timeout - How long to wait for each reply in seconds.
+        max_in_flight - The max number of echo requests waiting on a reply at once. Sized from the open file limit if None.
+        mode - PROBE_ICMP to ping, PROBE_TCP to connect to the SSH/telnet ports instead.
+        use_cache - Whether fresh reachability cache entries can be used instead of probing.
+
+    Returns:
+    --------
+        Nothing
+    """
+    # Selector loops support add_reader on every platform, proactor loops on windows don't.
+    loop = asyncio.SelectorEventLoop()
+    try:
+        loop.run_until_complete(async_ping_sweep(targets, callback, timeout, max_in_flight, mode, use_cache))
+    finally:
+        loop.close()
 
 def ping(ip_or_hostname) -> Tuple[bool, str, str]:
     """
@@ -24,94 +828,51 @@ def ping(ip_or_hostname) -> Tuple[bool, str, str]:
     """
     # Create instance variables.
     logger = logging.getLogger(__name__)
-    reachable = False
-    ip_addr = None
-    hostname = None
+    results = []
 
     # Check if given ip is not empty.
     if len(ip_or_hostname) > 0:
-        # Ping commands will be different if we are on linux or windows.
         try:
-            if platform.system() == "Linux":
-                # Ping the machine.
-                response = subprocess.Popen("ping -c 1 " + ip_or_hostname, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-                response.wait()
-                response = response.poll()
-                # Check the response.
-                if response == 0:
-                    # Set reachable var.
-                    reachable = True
-                    # Try to resolve both the IP and hostname.
-                    ip_addr = socket.gethostbyname(ip_or_hostname)
-                    hostname, _, _ = socket.gethostbyaddr(ip_or_hostname)
-                    # Print host is up.
-                    logger.info(f"Ping of {ip_addr}: Host {hostname} is up!")
-                else:
-                    # Set reachable var.
-                    reachable = False
-                    # Print host id down.
-                    logger.warning(f"Unable to talk to {ip_or_hostname}")
-            else:
-                # Ping the machine.
-                response = subprocess.Popen("ping -n 1 " + ip_or_hostname, stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
-                response.wait()
-                response = response.poll()
-                # Check the response.
-                if response == 0:
-                    # Set reachable var.
-                    reachable = True
-                    # Try to resolve hostname, must catch this because it throws errors if it fails.
-                    try:
-                        # Try to resolve both the IP and hostname.
-                        ip_addr = socket.gethostbyname(ip_or_hostname)
-                        hostname, _, _ = socket.gethostbyaddr(ip_or_hostname)
-                        hostname = "asdf"
-                    except Exception:
-                        # Set hostname equal to ip address.
-                        ip_addr = ip_or_hostname
-                        hostname = ip_addr
-                    # Print host is up.
-                    logger.info(f"Ping of {ip_addr}: Host {hostname} is up!")
-                else:
-                    # Set reachable var.
-                    reachable = False
-                    # Print host id down.
-                    logger.warning(f"Unable to talk to {ip_or_hostname}")
-
-            return reachable, ip_addr, hostname
+            ping_sweep([ip_or_hostname], results.append, max_in_flight=1)
+            return results[0]
         except Exception as exception:
             # Print debug.
             logger.critical(f"Something weird happened while pinging {ip_or_hostname}.", exc_info=exception, stack_info=True)
 
 
-def ping_of_death(text, ip_list) -> None:
+def ping_of_death(text, ip_list, finished=None, mode=PROBE_ICMP, use_cache=True) -> None:
     """
     This function looks at the given list of strings containing ips and pings each one to see which ones are reachable.
+    Lines can also be CIDR blocks, dash ranges, or exclusions. Results are appended to ip_list as soon as each host
+    finishes, so anything watching the list sees them right away.
 
     Parameters:
     -----------
         text - A list containing strings of ips.
         ip_list - The list to store all the ip info inside.
-    
+        finished - An optional threading.Event that is set once every host has been pinged.
+        mode - PROBE_ICMP to ping, PROBE_TCP to connect to the SSH/telnet ports instead. TCP results
+                carry the device_type hint from the SSH banner as a fourth tuple value.
+        use_cache - Whether hosts swept recently can be answered from the reachability cache instead of probed again.
+
     Returns:
     --------
         Nothing
     """
     # Create method instance variables.
-    thread_pool = ThreadPool(PING_THREADS)
     logger = logging.getLogger(__name__)
 
     # Check if the textbox actually contains something.
     if len(text[0]) > 0:
-        # Loop through each line and try to ping it in a new thread.
-        ips = thread_pool.map_async(ping, text)
-
-        # Wait for pool threads to finish.
-        thread_pool.close()
-        thread_pool.join()
-
-        # Get results from pool.
-        for address in ips.get():
-            ip_list.append(address)
+        # Ping every address at once over a single socket, appending each result as it finishes.
+        try:
+            ping_sweep(expand_targets(text), ip_list.append, mode=mode, use_cache=use_cache)
+        except Exception as exception:
+            # Print debug.
+            logger.critical("Something weird happened while pinging the device list.", exc_info=exception, stack_info=True)
     else:
-        logger.warning("Textbox is empty! You must enter switch addresses in the textbox.")
\ No newline at end of file
+        logger.warning("Textbox is empty! You must enter switch addresses in the textbox.")
+
+    # Signal that the sweep is done.
+    if finished is not None:
+        finished.set()
@@ -0,0 +1,297 @@
+# Import required packages.
+import asyncio
+import functools
+import ipaddress
+import logging
+import socket
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Dict
+
+# Create constants.
+POSITIVE_TTL = 3600.0
+NEGATIVE_TTL = 300.0
+# The system resolver blocks a thread per lookup, and a missing PTR record can take seconds to fail. This many can wait at once.
+LOOKUP_THREADS = 100
+LOOKUP_TIMEOUT = 5.0
+
+
+class ResolverCache():
+    """
+    Shared asyncio DNS cache for forward (name -> ip) and reverse (ip -> name) lookups. Answers are kept for
+    POSITIVE_TTL seconds and failures (no PTR record, NXDOMAIN, timeouts) are remembered for NEGATIVE_TTL seconds,
+    so a missing record only costs one slow lookup per session. The system resolver blocks, so lookups run on a
+    dedicated pool of LOOKUP_THREADS threads instead of the event loop's small default executor, and callers give up
+    after LOOKUP_TIMEOUT seconds. Callers asking for the same thing at the same time share one lookup.
+    """
+    def __init__(self, positive_ttl=POSITIVE_TTL, negative_ttl=NEGATIVE_TTL, lookup_threads=LOOKUP_THREADS, lookup_timeout=LOOKUP_TIMEOUT) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.lookup_threads = lookup_threads
+        self.lookup_timeout = lookup_timeout
+        self.forward = {}
+        self.reverse = {}
+        self.lock = Lock()
+        self.pool = ThreadPoolExecutor(max_workers=lookup_threads, thread_name_prefix="resolver")
+        # Event loop -> semaphore. Sweeps, the monitor, and batch callers each run their own loop.
+        self.semaphores = weakref.WeakKeyDictionary()
+        # (function, args) -> the pool future of the lookup running for it.
+        self.in_flight = {}
+
+    def get_cached(self, table, key) -> tuple:
+        """
+        Looks up a key in one of the cache tables.
+
+        Parameters:
+        -----------
+            table - The forward or reverse dictionary.
+            key - The name or ip to look up.
+
+        Returns:
+        --------
+            tuple - (True, value) on a fresh hit, value is None for negative entries. (False, None) on a miss.
+        """
+        with self.lock:
+            entry = table.get(key)
+            # Check if the entry exists and hasn't expired.
+            if entry is not None and entry[1] > time.monotonic():
+                return True, entry[0]
+            # Remove stale entry.
+            table.pop(key, None)
+
+        return False, None
+
+    def store(self, table, key, value) -> None:
+        """
+        Stores a lookup result. None values are stored as negative entries with the shorter TTL.
+
+        Parameters:
+        -----------
+            table - The forward or reverse dictionary.
+            key - The name or ip that was looked up.
+            value - The answer, or None if the lookup failed.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            table[key] = (value, time.monotonic() + (self.positive_ttl if value is not None else self.negative_ttl))
+
+    async def run_lookup(self, function, *args):
+        """
+        Runs a blocking resolver call on the lookup pool, or joins the same call if it's already running. Only as many
+        lookups as there are threads are started at once, and a slot is held until the resolver call returns, even if
+        every caller gave up on it. So the timeout only counts time spent waiting on DNS, and stalled lookups slow new
+        ones down instead of filling the pool behind their backs.
+
+        Parameters:
+        -----------
+            function - socket.getaddrinfo or socket.getnameinfo.
+            args - The arguments for it.
+
+        Returns:
+        --------
+            The function's result. Raises asyncio.TimeoutError if DNS didn't answer in time.
+        """
+        # Get this loop's semaphore.
+        loop = asyncio.get_event_loop()
+        with self.lock:
+            semaphore = self.semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.lookup_threads)
+                self.semaphores[loop] = semaphore
+            future = self.in_flight.get((function, args))
+
+        # Start the lookup unless someone else already has.
+        if future is None:
+            await semaphore.acquire()
+            with self.lock:
+                future = self.in_flight.get((function, args))
+                is_started = future is None
+                if is_started:
+                    future = self.pool.submit(function, *args)
+                    self.in_flight[(function, args)] = future
+            if is_started:
+                future.add_done_callback(functools.partial(self.finish_lookup, (function, args), loop, semaphore))
+            else:
+                semaphore.release()
+
+        # Giving up doesn't cancel the lookup for the other callers.
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.lookup_timeout)
+
+    def finish_lookup(self, key, loop, semaphore, future) -> None:
+        """
+        Pool future callback. Forgets the finished lookup and gives its slot back on the loop that started it.
+
+        Parameters:
+        -----------
+            key - The (function, args) of the lookup.
+            loop - The event loop that started it.
+            semaphore - The loop's semaphore.
+            future - The finished pool future.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            if self.in_flight.get(key) is future:
+                self.in_flight.pop(key)
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # The loop was closed while the lookup ran. Its semaphore went with it.
+            pass
+
+    async def resolve(self, ip_or_hostname) -> str:
+        """
+        Resolves a hostname to its IPv4 address. IP addresses are returned as is without a lookup.
+
+        Parameters:
+        -----------
+            ip_or_hostname - The name or ip to resolve.
+
+        Returns:
+        --------
+            str - The IPv4 address, or None if the name doesn't resolve.
+        """
+        # IPs don't need resolving.
+        try:
+            return str(ipaddress.IPv4Address(ip_or_hostname))
+        except ValueError:
+            pass
+
+        # Check cache.
+        key = ip_or_hostname.lower()
+        hit, ip_addr = self.get_cached(self.forward, key)
+        if hit:
+            return ip_addr
+
+        # Lookup name.
+        try:
+            addr_info = await self.run_lookup(socket.getaddrinfo, ip_or_hostname, None, socket.AF_INET)
+            ip_addr = addr_info[0][4][0]
+        except (socket.gaierror, UnicodeError, OSError, asyncio.TimeoutError):
+            ip_addr = None
+        self.store(self.forward, key, ip_addr)
+
+        return ip_addr
+
+    async def reverse_lookup(self, ip_addr) -> str:
+        """
+        Finds the hostname of the given IP from its PTR record.
+
+        Parameters:
+        -----------
+            ip_addr - The IPv4 address.
+
+        Returns:
+        --------
+            str - The hostname, or None if there is no PTR record.
+        """
+        # Check cache.
+        hit, hostname = self.get_cached(self.reverse, ip_addr)
+        if hit:
+            return hostname
+
+        # Lookup address.
+        try:
+            hostname, _ = await self.run_lookup(socket.getnameinfo, (ip_addr, 0), socket.NI_NAMEREQD)
+        except (socket.gaierror, socket.herror, OSError, asyncio.TimeoutError):
+            hostname = None
+        self.store(self.reverse, ip_addr, hostname)
+
+        return hostname
+
+    async def resolve_many(self, names) -> Dict[str, str]:
+        """
+        Resolves a batch of names at once. Duplicates are only looked up once.
+
+        Parameters:
+        -----------
+            names - An iterable of hostnames or ips.
+
+        Returns:
+        --------
+            dict - name -> ip (None for names that don't resolve)
+        """
+        return await self.run_batch(self.resolve, names)
+
+    async def reverse_lookup_many(self, ip_addrs) -> Dict[str, str]:
+        """
+        Reverse resolves a batch of IPs at once. Duplicates are only looked up once.
+
+        Parameters:
+        -----------
+            ip_addrs - An iterable of IPv4 addresses.
+
+        Returns:
+        --------
+            dict - ip -> hostname (None for ips without a PTR record)
+        """
+        return await self.run_batch(self.reverse_lookup, ip_addrs)
+
+    async def run_batch(self, lookup, keys) -> dict:
+        """
+        Runs a lookup coroutine over a batch of unique keys. run_lookup bounds how many run at once.
+
+        Parameters:
+        -----------
+            lookup - The resolve or reverse_lookup coroutine.
+            keys - The keys to look up.
+
+        Returns:
+        --------
+            dict - key -> answer
+        """
+        # Remove duplicates while keeping order.
+        keys = list(dict.fromkeys(keys))
+
+        # Look everything up at once.
+        answers = await asyncio.gather(*[lookup(key) for key in keys])
+
+        return dict(zip(keys, answers))
+
+    def resolve_many_sync(self, names) -> Dict[str, str]:
+        """
+        Blocking wrapper around resolve_many for threaded callers. Runs the whole batch on a private event
+        loop, so the calling thread waits once for the batch instead of once per name.
+
+        Parameters:
+        -----------
+            names - An iterable of hostnames or ips.
+
+        Returns:
+        --------
+            dict - name -> ip (None for names that don't resolve)
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.resolve_many(names))
+        finally:
+            loop.close()
+
+    def clear(self) -> None:
+        """
+        Empties the cache.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            self.forward.clear()
+            self.reverse.clear()
+
+
+# Create the resolver shared by the whole program.
+resolver_cache = ResolverCache()
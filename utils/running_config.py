@@ -0,0 +1,263 @@
+# Import required packages.
+import string
+from functools import lru_cache
+
+# Create constants.
+INTERFACE_NAME_CHARACTERS = string.ascii_letters + "-"
+INTERFACE_NAME_TABLE = str.maketrans("", "", INTERFACE_NAME_CHARACTERS)
+# Types whose short form isn't their first two letters. TwoGigabitEthernet is Tw, so TwentyFiveGigE needs three.
+INTERFACE_SHORT_TYPES = {"TwentyFiveGigE": "Twe", "Twe": "Twe"}
+INTERFACE_NAME_CACHE_SIZE = 4096
+# show run prints banner delimiters as ^C.
+BANNER_DELIMITER = "^C"
+
+
+@lru_cache(maxsize=INTERFACE_NAME_CACHE_SIZE)
+def get_interface_short_name(name) -> str:
+    """
+    Turns an interface name into the short form show interface status uses, so GigabitEthernet1/0/1 and Gi1/0/1 both
+    become Gi1/0/1. Stacks repeat the same few hundred names every refresh, so results are cached.
+
+    Parameters:
+    -----------
+        name - The long or short interface name.
+
+    Returns:
+    --------
+        str - The short type, usually its first two letters, followed by the port numbers.
+    """
+    interface_type = name[:len(name) - len(name.lstrip(INTERFACE_NAME_CHARACTERS))]
+    return INTERFACE_SHORT_TYPES.get(interface_type, name[:2]) + name.translate(INTERFACE_NAME_TABLE)
+
+def get_banner_delimiter(command) -> str:
+    """
+    Returns the delimiter a banner command's text ends with.
+
+    Parameters:
+    -----------
+        command - The stripped config line.
+
+    Returns:
+    --------
+        str - ^C as show run prints it, the delimiter character the user typed, or None if the line isn't a banner.
+    """
+    words = command.split(None, 2)
+    if words[0] != "banner" or len(words) < 3:
+        return None
+
+    return BANNER_DELIMITER if words[2].startswith(BANNER_DELIMITER) else words[2][0]
+
+
+class ConfigSection():
+    """
+    One line of the config and the indented lines under it. Commands that take text over several lines, like banners,
+    keep it in body and are always sent whole.
+    """
+    def __init__(self, line, indent, parent=None) -> None:
+        # Create class variables and objects.
+        self.line = line
+        self.command = line.strip()
+        self.indent = indent
+        self.parent = parent
+        self.children = []
+        # Lines up to and including the closing delimiter of a multi-line command.
+        self.body = []
+
+    def get_lines(self) -> list:
+        """
+        Returns this line and every line under it, in config order.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            list - The config lines, with their indentation.
+        """
+        lines = [self.line] + self.body
+        for child in self.children:
+            lines += child.get_lines()
+
+        return lines
+
+    def get_changes(self, old_section) -> list:
+        """
+        Returns the lines that have to be sent to turn the old section into this one. Changed child lines come with
+        their parent lines, so they are entered in the right config mode.
+
+        Parameters:
+        -----------
+            old_section - The section with the same command in the old config, or None if it's new.
+
+        Returns:
+        --------
+            list - The config lines to send, empty if nothing changed.
+        """
+        # New sections are sent whole, and so are multi-line commands with new text. A line of a banner means nothing alone.
+        if old_section is None or self.body != old_section.body:
+            return self.get_lines()
+
+        # Only send the children that changed.
+        old_children = {child.command: child for child in old_section.children}
+        changes = []
+        for child in self.children:
+            changes += child.get_changes(old_children.get(child.command))
+        if len(changes) > 0:
+            changes.insert(0, self.line)
+
+        return changes
+
+
+class RunningConfig():
+    """
+    A device's running config parsed into a tree of sections in one pass. Top level sections are indexed by their full
+    command, and interfaces by their short name, so get_config_info, the configure window, and the upload diff can all
+    look things up without splitting the text again.
+    """
+    def __init__(self, text) -> None:
+        # Create class variables and objects.
+        self.text = text
+        self.sections = []
+        # Full command -> top level section.
+        self.commands = {}
+        # Short interface name -> interface section, and vlan number -> interface Vlan section.
+        self.interfaces = {}
+        self.vlan_interfaces = {}
+
+        # Parse config.
+        self.parse()
+
+    def parse(self) -> None:
+        """
+        Builds the section tree and indexes from the config text.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # The sections the next line could belong to, outermost first.
+        parents = []
+        # The multi-line command being read and the delimiter that ends it.
+        block = None
+        delimiter = None
+        for line in self.text.splitlines():
+            # Banner text is kept as it is, blank lines and all, until the delimiter comes back.
+            if block is not None:
+                block.body.append(line)
+                if delimiter in line:
+                    block = None
+                continue
+
+            # Skip blank lines and ! separators and comments.
+            command = line.strip()
+            if len(command) <= 0 or command.startswith("!"):
+                continue
+
+            # Find the parent by indentation.
+            indent = len(line) - len(line.lstrip(" "))
+            while len(parents) > 0 and parents[-1].indent >= indent:
+                parents.pop()
+            parent = parents[-1] if len(parents) > 0 else None
+            section = ConfigSection(line, indent, parent)
+            parents.append(section)
+
+            # Store in the tree.
+            if parent is not None:
+                parent.children.append(section)
+            else:
+                self.add_section(section)
+
+            # Start reading a banner's text unless it closes on the same line.
+            delimiter = get_banner_delimiter(command)
+            if delimiter is not None and delimiter not in command.split(None, 2)[2][len(delimiter):]:
+                block = section
+
+    def add_section(self, section) -> None:
+        """
+        Adds a top level section and indexes it.
+
+        Parameters:
+        -----------
+            section - The section.
+
+        Returns:
+        --------
+            Nothing
+        """
+        self.sections.append(section)
+        # If a command repeats, the first one is kept in the index.
+        self.commands.setdefault(section.command, section)
+
+        # Index interfaces the way show interface status and show vlan brief name them.
+        words = section.command.split()
+        if words[0] == "interface" and len(words) > 1:
+            name = words[1]
+            self.interfaces[get_interface_short_name(name)] = section
+            if name.startswith("Vlan"):
+                self.vlan_interfaces[name.translate(INTERFACE_NAME_TABLE)] = section
+
+    def get_section(self, command) -> ConfigSection:
+        """
+        Returns the top level section with the given command.
+
+        Parameters:
+        -----------
+            command - The full command, like interface GigabitEthernet1/0/1.
+
+        Returns:
+        --------
+            ConfigSection - The section, or None if the config doesn't have it.
+        """
+        return self.commands.get(command)
+
+    def get_interface(self, name) -> ConfigSection:
+        """
+        Returns an interface section by its long or short name.
+
+        Parameters:
+        -----------
+            name - The interface name, like GigabitEthernet1/0/1 or Gi1/0/1.
+
+        Returns:
+        --------
+            ConfigSection - The section, or None if the config doesn't have it.
+        """
+        return self.interfaces.get(get_interface_short_name(name))
+
+    def get_vlan_interface(self, vlan) -> ConfigSection:
+        """
+        Returns the interface Vlan section for a vlan.
+
+        Parameters:
+        -----------
+            vlan - The vlan number as a string.
+
+        Returns:
+        --------
+            ConfigSection - The section, or None if the vlan has no interface.
+        """
+        return self.vlan_interfaces.get(vlan)
+
+    def get_changes(self, old_config) -> list:
+        """
+        Returns the lines that have to be sent to the device to go from the old config to this one. Lines only in the
+        old config aren't removed.
+
+        Parameters:
+        -----------
+            old_config - The RunningConfig the device has now.
+
+        Returns:
+        --------
+            list - The config lines to send.
+        """
+        changes = []
+        for section in self.sections:
+            changes += section.get_changes(old_config.get_section(section.command))
+
+        return changes
@@ -0,0 +1,354 @@
+# Import required packages.
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock, RLock, Thread, current_thread
+from utils.executor import connection_executor
+from utils.open_connection import get_config_info, ssh_telnet
+
+# Create constants.
+# How often sessions nobody is using get checked. Netmiko's is_alive writes to the channel, so it only happens here.
+HEARTBEAT_INTERVAL = 20.0
+# Sessions nobody touched for this long are closed, except the one picked in the configure window.
+SESSION_IDLE_TIMEOUT = 900.0
+HEARTBEAT_WORKERS = 8
+MAX_DISCONNECT_THREADS = 32
+
+
+class ManagedSession():
+    """
+    Stands in for a netmiko connection owned by the session manager. Every call is passed through to the connection
+    under a lock, so the heartbeat never talks on the channel while a command is running. is_alive only reads the state
+    the last heartbeat or command left behind, so the UI can call it every frame without any network I/O.
+    """
+    def __init__(self, manager, device, connection, enable_telnet, force_telnet) -> None:
+        # Create class variables and objects.
+        self.manager = manager
+        self.device = device
+        self.ip_addr = device["ip_address"]
+        self.connection = connection
+        self.enable_telnet = enable_telnet
+        self.force_telnet = force_telnet
+        self.lock = RLock()
+        self.alive = True
+        self.last_used = time.monotonic()
+
+    def __getattr__(self, name):
+        """
+        Passes everything that isn't overridden here through to the netmiko connection.
+        """
+        attribute = getattr(self.connection, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with self.lock:
+                self.last_used = time.monotonic()
+                try:
+                    return getattr(self.connection, name)(*args, **kwargs)
+                except (OSError, EOFError):
+                    # The socket is gone. The next heartbeat reconnects.
+                    self.alive = False
+                    raise
+
+        return call
+
+    def is_alive(self) -> bool:
+        """
+        Returns the cached connection state. Doesn't touch the network.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            bool - Whether the session was alive at the last heartbeat or command.
+        """
+        return self.alive
+
+    def disconnect(self) -> None:
+        """
+        Closes the session and removes it from the manager.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        self.manager.close(self.ip_addr)
+
+    def heartbeat(self) -> None:
+        """
+        Checks the connection if nobody used it lately and logs in again if it died. Runs on a heartbeat worker.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Someone is running a command right now, so it's in use and there's nothing to check.
+        if not self.lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self.last_used < self.manager.heartbeat_interval and self.alive:
+                return
+            # Netmiko sends a keepalive on the channel to check it.
+            try:
+                self.alive = self.connection.is_alive()
+            except Exception:
+                self.alive = False
+        finally:
+            self.lock.release()
+
+        if not self.alive:
+            self.reconnect()
+
+    def reconnect(self) -> None:
+        """
+        Logs in again and swaps the new connection in. The caller keeps using this same object.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Print log.
+        self.manager.logger.warning(f"Lost the session to {self.ip_addr}. Reconnecting...")
+        # Logins go through the shared connection executor like every other login.
+        try:
+            connection = connection_executor.submit(ssh_telnet, self.device, self.enable_telnet, self.force_telnet).result()
+        except Exception:
+            connection = None
+
+        # Swap it in, unless the session was closed while we logged in. Then nobody would ever close the new connection.
+        if connection is not None and connection.is_alive():
+            with self.lock:
+                with self.manager.lock:
+                    is_managed = self.manager.sessions.get(self.ip_addr) is self
+                if is_managed:
+                    old_connection = self.connection
+                    self.connection = connection
+                    self.alive = True
+            if not is_managed:
+                self.manager.disconnect_quietly(connection)
+                return
+            self.manager.disconnect_quietly(old_connection)
+            self.manager.logger.info(f"Reconnected to {self.ip_addr}")
+        else:
+            self.manager.logger.warning(f"Unable to reconnect to {self.ip_addr}. Trying again at the next heartbeat.")
+
+
+class SessionManager():
+    """
+    Owns every device connection the configure window has open. A background thread checks idle sessions on a timer,
+    logs back in to ones that dropped, and closes ones nobody used for a while. Sessions are handed out as ManagedSession
+    objects, so the window keeps calling send_command and is_alive like it would on a netmiko connection.
+    """
+    def __init__(self, heartbeat_interval=HEARTBEAT_INTERVAL, idle_timeout=SESSION_IDLE_TIMEOUT, heartbeat_workers=HEARTBEAT_WORKERS) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.heartbeat_workers = heartbeat_workers
+        self.lock = Lock()
+        self.sessions = {}
+        self.active_ip = None
+        self.stop_event = Event()
+        self.thread = None
+        self.pool = None
+
+    def open(self, device, enable_telnet, force_telnet, store_config_info=False) -> ManagedSession:
+        """
+        Returns the managed session for a device, logging in if there isn't a live one yet.
+
+        Parameters:
+        -----------
+            device - A dictionary object containing the required keys and values to connect to the device.
+            enable_telnet - Boolean val to enable telnet support.
+            force_telnet - Boolean val to force telnet fallback.
+            store_config_info - A boolean value that determines if config info is gathered and stored in the given dictionary.
+
+        Returns:
+        --------
+            ManagedSession - The session, or None if the device couldn't be logged into.
+        """
+        # Get device ip.
+        ip_addr = device["ip_address"]
+
+        # Use the live session if there is one.
+        with self.lock:
+            session = self.sessions.get(ip_addr)
+        if session is not None and session.is_alive():
+            # Store info if toggle is set.
+            if store_config_info:
+                device["interfaces"], device["vlans"], running_config = get_config_info(session)
+                device["config"] = running_config.text
+                device["running_config"] = running_config
+            return session
+
+        # Log in.
+        connection = ssh_telnet(device, enable_telnet, force_telnet, store_config_info=store_config_info)
+        if connection is None or not connection.is_alive():
+            return None
+
+        # Take ownership, replacing any dead session for the same device.
+        session = ManagedSession(self, device, connection, enable_telnet, force_telnet)
+        with self.lock:
+            old_session = self.sessions.get(ip_addr)
+            self.sessions[ip_addr] = session
+            # Start the heartbeat if this is the first one.
+            if self.thread is None or not self.thread.is_alive():
+                self.stop_event.clear()
+                self.pool = ThreadPoolExecutor(max_workers=self.heartbeat_workers, thread_name_prefix="heartbeat")
+                self.thread = Thread(target=self.run, daemon=True)
+                self.thread.start()
+        if old_session is not None:
+            old_session.alive = False
+            self.disconnect_quietly(old_session.connection)
+
+        return session
+
+    def set_active(self, ip_addr) -> None:
+        """
+        Marks the device picked in the configure window. Its session is never closed for being idle.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device, or None.
+
+        Returns:
+        --------
+            Nothing
+        """
+        self.active_ip = ip_addr
+
+    def run(self) -> None:
+        """
+        Thread target. Closes idle sessions and hands the rest to the heartbeat workers every interval. Stops once the
+        manager has no sessions left.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        is_running = True
+        while is_running and not self.stop_event.wait(self.heartbeat_interval):
+            # Split idle sessions from the ones to check.
+            now = time.monotonic()
+            with self.lock:
+                # A newer heartbeat took over after close_all.
+                if self.thread is not current_thread():
+                    return
+                idle = [ip_addr for ip_addr, session in self.sessions.items() if ip_addr != self.active_ip and now - session.last_used >= self.idle_timeout]
+                idle_sessions = [self.sessions.pop(ip_addr) for ip_addr in idle]
+                sessions = list(self.sessions.values())
+                pool = self.pool
+                # Stop once nothing is left. The next open starts a new heartbeat.
+                if len(self.sessions) <= 0:
+                    self.thread = None
+                    is_running = False
+
+            # Close idle sessions.
+            for session in idle_sessions:
+                session.alive = False
+                self.disconnect_quietly(session.connection)
+            if len(idle) > 0:
+                self.logger.info(f"Closed {len(idle)} idle sessions: {idle}")
+
+            # Check the rest on the workers, so one hung switch doesn't hold up the others.
+            try:
+                for session in sessions:
+                    pool.submit(session.heartbeat)
+            except RuntimeError:
+                # close_all shut the workers down under us.
+                return
+
+            # Let the workers go when stopping.
+            if not is_running:
+                pool.shutdown(wait=False)
+
+    def disconnect_quietly(self, connection) -> None:
+        """
+        Closes a netmiko connection, ignoring errors from connections that are already dead.
+
+        Parameters:
+        -----------
+            connection - The connection to close.
+
+        Returns:
+        --------
+            Nothing
+        """
+        try:
+            connection.disconnect()
+        except Exception:
+            pass
+
+    def close(self, ip_addr) -> None:
+        """
+        Closes one session and forgets it.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            session = self.sessions.pop(ip_addr, None)
+        if session is not None:
+            with session.lock:
+                session.alive = False
+                self.disconnect_quietly(session.connection)
+
+    def close_all(self) -> None:
+        """
+        Closes every session at the same time and stops the heartbeat.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            sessions = list(self.sessions.values())
+            self.sessions.clear()
+            self.active_ip = None
+            self.stop_event.set()
+            self.thread = None
+            pool = self.pool
+            self.pool = None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+        # Disconnecting waits on each switch to hang up, so do them all at once.
+        for session in sessions:
+            session.alive = False
+        if len(sessions) > 0:
+            with ThreadPoolExecutor(max_workers=min(len(sessions), MAX_DISCONNECT_THREADS)) as disconnect_pool:
+                list(disconnect_pool.map(self.disconnect_quietly, [session.connection for session in sessions]))
+            # Print log.
+            self.logger.info(f"Closed {len(sessions)} sessions.")
+
+
+# Create the session manager shared by the configure window.
+session_manager = SessionManager()
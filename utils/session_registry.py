@@ -0,0 +1,159 @@
+# Import required packages.
+import logging
+import time
+from threading import Event, Lock, Thread, current_thread
+
+# Create constants.
+# Parked sessions are closed after this many idle seconds. Well under the IOS default exec-timeout of 10 minutes.
+SESSION_IDLE_TIMEOUT = 300.0
+# Every parked session holds a socket and a netmiko thread, so only this many are kept.
+MAX_PARKED_SESSIONS = 64
+SWEEP_INTERVAL = 10.0
+
+
+class SessionRegistry():
+    """
+    Keeps logged in, enabled sessions with paging turned off, so the next user of a device doesn't log in again.
+    Autodetect parks the session it opened and the configure window claims it when the device is picked. Sessions
+    nobody claims are closed after idle_timeout seconds by a background thread that only runs while something is parked.
+    """
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT, max_sessions=MAX_PARKED_SESSIONS, sweep_interval=SWEEP_INTERVAL) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.lock = Lock()
+        # IP -> (connection, time it was parked).
+        self.sessions = {}
+        self.stop_event = Event()
+        self.thread = None
+
+    def park(self, ip_addr, ssh_connection) -> bool:
+        """
+        Parks a session. The session must already be enabled with terminal length 0 set.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+            ssh_connection - The live connection.
+
+        Returns:
+        --------
+            bool - Whether the registry took the session. If not, the caller still has to close it.
+        """
+        with self.lock:
+            # Don't hold too many sockets and threads.
+            if ip_addr not in self.sessions and len(self.sessions) >= self.max_sessions:
+                return False
+            old_session = self.sessions.get(ip_addr)
+            self.sessions[ip_addr] = (ssh_connection, time.monotonic())
+            # Start sweeping if this is the first one.
+            if self.thread is None or not self.thread.is_alive():
+                self.stop_event.clear()
+                self.thread = Thread(target=self.sweep, daemon=True)
+                self.thread.start()
+
+        # Replace any older session to the same device.
+        if old_session is not None and old_session[0] is not ssh_connection:
+            self.close(old_session[0])
+
+        return True
+
+    def claim(self, ip_addr) -> object:
+        """
+        Takes a parked session out of the registry. The caller owns it from then on.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the device.
+
+        Returns:
+        --------
+            object - The live connection, or None if nothing usable was parked.
+        """
+        with self.lock:
+            session = self.sessions.pop(ip_addr, None)
+        if session is None:
+            return None
+
+        # The device may have dropped it while it sat idle.
+        ssh_connection, _ = session
+        if not ssh_connection.is_alive():
+            self.close(ssh_connection)
+            return None
+
+        return ssh_connection
+
+    def sweep(self) -> None:
+        """
+        Thread target. Closes sessions that sat idle too long, and stops once nothing is parked.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        is_running = True
+        while is_running and not self.stop_event.wait(self.sweep_interval):
+            # Pick out expired sessions.
+            now = time.monotonic()
+            with self.lock:
+                # A newer sweeper took over after close_all.
+                if self.thread is not current_thread():
+                    return
+                expired = [ip_addr for ip_addr, (_, parked_time) in self.sessions.items() if now - parked_time >= self.idle_timeout]
+                expired_sessions = [self.sessions.pop(ip_addr)[0] for ip_addr in expired]
+                # Stop once nothing is parked. The next park starts a new sweeper.
+                if len(self.sessions) <= 0:
+                    self.thread = None
+                    is_running = False
+            # Close them outside the lock, disconnects can be slow.
+            for ssh_connection in expired_sessions:
+                self.close(ssh_connection)
+            if len(expired) > 0:
+                self.logger.debug(f"Closed {len(expired)} idle parked sessions: {expired}")
+
+    def close(self, ssh_connection) -> None:
+        """
+        Closes a session, ignoring errors from sessions that are already dead.
+
+        Parameters:
+        -----------
+            ssh_connection - The connection to close.
+
+        Returns:
+        --------
+            Nothing
+        """
+        try:
+            ssh_connection.disconnect()
+        except Exception:
+            pass
+
+    def close_all(self) -> None:
+        """
+        Closes every parked session and stops the sweeper.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        with self.lock:
+            sessions = [ssh_connection for ssh_connection, _ in self.sessions.values()]
+            self.sessions.clear()
+            self.stop_event.set()
+            self.thread = None
+        for ssh_connection in sessions:
+            self.close(ssh_connection)
+
+
+# Create the session registry shared by autodetect and the configure window.
+session_registry = SessionRegistry()
@@ -0,0 +1,391 @@
+# Import required packages.
+import asyncio
+import logging
+from concurrent.futures import Future
+from threading import Thread
+from typing import Dict, List, Tuple
+
+from utils.cdp_parser import build_neighbor_record
+from utils.device_type_cache import device_type_cache
+
+try:
+    # pysnmp 7 and newer.
+    from pysnmp.hlapi.v3arch.asyncio import CommunityData, ContextData, ObjectIdentity, ObjectType, SnmpEngine, UdpTransportTarget, bulk_cmd, get_cmd
+    PYSNMP_CREATE_TRANSPORT = True
+except ImportError:
+    # pysnmp 6 and older.
+    from pysnmp.hlapi.asyncio import CommunityData, ContextData, ObjectIdentity, ObjectType, SnmpEngine, UdpTransportTarget, bulkCmd as bulk_cmd, getCmd as get_cmd
+    PYSNMP_CREATE_TRANSPORT = False
+
+# Create constants.
+SNMP_PORT = 161
+SNMP_TIMEOUT = 2.0
+SNMP_RETRIES = 1
+SNMP_MAX_REPETITIONS = 25
+MAX_SNMP_AGENTS_IN_FLIGHT = 256
+# SNMPv2-MIB.
+SYS_DESCR_OID = "1.3.6.1.2.1.1.1.0"
+SYS_NAME_OID = "1.3.6.1.2.1.1.5.0"
+# IF-MIB ifName.
+IF_NAME_OID = (1, 3, 6, 1, 2, 1, 31, 1, 1, 1, 1)
+# ENTITY-MIB entPhysicalSerialNum for the chassis (index 1 on Cisco switches).
+ENT_SERIAL_OID = "1.3.6.1.2.1.47.1.1.1.1.11.1"
+# CISCO-CDP-MIB cdpCacheEntry and the columns we use from it. Rows are indexed by ifIndex.deviceIndex.
+CDP_CACHE_ENTRY_OID = (1, 3, 6, 1, 4, 1, 9, 9, 23, 1, 2, 1, 1)
+CDP_CACHE_ADDRESS_TYPE = 3
+CDP_CACHE_ADDRESS = 4
+CDP_CACHE_VERSION = 5
+CDP_CACHE_DEVICE_ID = 6
+CDP_CACHE_DEVICE_PORT = 7
+CDP_CACHE_PLATFORM = 8
+CDP_CACHE_CAPABILITIES = 9
+# cdpCacheCapabilities bits, the same ones show cdp neighbors prints.
+CDP_CAPABILITY_NAMES = [
+    (0x01, "Router"),
+    (0x02, "Trans-Bridge"),
+    (0x04, "Source-Route-Bridge"),
+    (0x08, "Switch"),
+    (0x10, "Host"),
+    (0x20, "IGMP"),
+    (0x40, "Repeater"),
+    (0x80, "Phone"),
+    (0x100, "Remote"),
+    (0x200, "CVTA"),
+    (0x400, "Two-port Mac Relay")
+]
+
+
+def decode_capabilities(value) -> List[str]:
+    """
+    Turns a cdpCacheCapabilities bitmask into the capability names show cdp neighbors prints.
+
+    Parameters:
+    -----------
+        value - The raw 4 byte capabilities octet string.
+
+    Returns:
+    --------
+        list - The capability names.
+    """
+    bits = int.from_bytes(bytes(value), "big") if len(bytes(value)) > 0 else 0
+
+    return [name for bit, name in CDP_CAPABILITY_NAMES if bits & bit]
+
+def decode_address(address_type, value) -> str:
+    """
+    Turns a cdpCacheAddress into a dotted IPv4 address.
+
+    Parameters:
+    -----------
+        address_type - The cdpCacheAddressType, 1 means IPv4.
+        value - The raw address octet string.
+
+    Returns:
+    --------
+        str - The IPv4 address or "NULL" if it isn't one.
+    """
+    raw = bytes(value)
+    if int(address_type) != 1 or len(raw) != 4:
+        return "NULL"
+
+    return ".".join(str(octet) for octet in raw)
+
+
+class SnmpDiscoveryEngine():
+    """
+    Pulls CDP neighbor tables over SNMP instead of logging into each switch. Every agent is walked with GETBULK on one
+    asyncio loop running in a background thread, so hundreds of switches can be queried at once over a single UDP socket.
+    submit() hands back a concurrent.futures.Future, so the results can be waited on next to SSH crawl results.
+
+    The port is configurable so the engine can be pointed at a local responder like benchmarks/fake_snmp_agent.py.
+    """
+    def __init__(self, community, port=SNMP_PORT, timeout=SNMP_TIMEOUT, retries=SNMP_RETRIES, max_in_flight=MAX_SNMP_AGENTS_IN_FLIGHT) -> None:
+        # Create class variables and objects.
+        self.logger = logging.getLogger(__name__)
+        self.community = community
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.max_in_flight = max_in_flight
+        self.loop = None
+        self.thread = None
+        self.engine = None
+        self.semaphore = None
+
+    def start(self) -> None:
+        """
+        Starts the engine's event loop in a background thread.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Don't start twice.
+        if self.loop is not None:
+            return
+
+        # Create loop and run it forever in the background.
+        self.loop = asyncio.new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Stops the engine's event loop.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Check if running.
+        if self.loop is None:
+            return
+
+        # Close SNMP engine and stop loop.
+        if self.engine is not None:
+            asyncio.run_coroutine_threadsafe(self.close_engine(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.loop = None
+
+    async def close_engine(self) -> None:
+        """
+        Closes the SNMP engine's sockets. Has to run on the engine's loop.
+
+        Parameters:
+        -----------
+            None
+
+        Returns:
+        --------
+            Nothing
+        """
+        # Older versions of pysnmp don't have close_dispatcher.
+        if hasattr(self.engine, "close_dispatcher"):
+            self.engine.close_dispatcher()
+        self.engine = None
+
+    def submit(self, ip_addr, export_info=False) -> Future:
+        """
+        Queues a switch to be queried.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            export_info - Whether the export fields of the neighbor records should be filled in.
+
+        Returns:
+        --------
+            Future - Resolves to the same (switch ips, neighbor records, signature) tuple as get_cdp_neighbors_info,
+                    with empty lists if the switch has no neighbors, or None if the switch didn't answer SNMP.
+        """
+        # Start loop if needed.
+        self.start()
+
+        return asyncio.run_coroutine_threadsafe(self.get_neighbors(ip_addr, export_info), self.loop)
+
+    async def get_neighbors(self, ip_addr, export_info=False) -> Tuple[list, list, dict]:
+        """
+        Walks one switch's CDP neighbor table and turns it into neighbor records.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the switch.
+            export_info - Whether the export fields of the neighbor records should be filled in.
+
+        Returns:
+        --------
+            Tuple[list - switch neighbor ips, list - neighbor records, None - no neighbor signature], or None if SNMP isn't available.
+            The lists are empty if the switch has no neighbors.
+        """
+        # Create shared objects on the loop the first time through.
+        if self.engine is None:
+            self.engine = SnmpEngine()
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        # Limit how many agents we talk to at once.
+        async with self.semaphore:
+            try:
+                # Find out who the switch is.
+                transport = await self.create_transport(ip_addr)
+                system = await self.get(transport, [SYS_NAME_OID, SYS_DESCR_OID, ENT_SERIAL_OID])
+                if system is None:
+                    self.logger.debug(f"{ip_addr} didn't answer SNMP.")
+                    return None
+                # Walk the neighbor table. An empty table just means the switch has no neighbors.
+                cdp_rows = await self.walk(transport, CDP_CACHE_ENTRY_OID)
+                if cdp_rows is None:
+                    self.logger.debug(f"{ip_addr} didn't answer the CDP neighbor table walk.")
+                    return None
+                # Get the local port names for the neighbors.
+                neighbors = self.group_cdp_rows(cdp_rows)
+                if_indexes = sorted(set(if_index for if_index, _ in neighbors))
+                if_names = {}
+                if len(if_indexes) > 0:
+                    if_names = await self.get(transport, [".".join(str(part) for part in IF_NAME_OID + (if_index,)) for if_index in if_indexes]) or {}
+            except Exception:
+                # Print log. Any SNMP problem just means we'll log in over SSH instead.
+                self.logger.exception(f"SNMP discovery of {ip_addr} failed.")
+                return None
+
+        # A different chassis serial means the switch was replaced, so its cached device type can't be trusted.
+        serial = system.get(ENT_SERIAL_OID)
+        if serial:
+            device_type = device_type_cache.get(ip_addr, serial=serial)
+            if device_type is not None:
+                device_type_cache.store(ip_addr, device_type, serial=serial)
+
+        # Build neighbor records.
+        parent_host = system.get(SYS_NAME_OID, ip_addr).split(".")[0] or ip_addr
+        cdp_neighbors_result_ips = []
+        device_infos = []
+        device_info_keys = set()
+        for (if_index, _), neighbor in neighbors.items():
+            parent_interface = if_names.get(".".join(str(part) for part in IF_NAME_OID + (if_index,)), "NULL")
+            device_info = build_neighbor_record(neighbor, ip_addr, parent_host, parent_interface, export_info)
+
+            # Append final ip to the cdp info list.
+            if device_info["ip_addr"] != "NULL" and device_info["is_switch"]:
+                cdp_neighbors_result_ips.append(device_info["ip_addr"])
+            # Append device to the device infos list.
+            device_info_key = tuple(device_info.values())
+            if export_info and device_info_key not in device_info_keys:
+                device_info_keys.add(device_info_key)
+                device_infos.append(device_info)
+
+        # Print log.
+        self.logger.info(f"Read {len(neighbors)} CDP neighbors from {parent_host} ({ip_addr}) over SNMP.")
+
+        return cdp_neighbors_result_ips, device_infos, None
+
+    async def create_transport(self, ip_addr) -> UdpTransportTarget:
+        """
+        Creates the UDP transport target for an agent.
+
+        Parameters:
+        -----------
+            ip_addr - The IP address of the agent.
+
+        Returns:
+        --------
+            UdpTransportTarget - The transport target.
+        """
+        # Newer pysnmp versions resolve the address asynchronously.
+        if PYSNMP_CREATE_TRANSPORT:
+            return await UdpTransportTarget.create((ip_addr, self.port), timeout=self.timeout, retries=self.retries)
+
+        return UdpTransportTarget((ip_addr, self.port), timeout=self.timeout, retries=self.retries)
+
+    async def get(self, transport, oids) -> Dict[str, str]:
+        """
+        Reads scalar values from an agent in one request.
+
+        Parameters:
+        -----------
+            transport - The agent's transport target.
+            oids - The dotted OIDs to read.
+
+        Returns:
+        --------
+            dict - dotted oid -> value as text, skipping missing values. None if the agent didn't answer.
+        """
+        error_indication, error_status, _, var_binds = await get_cmd(self.engine, CommunityData(self.community), transport, ContextData(), *[ObjectType(ObjectIdentity(oid)) for oid in oids], lookupMib=False)
+        if error_indication or error_status:
+            return None
+
+        # Skip noSuchObject and noSuchInstance values.
+        values = {}
+        for name, value in var_binds:
+            if value.__class__.__name__ not in ("NoSuchObject", "NoSuchInstance", "EndOfMibView"):
+                values[str(name)] = value.prettyPrint()
+
+        return values
+
+    async def walk(self, transport, subtree) -> List[Tuple[tuple, object]]:
+        """
+        Walks a subtree of an agent with GETBULK requests.
+
+        Parameters:
+        -----------
+            transport - The agent's transport target.
+            subtree - The OID of the subtree as a tuple of ints.
+
+        Returns:
+        --------
+            list - (oid tuple, value) pairs in the subtree, empty if it has none. None if the agent didn't answer.
+        """
+        rows = []
+        next_oid = subtree
+        while True:
+            # Ask for the next batch.
+            error_indication, error_status, _, var_binds = await bulk_cmd(self.engine, CommunityData(self.community), transport, ContextData(), 0, SNMP_MAX_REPETITIONS, ObjectType(ObjectIdentity(".".join(str(part) for part in next_oid))), lookupMib=False)
+            if error_indication or error_status:
+                return None if len(rows) <= 0 else rows
+
+            # Older pysnmp versions return a table of rows instead of a flat list.
+            if len(var_binds) > 0 and isinstance(var_binds[0], list):
+                var_binds = [var_bind for row in var_binds for var_bind in row]
+
+            # Keep everything that is still in the subtree.
+            for name, value in var_binds:
+                oid = tuple(name)
+                if oid[:len(subtree)] != subtree or value.__class__.__name__ == "EndOfMibView":
+                    return rows
+                rows.append((oid, value))
+                next_oid = oid
+
+            # Stop if the agent didn't give us anything new.
+            if len(var_binds) <= 0:
+                return rows
+
+    def group_cdp_rows(self, cdp_rows) -> Dict[Tuple[int, int], dict]:
+        """
+        Groups the walked cdpCacheEntry cells into one dictionary per neighbor.
+
+        Parameters:
+        -----------
+            cdp_rows - The (oid, value) pairs walked from cdpCacheEntry.
+
+        Returns:
+        --------
+            dict - (ifIndex, deviceIndex) -> decoded columns.
+        """
+        neighbors = {}
+        for oid, value in cdp_rows:
+            # The oid is cdpCacheEntry.column.ifIndex.deviceIndex.
+            column = oid[len(CDP_CACHE_ENTRY_OID)]
+            index = oid[len(CDP_CACHE_ENTRY_OID) + 1:]
+            if len(index) != 2:
+                continue
+            neighbor = neighbors.setdefault(index, {})
+
+            # Decode the columns we care about.
+            if column == CDP_CACHE_ADDRESS_TYPE:
+                neighbor["address_type"] = int(value)
+            elif column == CDP_CACHE_ADDRESS:
+                neighbor["raw_address"] = value.asOctets()
+            elif column == CDP_CACHE_VERSION:
+                neighbor["version"] = value.asOctets().decode("utf-8", "replace")
+            elif column == CDP_CACHE_DEVICE_ID:
+                neighbor["device_id"] = value.asOctets().decode("utf-8", "replace").strip()
+            elif column == CDP_CACHE_DEVICE_PORT:
+                neighbor["device_port"] = value.asOctets().decode("utf-8", "replace").strip()
+            elif column == CDP_CACHE_PLATFORM:
+                neighbor["platform"] = value.asOctets().decode("utf-8", "replace").strip()
+            elif column == CDP_CACHE_CAPABILITIES:
+                neighbor["capabilities"] = decode_capabilities(value.asOctets())
+
+        # Turn raw addresses into dotted ones now that we have the types.
+        for neighbor in neighbors.values():
+            neighbor["address"] = decode_address(neighbor.pop("address_type", 1), neighbor.pop("raw_address", b""))
+
+        return neighbors